@@ -5,12 +5,33 @@ __email__ = "jasper.riebesehl@physnet.uni-hamburg.de"
 
 # Initilizes the packet.
 
-print("[INFO] Loading the brain.")
+import sys as _sys
 
+# the message goes to stderr, so the JSON summary of python -m brain stays the only output on stdout
+print("[INFO] Loading the brain.", file=_sys.stderr)
+
+from .spectral_grid import *
+from .fft_backend import *
+from .quadrature import *
 from .parameter_object import *
+from .observables import *
 from .wave_function import *
 from .data_manager import *
+from .workspace import *
+from .anderson import *
 from .time_stepper import *
-from .gui_parameters import *
-from .gui_results import *
+from .continuation import *
+from .batch_stepper import *
+from .sweep import *
+from .cache import *
+
+# the GUIs need tkinter and matplotlib, which are not installed on every machine (e.g. headless cluster nodes),
+# so they are only imported when ParameterApp or ResultsApp is used
+GUI_CLASSES = {'ParameterApp': 'gui_parameters', 'ResultsApp': 'gui_results'}
+
+def __getattr__(name):
+    if name in GUI_CLASSES:
+        import importlib
+        return getattr(importlib.import_module('.' + GUI_CLASSES[name], __name__), name)
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
 
@@ -0,0 +1,7 @@
+# Entry point of python -m brain, see brain.cli.
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
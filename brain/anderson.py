@@ -0,0 +1,97 @@
+import numpy as np
+
+class AndersonMixer:
+    '''This class accelerates a fixed point iteration x -> g(x) with Anderson mixing (also known as DIIS).
+
+    The last depth differences of the residuals f = g(x) - x and of the images g(x) are kept in preallocated arrays.
+    The next iterate is the combination of the images whose residual has the smallest norm, which extrapolates the slow
+    linear convergence of the iteration. The coefficients are real, since the wavefunction is treated as a real vector.
+
+    Attributes:
+        depth: An integer, the number of stored differences.
+        regularization: A float, relative Tikhonov regularization of the least squares problem.
+        dF, dG: (depth, M*N) complex numpy arrays with the differences of the residuals and of the images.
+        gram: A (depth, depth) numpy array with the inner products of the residual differences.
+        n_stored: An integer, the number of valid entries in dF and dG.
+        mixed: A boolean that indicates whether the last call to mix returned an extrapolated iterate.
+    '''
+    def __init__(self, depth, resolution, regularization=1e-10):
+        '''Allocates the history.
+
+        Arguments:
+            depth: An integer, the number of stored differences.
+            resolution: A 2-tuple (M, N), the resolution of the grid.
+            regularization: A float, relative Tikhonov regularization of the least squares problem.
+        '''
+        if depth < 1:
+            raise ValueError("The depth of the Anderson mixing has to be at least 1.")
+        self.depth = depth
+        self.regularization = regularization
+        size = resolution[0] * resolution[1]
+
+        self.dF = np.zeros((depth, size), dtype=np.complex128)
+        self.dG = np.zeros((depth, size), dtype=np.complex128)
+        self.gram = np.zeros((depth, depth))
+        self.f = np.zeros(size, dtype=np.complex128)
+        self.f_old = np.zeros(size, dtype=np.complex128)
+        self.g_old = np.zeros(size, dtype=np.complex128)
+        self.reset()
+
+    def reset(self):
+        '''Deletes the history, the next call to mix starts a new sequence.
+        '''
+        self.n_stored = 0
+        self.next_slot = 0
+        self.has_old = False
+        self.mixed = False
+
+    def mix(self, x, g, out):
+        '''Adds the pair (x, g(x)) to the history and writes the next iterate into out.
+
+        Arguments:
+            x: A complex 2D numpy array, the last iterate.
+            g: A complex 2D numpy array, the result of one fixed point step applied to x.
+            out: A complex 2D numpy array the next iterate is written into. It may be g itself.
+
+        Returns:
+            A boolean that is True if the iterate was extrapolated, False if it is just g.
+        '''
+        x = x.reshape(-1)
+        g = g.reshape(-1)
+        np.subtract(g, x, out=self.f)
+
+        # store the new differences in the oldest slot and update the gram matrix
+        if self.has_old:
+            s = self.next_slot
+            np.subtract(self.f, self.f_old, out=self.dF[s])
+            np.subtract(g, self.g_old, out=self.dG[s])
+            self.n_stored = min(self.n_stored + 1, self.depth)
+            self.next_slot = (s + 1) % self.depth
+            for i in range(self.n_stored):
+                self.gram[i, s] = self.gram[s, i] = np.vdot(self.dF[i], self.dF[s]).real
+        self.f_old[...] = self.f
+        self.g_old[...] = g
+        self.has_old = True
+
+        out = out.reshape(-1)
+        if out is not g and not np.shares_memory(out, g):
+            out[...] = g
+        self.mixed = False
+        if self.n_stored == 0:
+            return False
+
+        # least squares problem min |f - dF^T gamma|
+        m = self.n_stored
+        H = self.gram[:m, :m] + self.regularization * np.trace(self.gram[:m, :m]) / m * np.eye(m)
+        rhs = np.array([np.vdot(self.dF[i], self.f).real for i in range(m)])
+        try:
+            gamma = np.linalg.solve(H, rhs)
+        except np.linalg.LinAlgError:
+            self.reset()
+            return False
+
+        # next iterate g - dG^T gamma, f is not needed anymore and used as scratch
+        for i in range(m):
+            out -= np.multiply(self.dG[i], gamma[i], out=self.f)
+        self.mixed = True
+        return True
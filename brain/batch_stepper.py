@@ -0,0 +1,221 @@
+# References used in comments:
+# [1] Zeng, R & Zhang, Yanzhi. (2009). Efficiently computing vortex lattices in rapid rotating Bose–Einstein condensates.
+#     Computer Physics Communications. 180. 854-860. 10.1016/j.cpc.2008.12.003.
+
+import numpy as np
+
+from .parameter_object import ParameterObject
+from .wave_function import WaveFunction2D
+from .data_manager import DataManager
+from .observables import ObservableEngine
+from .time_stepper import getGlobalAttributes
+from .kernels import batched_real_space_stage, batched_spectral_stage, batched_interior_norm2, batched_renormalize_epsilon
+
+def unsupportedFeatures(parameterObject):
+    '''Returns a list with the names of the settings of parameterObject that BatchedTimeStepper ignores:
+    adaptive_dt, anderson_depth, checkpoint_interval and a precision other than 'double'.
+    '''
+    p = parameterObject
+    features = []
+    if p.adaptive_dt:
+        features.append('adaptive_dt')
+    if p.anderson_depth > 0:
+        features.append('anderson_depth')
+    if p.checkpoint_interval > 0:
+        features.append('checkpoint_interval')
+    if p.precision != 'double':
+        features.append('precision')
+    return features
+
+class BatchedTimeStepper:
+    '''This class calculates the ground states of K independent systems on the same grid at once with the BFFP scheme [1]
+    of ImaginaryTimeStepper. The K wave functions are one (K, M, N) stack, so every operation of a step, the FFTs over the last two axes,
+    alpha, G, the normalization and epsilon, is one call for all members. On small grids this amortizes the overhead of the
+    interpreter and gives the FFT library larger batches.
+
+    The members may differ in every physical parameter (beta2, omega, the potential), in dt, the exit conditions
+    and the initial wavefunction, but not in the grid. Every member saves its frames to its own ParameterObject.filename
+    like ImaginaryTimeStepper does. A member that converged (or reached its maxIterations) saves its last frame,
+    its file is closed and it is removed from the stack, so the following steps only calculate the remaining members.
+    There is no adaptive time step, Anderson mixing, time series or checkpoint, and all members are calculated in double precision.
+    A warning is printed for every member that sets one of them, see unsupportedFeatures.
+
+    Attributes:
+        paramObjs: A list with the ParameterObject instance of every member.
+        dataManagers: A list with the DataManager instance of every member.
+        active: A 1D numpy array with the member index of every row of the stack.
+        psi, psi_old: Complex (K, M, N) numpy arrays with the current and the previous time step of the active members.
+        n, t, epsilon, epsilon_sum: 1D numpy arrays with the state of every member.
+        results: A list with a dictionary (n, epsilon, E, L, Nabla) for every member, None until the member finished.
+        psi_final: A list with a WaveFunction2D instance of the last time step of every member, None until the member finished.
+    '''
+    def __init__(self, parameterObjects, psi0s=None, in_memory=False):
+        '''Initializes the instance and creates the file of every member.
+
+        Arguments:
+            parameterObjects: A list of ParameterObject instances with the same bounds and resolution.
+            psi0s: An optional list with the initial WaveFunction2D instance of every member.
+                   By default the initial wavefunction is set up by ParameterObject.psi0_choice.
+            in_memory: A boolean, if True the frames are only kept in memory.
+        '''
+        if len(parameterObjects) == 0:
+            raise ValueError("A batch needs at least one ParameterObject.")
+        for p in parameterObjects:
+            if type(p) != ParameterObject:
+                raise TypeError("Parameter parameterObjects has to contain ParameterObject instances.")
+            if p.getResolution() != parameterObjects[0].getResolution() or p.getBoundaries() != parameterObjects[0].getBoundaries():
+                raise ValueError("All members of a batch need the same grid, {} {} does not match {} {}.".format(
+                    p.getResolution(), p.getBoundaries(), parameterObjects[0].getResolution(), parameterObjects[0].getBoundaries()))
+        for k, p in enumerate(parameterObjects):
+            features = unsupportedFeatures(p)
+            if features:
+                print("[WARNING] Member {} sets {}, which the batch ignores.".format(k, ', '.join(features)))
+        if psi0s is not None and len(psi0s) != len(parameterObjects):
+            raise ValueError("{} initial wavefunctions given for {} members.".format(len(psi0s), len(parameterObjects)))
+        self.paramObjs = list(parameterObjects)
+        K = len(self.paramObjs)
+
+        # the initial wave functions and the potentials are stacked
+        shape = (K,) + self.paramObjs[0].getResolution()
+        complex_dtype, real_dtype = self.paramObjs[0].getDtypes('double')
+        self.psi = np.zeros(shape, dtype=complex_dtype)
+        self.V = np.zeros(shape, dtype=real_dtype)
+        for k, p in enumerate(self.paramObjs):
+            if p.V is None:
+                p.initV()
+            self.V[k] = p.V
+            if psi0s is None:
+                psi0 = WaveFunction2D(p)
+                psi0.initPsi_0()
+            else:
+                psi0 = psi0s[k]
+            self.psi[k] = psi0.psi_array
+        self.psi_old = np.zeros_like(self.psi)
+
+        self.active = np.arange(K)
+        self.n = np.zeros(K, dtype=np.int64)
+        self.t = np.zeros(K)
+        self.epsilon = np.ones(K)
+        self.epsilon_sum = np.zeros(K)
+        self.results = [None] * K
+        self.psi_final = [None] * K
+
+        # every member has its own file
+        self.dataManagers = []
+        for p in self.paramObjs:
+            dataM = DataManager(p.filename, in_memory, p.compression, p.compression_level, p.async_writes)
+            dataM.newFile()
+            dataM.setGlobalAttributes(getGlobalAttributes(p))
+            self.dataManagers.append(dataM)
+
+    def getParameterArray(self, name):
+        '''Returns a 1D numpy array with the parameter name of every active member.
+        '''
+        return np.array([getattr(self.paramObjs[k], name) for k in self.active], dtype=np.float64)
+
+    def BFFP(self):
+        '''Calculates the ground states of all members with the BFFP scheme, see ImaginaryTimeStepper.BFFP.
+        Every step is the same as a step of ImaginaryTimeStepper.BFFP for every member.
+
+        Returns:
+            The list results.
+        '''
+        p0 = self.paramObjs[0]
+        grid = p0.getSpectralGrid()
+        backend = p0.getFFTBackend()
+        x, y = np.ascontiguousarray(grid.xx[:, 0]), np.ascontiguousarray(grid.yy[0])
+        dA = p0.dx * p0.dy
+
+        while len(self.active) > 0:
+            # the arrays of the step are allocated for the current size of the stack
+            K = len(self.active)
+            beta2, omega, dt = [self.getParameterArray(name) for name in ('beta2', 'omega', 'dt')]
+            epsilon_limit, maxIterations, epsilon_threshold = [self.getParameterArray(name) for name in ('epsilon_limit', 'maxIterations', 'epsilon_threshold')]
+            psi_hat = np.empty_like(self.psi)
+            derivatives = np.empty((2,) + self.psi.shape, dtype=self.psi.dtype)
+            G = np.empty_like(self.psi)
+            bmin, bmax, norm2, epsilon = [np.empty(K) for _ in range(4)]
+            print("[INFO] Calculating {} members of the batch.".format(K))
+
+            while True:
+                # psi_hat and the spatial derivatives of all members, the derivatives are one batched inverse transform
+                backend.fft2(self.psi, out=psi_hat)
+                np.multiply(grid.my_p, psi_hat, out=derivatives[0])
+                np.multiply(grid.lambda_q, psi_hat, out=derivatives[1])
+                backend.ifft2(derivatives, out=derivatives)
+
+                # G without alpha*psi and the bounds for alpha of every member
+                batched_real_space_stage(self.V, beta2, omega, self.psi, derivatives[0], derivatives[1], x, y, G, bmin, bmax)
+                alpha = 0.5 * (bmax + bmin)
+                for k in np.flatnonzero(dt > 2/(bmax + bmin)):
+                    print("[WARNING] Delta t = {} of member {} is larger than time step constraint {}!".format(
+                        dt[k], self.active[k], 2/(bmax[k] + bmin[k])))
+                backend.fft2(G, out=G)
+
+                # the next time step into the buffer of the previous one
+                batched_spectral_stage(psi_hat, G, grid.k2, dt, alpha, G)
+                backend.ifft2(G, out=self.psi_old)
+                self.psi, self.psi_old = self.psi_old, self.psi
+
+                # renormalize and calculate epsilon of every member
+                batched_interior_norm2(self.psi, norm2)
+                batched_renormalize_epsilon(self.psi, self.psi_old, 1/np.sqrt(norm2 * dA), epsilon)
+                epsilon /= dt
+                self.n[self.active] += 1
+                self.t[self.active] += dt
+                self.epsilon[self.active] = epsilon
+                self.epsilon_sum[self.active] += epsilon
+
+                # save a frame of every member whose epsilon sum is large enough
+                for row in np.flatnonzero(self.epsilon_sum[self.active] > epsilon_threshold):
+                    self.saveFrame(row)
+                    self.epsilon_sum[self.active[row]] = 0
+
+                finished = (epsilon <= epsilon_limit) | (self.n[self.active] >= maxIterations)
+                if np.any(finished):
+                    break
+
+            # the finished members are saved and removed from the stack
+            for row in np.flatnonzero(finished):
+                self.finishMember(row)
+            keep = np.flatnonzero(~finished)
+            self.active = self.active[keep]
+            self.psi = self.psi[keep]
+            self.psi_old = self.psi_old[keep]
+            self.V = self.V[keep]
+
+        return self.results
+
+    def saveFrame(self, row):
+        '''Adds the current time step of the member in the given row of the stack as a frame to its file.
+
+        Returns:
+            A dictionary with the attributes of the frame.
+        '''
+        k = self.active[row]
+        p = self.paramObjs[k]
+        attributes = {'n': int(self.n[k]), 't': self.t[k], 'epsilon': self.epsilon[k], 'dt': p.dt}
+        if p.inline_observables:
+            E, L, Nabla = ObservableEngine(p).calcObservables(self.psi[row])
+            attributes.update(E=E, L=L, Nabla=Nabla)
+        self.dataManagers[k].addDset(self.psi[row], attributes)
+        return attributes
+
+    def finishMember(self, row):
+        '''Saves the last frame of the member in the given row of the stack, closes its file and stores its result.
+        '''
+        k = self.active[row]
+        p = self.paramObjs[k]
+        psi = WaveFunction2D(p)
+        psi.setPsi(self.psi[row].copy())
+        E, L, Nabla = psi.calcObservables()
+        self.saveFrame(row)
+
+        dataM = self.dataManagers[k]
+        dataM.file.attrs["n_frames"] = dataM.getNFrames()
+        dataM.file.attrs["calculated_observables"] = p.inline_observables
+        if not dataM.in_memory:
+            dataM.closeFile()
+        self.psi_final[k] = psi
+        self.results[k] = {'n': int(self.n[k]), 'epsilon': float(self.epsilon[k]), 'E': float(E), 'L': float(L.real), 'Nabla': float(Nabla)}
+        print("[INFO] Member {} finished after {} time steps, epsilon = {:1.3e}.".format(k, self.n[k], self.epsilon[k]))
@@ -0,0 +1,275 @@
+import os
+import json
+import hashlib
+from time import time
+
+import numpy as np
+import h5py
+
+from .parameter_object import ParameterObject, PotentialChoice
+from .wave_function import WaveFunction2D
+from .time_stepper import ImaginaryTimeStepper
+
+# default directory of the cache and the maximum number of ground states it keeps
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'brain')
+DEFAULT_CACHE_ENTRIES = 100
+
+# name of the index of the cache in its directory
+CACHE_INDEX_FILENAME = 'index.json'
+
+# the entries of potential_parameters that are used by every potential, the others do not change the ground state
+POTENTIAL_KEYS = {
+    PotentialChoice.HARMONIC: ('gamma_y',),
+    PotentialChoice.HARMONIC_QUARTIC: ('alpha', 'kappa_quartic'),
+    PotentialChoice.HARMONIC_OPTIC: ('V0', 'kappa_optic'),
+}
+
+# a cached state is a near hit if no physical parameter differs by more than this, relative to max(|a|, |b|, 1)
+NEAR_HIT_DISTANCE = 0.1
+
+def cacheParameters(parameterObject):
+    '''Returns a dictionary with the parameters of a ParameterObject that determine its ground state:
+    the grid, beta2, omega, the potential, dt and epsilon_limit. All values are python ints, floats or strings.
+    The method and maxIterations are left out on purpose: only converged states are cached, and every converged state
+    of the same parameters is the same ground state, whichever method found it and however many iterations it took.
+    '''
+    p = parameterObject
+    choice = PotentialChoice(int(p.potential_choice))
+    if choice not in POTENTIAL_KEYS:
+        raise ValueError("Potential choice {} can not be cached.".format(p.potential_choice))
+    parameters = {
+        'resolutionX': int(p.resolutionX), 'resolutionY': int(p.resolutionY),
+        'x_low': float(p.x_low), 'x_high': float(p.x_high), 'y_low': float(p.y_low), 'y_high': float(p.y_high),
+        'beta2': float(p.beta2), 'omega': float(p.omega),
+        'potential_choice': int(choice),
+        'dt': float(p.dt), 'epsilon_limit': float(p.epsilon_limit)
+    }
+    for key in POTENTIAL_KEYS[choice]:
+        parameters['potential_' + key] = float(p.potential_parameters[key])
+    return parameters
+
+def cacheResults(results):
+    '''Returns n, epsilon, E, L and Nabla of a dictionary of results as python ints and floats. L is the real part of <L>.
+    '''
+    converted = {name: float(np.real(results[name])) for name in ('n', 'epsilon', 'E', 'L', 'Nabla')}
+    converted['n'] = int(converted['n'])
+    return converted
+
+def cacheKey(parameterObject):
+    '''Returns the key of a ParameterObject in the cache, the sha256 hash of cacheParameters.
+    '''
+    parameters = cacheParameters(parameterObject)
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+def parameterDistance(a, b):
+    '''Returns the distance of two dictionaries of cacheParameters for a warm start,
+    the largest difference of beta2, omega and the potential parameters relative to max(|a|, |b|, 1).
+    It is infinite if the boundaries or the potential differ, the resolution, dt and epsilon_limit are ignored.
+    '''
+    if any(a[name] != b[name] for name in ('x_low', 'x_high', 'y_low', 'y_high', 'potential_choice')):
+        return np.inf
+    names = ['beta2', 'omega'] + [name for name in a if name.startswith('potential_') and name != 'potential_choice']
+    return max(abs(a[name] - b[name]) / max(abs(a[name]), abs(b[name]), 1) for name in names)
+
+
+class GroundStateCache:
+    '''This class is an on-disk cache of converged ground states, so identical configurations (presets, regression checks,
+    repeated sweeps) are not calculated again.
+
+    Every ground state is saved to <key>.hdf5 in the directory, where the key is the hash of the parameters that determine
+    the ground state (see cacheParameters). The index CACHE_INDEX_FILENAME holds the parameters, n, epsilon, E, L and Nabla of every entry
+    and the time it was used last. If the cache has more than max_entries entries, the least recently used ones are deleted.
+
+    On an exact hit lookup returns the cached state. Otherwise nearest returns the cached state with the closest parameters
+    (see parameterDistance) as initial wavefunction, solve uses it as a warm start.
+
+    Attributes:
+        directory: A string, the directory of the cache.
+        max_entries: An integer, the maximum number of entries.
+        max_distance: A float, the largest parameterDistance of a near hit.
+    '''
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_entries=DEFAULT_CACHE_ENTRIES, max_distance=NEAR_HIT_DISTANCE):
+        '''Initializes the instance, the directory is created if it does not exist.
+
+        Arguments:
+            directory: A string, the directory of the cache.
+            max_entries: An integer, the maximum number of cached ground states.
+            max_distance: A float, the largest parameterDistance of a near hit.
+        '''
+        if int(max_entries) < 1:
+            raise ValueError("The cache needs at least one entry, not {}.".format(max_entries))
+        self.directory = directory
+        self.max_entries = int(max_entries)
+        self.max_distance = max_distance
+        os.makedirs(self.directory, exist_ok=True)
+
+    def getFilename(self, key):
+        '''Returns the filename of the entry key.
+        '''
+        return os.path.join(self.directory, key + '.hdf5')
+
+    def readIndex(self):
+        '''Returns the index, a dictionary that maps the keys to the information of their entries.
+        Entries whose file is missing are left out.
+        '''
+        try:
+            with open(os.path.join(self.directory, CACHE_INDEX_FILENAME)) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {key: entry for key, entry in index.items() if os.path.isfile(self.getFilename(key))}
+
+    def writeIndex(self, index):
+        '''Writes the index. It is replaced in one step, so a reader never sees a partly written index.
+        '''
+        filename = os.path.join(self.directory, CACHE_INDEX_FILENAME)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(filename + '.tmp', filename)
+
+    def __len__(self):
+        return len(self.readIndex())
+
+    def __contains__(self, parameterObject):
+        return cacheKey(parameterObject) in self.readIndex()
+
+    def loadEntry(self, key, parameterObject):
+        '''Reads psi of the entry key and returns it as a WaveFunction2D on the grid of parameterObject.
+        It is interpolated if the resolution of the entry is different.
+        '''
+        with h5py.File(self.getFilename(key), 'r') as f:
+            psi_array = f['psi'][()]
+        if psi_array.shape != parameterObject.getResolution():
+            grid = parameterObject.copyWithResolution(*psi_array.shape)
+            psi = WaveFunction2D(grid)
+            psi.setPsi(psi_array)
+            return psi.interpolate(parameterObject)
+        psi = WaveFunction2D(parameterObject)
+        psi.setPsi(psi_array)
+        return psi
+
+    def lookup(self, parameterObject):
+        '''Returns the cached ground state of parameterObject on an exact hit.
+
+        Returns:
+            A 2-tuple (WaveFunction2D, results), where results is a dictionary with the keys n, epsilon, E, L and Nabla,
+            or None if the parameters are not cached.
+        '''
+        key = cacheKey(parameterObject)
+        index = self.readIndex()
+        if key not in index:
+            return None
+        index[key]['last_used'] = time()
+        self.writeIndex(index)
+        print("[INFO] Found the ground state in the cache {}.".format(self.getFilename(key)))
+        return self.loadEntry(key, parameterObject), dict(index[key]['results'])
+
+    def nearest(self, parameterObject):
+        '''Returns the cached ground state with the closest parameters, if it is a near hit.
+
+        Returns:
+            A 2-tuple (WaveFunction2D on the grid of parameterObject, distance) or None if no entry is closer than max_distance.
+        '''
+        parameters = cacheParameters(parameterObject)
+        index = self.readIndex()
+        distances = {key: parameterDistance(parameters, entry['parameters']) for key, entry in index.items()}
+        if len(distances) == 0:
+            return None
+        key = min(distances, key=distances.get)
+        if distances[key] > self.max_distance:
+            return None
+        index[key]['last_used'] = time()
+        self.writeIndex(index)
+        print("[INFO] Using the cached ground state {} as warm start, distance {:.3g}.".format(self.getFilename(key), distances[key]))
+        return self.loadEntry(key, parameterObject), distances[key]
+
+    def store(self, parameterObject, psi, results):
+        '''Adds a ground state to the cache and deletes the least recently used entries if the cache is full.
+
+        Arguments:
+            parameterObject: The ParameterObject instance of the ground state.
+            psi: A WaveFunction2D instance or a complex 2D numpy array, the converged wavefunction.
+            results: A dictionary with the keys n, epsilon, E, L and Nabla.
+
+        Returns:
+            The key of the entry.
+        '''
+        key = cacheKey(parameterObject)
+        psi_array = psi.psi_array if type(psi) == WaveFunction2D else psi
+        results = cacheResults(results)
+
+        filename = self.getFilename(key)
+        with h5py.File(filename + '.tmp', 'w') as f:
+            f.create_dataset('psi', data=np.asarray(psi_array, dtype=np.complex128), compression='gzip')
+            for name, value in cacheParameters(parameterObject).items():
+                f.attrs[name] = value
+            for name, value in results.items():
+                f.attrs[name] = value
+        os.replace(filename + '.tmp', filename)
+
+        index = self.readIndex()
+        index[key] = {'parameters': cacheParameters(parameterObject), 'results': results, 'last_used': time()}
+        self.evict(index)
+        self.writeIndex(index)
+        return key
+
+    def evict(self, index):
+        '''Deletes the least recently used entries from the index and the directory until there are at most max_entries.
+        '''
+        while len(index) > self.max_entries:
+            key = min(index, key=lambda k: index[k]['last_used'])
+            del index[key]
+            if os.path.isfile(self.getFilename(key)):
+                os.remove(self.getFilename(key))
+            print("[INFO] Removed {} from the cache.".format(self.getFilename(key)))
+
+    def clear(self):
+        '''Deletes all entries of the cache.
+        '''
+        for key in self.readIndex():
+            os.remove(self.getFilename(key))
+        self.writeIndex({})
+
+    def solve(self, parameterObject, method='BFFP', in_memory=False):
+        '''Returns the ground state of parameterObject from the cache, or calculates and caches it.
+        The calculation starts from the nearest cached state if there is a near hit, otherwise from ParameterObject.psi0_choice.
+        Only a converged calculation (epsilon <= epsilon_limit) is cached, the results of an unconverged one are returned without storing it.
+
+        Arguments:
+            parameterObject: A ParameterObject instance, a calculation is saved to its filename.
+            method: A string, 'BFFP' or 'PCG'.
+            in_memory: A boolean, if True the frames of a calculation are only kept in memory.
+
+        Returns:
+            A 2-tuple (WaveFunction2D, results), where results is a dictionary with the keys n, epsilon, E, L and Nabla.
+        '''
+        if type(parameterObject) != ParameterObject:
+            raise TypeError("Parameter parameterObject is not of type ParameterObject")
+        if method not in ('BFFP', 'PCG'):
+            raise ValueError("Method {} not recognized. Available are 'BFFP' and 'PCG'.".format(method))
+        p = parameterObject
+        if p.V is None:
+            p.initV()
+        hit = self.lookup(p)
+        if hit is not None:
+            return hit
+
+        near = self.nearest(p)
+        if near is not None:
+            psi0 = near[0]
+        else:
+            psi0 = WaveFunction2D(p)
+            psi0.initPsi_0()
+        stepper = ImaginaryTimeStepper(psi0, p, in_memory=in_memory)
+        getattr(stepper, method)()
+        attributes = stepper.dataM.getDset(stepper.dataM.getLastKey())[1]
+        stepper.dataM.closeFile()
+
+        psi = stepper.psi_n
+        E, L, Nabla = psi.calcObservables()
+        results = {'n': stepper.n, 'epsilon': attributes['epsilon'], 'E': E, 'L': L, 'Nabla': Nabla}
+        if results['epsilon'] > p.epsilon_limit:
+            print("[WARNING] The ground state did not converge, epsilon = {:1.3e}. It is not cached.".format(results['epsilon']))
+            return psi, cacheResults(results)
+        key = self.store(p, psi, results)
+        return psi, dict(self.readIndex()[key]['results'])
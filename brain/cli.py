@@ -0,0 +1,276 @@
+import os
+import gc
+import sys
+import enum
+import json
+import inspect
+import argparse
+import contextlib
+from time import time
+
+import numpy as np
+
+from .fft_backend import FFT_BACKENDS
+from .parameter_object import ParameterObject, PotentialChoice, Psi0Choice
+from .data_manager import CODECS
+from .wave_function import WaveFunction2D
+from .time_stepper import ImaginaryTimeStepper
+from .continuation import ResolutionContinuation
+from .cache import GroundStateCache
+from .sweep import initSweepWorker
+
+# toml is only required for .toml configs, tomllib is part of python >= 3.11
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# exit codes of the command line interface
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_CONFIG_ERROR = 2
+EXIT_NOT_CONVERGED = 3
+
+# top level keys of a run config, every other key is an error
+CONFIG_KEYS = ('method', 'threads', 'levels', 'cache', 'parameters')
+
+# numeric parameters of ParameterObject that have to be integers, the others may also be floats
+INTEGER_PARAMETERS = ('resolutionX', 'resolutionY', 'maxIterations', 'fft_threads', 'anderson_depth', 'checkpoint_interval',
+    'compression_level', 'observables_interval')
+
+def loadConfig(filename):
+    '''Reads a run config from a .toml or .json file.
+
+    A config has the optional keys
+        method: 'BFFP' (default) or 'PCG'.
+        threads: An integer, the number of numba threads and the default of fft_threads.
+        levels: A list of coarse resolutions for a ResolutionContinuation, e.g. [64, 128].
+        cache: A string, the directory of a GroundStateCache the ground state is looked up in and saved to.
+        parameters: A table with the keyword arguments of ParameterObject, e.g. beta2, omega, filename, fft_backend, precision
+                    or async_writes. potential_choice and psi0_choice are names like 'HARMONIC' or integers, potential_parameters and
+                    psi0_parameters only need the entries that differ from the defaults.
+
+    Returns:
+        A dictionary.
+    '''
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.toml':
+        if tomllib is None:
+            raise ValueError("Reading {} requires tomllib (python >= 3.11) or tomli.".format(filename))
+        with open(filename, 'rb') as f:
+            config = tomllib.load(f)
+    elif extension == '.json':
+        with open(filename) as f:
+            config = json.load(f)
+    else:
+        raise ValueError("Config {} is neither a .toml nor a .json file.".format(filename))
+    if not isinstance(config, dict):
+        raise ValueError("The config has to be a table, not {}.".format(type(config).__name__))
+    unknown = set(config) - set(CONFIG_KEYS)
+    if unknown:
+        raise ValueError("Unknown keys {} in the config. Available are {}.".format(sorted(unknown), list(CONFIG_KEYS)))
+    return config
+
+def parseChoice(enum, value):
+    '''Returns the member of a PotentialChoice or Psi0Choice enum from its name (in any case) or its integer value.
+    '''
+    if isinstance(value, str):
+        if value.upper() not in enum.__members__:
+            raise ValueError("{} is not a {}. Available are {}.".format(value, enum.__name__, list(enum.__members__)))
+        return enum[value.upper()]
+    return enum(int(value))
+
+def checkParameter(name, value, default):
+    '''Raises a ValueError if value does not fit the default of the parameter name of ParameterObject:
+    booleans have to be booleans, strings strings and numbers finite numbers, integers for INTEGER_PARAMETERS.
+    The choices potential_choice and psi0_choice are checked by parseChoice.
+    '''
+    if isinstance(default, enum.Enum):
+        return
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError("{} has to be true or false, not {!r}.".format(name, value))
+    elif isinstance(default, (int, float)):
+        integer = name in INTEGER_PARAMETERS
+        if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)) or not np.isfinite(value):
+            raise ValueError("{} has to be {}, not {!r}.".format(name, 'an integer' if integer else 'a finite number', value))
+    elif isinstance(default, str):
+        # compression None stores the frames uncompressed
+        if not isinstance(value, str) and not (name == 'compression' and value is None):
+            raise ValueError("{} has to be a string, not {!r}.".format(name, value))
+    elif isinstance(default, dict):
+        if not isinstance(value, dict):
+            raise ValueError("{} has to be a table, not {!r}.".format(name, value))
+        for key, entry in value.items():
+            checkParameter("{}.{}".format(name, key), entry, 0.0)
+
+def buildParameterObject(parameters, threads=None):
+    '''Creates the ParameterObject of a run config and initializes the potential.
+    The types of the values (see checkParameter) and the choices fft_backend, compression and precision are checked here,
+    before any file is created, so a wrong value is a config error and not a failed run.
+
+    Arguments:
+        parameters: A dictionary with keyword arguments of ParameterObject.
+        threads: An optional integer, the default of fft_threads.
+    '''
+    defaults = inspect.signature(ParameterObject.__init__).parameters
+    kwargs = dict(parameters)
+    unknown = set(kwargs) - set(defaults) - {'self'}
+    if unknown:
+        raise ValueError("Unknown parameters {} in the config.".format(sorted(unknown)))
+    for name, value in kwargs.items():
+        checkParameter(name, value, defaults[name].default)
+    if 'potential_choice' in kwargs:
+        kwargs['potential_choice'] = parseChoice(PotentialChoice, kwargs['potential_choice'])
+    if 'psi0_choice' in kwargs:
+        kwargs['psi0_choice'] = parseChoice(Psi0Choice, kwargs['psi0_choice'])
+    # the dictionaries are completed with the defaults, so the config only needs the changed entries
+    for name in ('potential_parameters', 'psi0_parameters'):
+        kwargs[name] = dict(defaults[name].default, **kwargs.get(name, {}))
+    if threads is not None:
+        kwargs.setdefault('fft_threads', threads)
+    if kwargs.get('fft_backend', defaults['fft_backend'].default) not in FFT_BACKENDS:
+        raise ValueError("FFT backend {} not recognized. Available are {}.".format(kwargs['fft_backend'], list(FFT_BACKENDS.keys())))
+    if kwargs.get('compression', defaults['compression'].default) not in CODECS:
+        raise ValueError("Compression {} not recognized. Available are {}.".format(kwargs['compression'], CODECS))
+    p = ParameterObject(**kwargs)
+    p.initV()
+    return p
+
+def stepperSummary(stepper):
+    '''Returns n, epsilon and the observables of the last frame of a finished ImaginaryTimeStepper as a dictionary.
+    Call it before the file is closed.
+    '''
+    attributes = stepper.dataM.getDset(stepper.dataM.getLastKey())[1]
+    E, L, Nabla = stepper.psi_n.calcObservables()
+    return {'n': int(stepper.n), 'epsilon': float(attributes['epsilon']),
+        'E': float(np.real(E)), 'L': float(np.real(L)), 'Nabla': float(np.real(Nabla))}
+
+def parseConfig(config):
+    '''Checks a run config (see loadConfig) and creates its ParameterObject.
+
+    Returns:
+        A 4-tuple (method, ParameterObject, levels, cache directory or None).
+    '''
+    method = config.get('method', 'BFFP')
+    if method not in ('BFFP', 'PCG'):
+        raise ValueError("Method {} not recognized. Available are 'BFFP' and 'PCG'.".format(method))
+    threads = config.get('threads')
+    if threads is not None:
+        threads = int(threads)
+        if threads < 1:
+            raise ValueError("threads has to be at least 1, not {}.".format(threads))
+    levels = list(config.get('levels', []))
+    cache = config.get('cache') or None
+    if cache is not None:
+        cache = os.path.expanduser(cache)
+    if levels and cache:
+        raise ValueError("levels can not be used together with cache.")
+    p = buildParameterObject(config.get('parameters', {}), threads)
+    if threads is not None:
+        initSweepWorker(threads)
+    return method, p, levels, cache
+
+def runParameters(method, parameterObject, levels=None, cache=None):
+    '''Calculates the ground state of parameterObject, with a ResolutionContinuation if levels are given
+    or with a GroundStateCache in the directory cache.
+
+    Returns:
+        A dictionary with the summary of the run: method, filename, n, epsilon, E, L, Nabla and converged.
+    '''
+    p = parameterObject
+    levels = list(levels or [])
+    if cache is not None:
+        psi, results = GroundStateCache(cache).solve(p, method)
+    else:
+        if levels:
+            stepper = ResolutionContinuation(p, levels, method=method).run()
+        else:
+            psi0 = WaveFunction2D(p)
+            psi0.initPsi_0()
+            stepper = ImaginaryTimeStepper(psi0, p)
+            getattr(stepper, method)()
+        results = stepperSummary(stepper)
+        stepper.dataM.closeFile()
+
+    summary = {'method': method, 'filename': p.filename}
+    summary.update(results)
+    summary['converged'] = bool(summary['epsilon'] <= p.epsilon_limit)
+    return summary
+
+def runConfig(config):
+    '''Calculates the ground state of a run config, see loadConfig.
+
+    Returns:
+        A dictionary with the summary of the run, see runParameters.
+    '''
+    return runParameters(*parseConfig(config))
+
+def resumeFile(filename):
+    '''Continues the interrupted simulation in filename, see ImaginaryTimeStepper.resume.
+
+    Returns:
+        A dictionary with the summary of the run, like runConfig.
+    '''
+    stepper = ImaginaryTimeStepper.resume(filename)
+    method = stepper.resumeState['method']
+    getattr(stepper, method)()
+    summary = {'method': method, 'filename': filename}
+    summary.update(stepperSummary(stepper))
+    summary['converged'] = bool(summary['epsilon'] <= stepper.paramObj.epsilon_limit)
+    stepper.dataM.closeFile()
+    return summary
+
+def main(argv=None):
+    '''Entry point of python -m brain. The output of the solver is written to stderr,
+    the summary of the run is printed to stdout as a single line of JSON, the last line of the output.
+
+    Returns:
+        The exit code, one of EXIT_SUCCESS, EXIT_FAILURE, EXIT_CONFIG_ERROR and EXIT_NOT_CONVERGED.
+    '''
+    parser = argparse.ArgumentParser(prog='python -m brain',
+        description="Calculates the ground state of a rotating BEC without the GUI.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="Calculate the ground state of a .toml or .json run config.")
+    run_parser.add_argument('config', help="The run config.")
+    resume_parser = subparsers.add_parser('resume', help="Continue an interrupted simulation from its checkpoint.")
+    resume_parser.add_argument('file', help="The .hdf5 file of the simulation.")
+    for p in (run_parser, resume_parser):
+        p.add_argument('--summary', default=None, metavar='FILE', help="Also write the JSON summary to FILE.")
+    args = parser.parse_args(argv)
+
+    summary = {'status': None, 'error': None}
+    start = time()
+    # the output of the solver and of the DataManagers, which print when they are destroyed,
+    # goes to stderr until the summary is printed, also when an exception is cleaned up
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if args.command == 'run':
+                # errors of the config are reported with their own exit code
+                try:
+                    settings = parseConfig(loadConfig(args.config))
+                except (OSError, ValueError, TypeError, KeyError) as e:
+                    summary.update(status='config_error', error="{}: {}".format(type(e).__name__, e))
+                    raise
+                summary.update(runParameters(*settings))
+            else:
+                summary.update(resumeFile(args.file))
+            summary['status'] = 'converged' if summary['converged'] else 'not_converged'
+        except Exception as e:
+            if summary['status'] is None:
+                summary.update(status='failed', error="{}: {}".format(type(e).__name__, e))
+        gc.collect()
+    summary['seconds'] = time() - start
+
+    exit_code = {'converged': EXIT_SUCCESS, 'not_converged': EXIT_NOT_CONVERGED,
+        'config_error': EXIT_CONFIG_ERROR}.get(summary['status'], EXIT_FAILURE)
+    summary['exit_code'] = exit_code
+    line = json.dumps(summary)
+    print(line)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            f.write(line + '\n')
+    return exit_code
@@ -0,0 +1,253 @@
+import os
+import csv
+import copy
+import numpy as np
+
+from .parameter_object import ParameterObject
+from .wave_function import WaveFunction2D
+from .data_manager import DataManager
+from .time_stepper import ImaginaryTimeStepper
+from .sweep import setParameter, finishedFile, readSummary, SUMMARY_COLUMNS
+
+from time import time
+
+# epsilon limit of the coarse levels if none is given, the vortex lattice is arranged long before that
+COARSE_EPSILON_LIMIT = 1e-5
+
+# name of the catalog of a parameter continuation in its directory
+CATALOG_FILENAME = 'catalog.csv'
+
+class ResolutionContinuation:
+    '''This class calculates the ground state on a sequence of finer and finer grids (coarse-to-fine continuation).
+    The converged wavefunction of every level is interpolated spectrally onto the grid of the next level and used as its initial wavefunction.
+    This way most of the iterations, which only arrange the vortices, are done on the small grids and the full resolution only has to converge the details.
+
+    Only the last level, which has the resolution of the ParameterObject, is saved to ParameterObject.filename.
+    The frames of the coarse levels are only kept in memory.
+
+    Attributes:
+        paramObj: A ParameterObject instance with the target resolution.
+        levels: A list of 2-tuples (M, N), the resolutions of all levels. The last one is the resolution of paramObj.
+        epsilon_limits: A list of floats, the epsilon limit of every level. The last one is ParameterObject.epsilon_limit.
+        method: A string, the name of the ImaginaryTimeStepper method that is used on every level, 'BFFP' or 'PCG'.
+        stepper: The ImaginaryTimeStepper instance of the last level, once run was called.
+        statistics: A list of 3-tuples (resolution, iterations, seconds) for every calculated level.
+    '''
+    def __init__(self, parameterObject, levels, epsilon_limits=None, method='BFFP'):
+        '''Initializes the instance.
+
+        Arguments:
+            parameterObject: A ParameterObject instance with the target resolution and all other parameters.
+            levels: A list of the coarse resolutions, either integers for square grids or 2-tuples (M, N).
+                    They have to be smaller than the target resolution.
+            epsilon_limits: An optional list with the epsilon limit of every coarse level. Default is COARSE_EPSILON_LIMIT.
+            method: A string, 'BFFP' or 'PCG'.
+        '''
+        if type(parameterObject) != ParameterObject:
+            raise TypeError("Parameter parameterObject is not of type ParameterObject")
+        if method not in ('BFFP', 'PCG'):
+            raise ValueError("Method {} not recognized. Available are 'BFFP' and 'PCG'.".format(method))
+        self.paramObj = parameterObject
+        self.method = method
+
+        target = self.paramObj.getResolution()
+        self.levels = []
+        for level in levels:
+            resolution = (level, level) if isinstance(level, int) else tuple(level)
+            if resolution[0] > target[0] or resolution[1] > target[1]:
+                raise ValueError("Level {} is finer than the target resolution {}.".format(resolution, target))
+            self.levels.append(resolution)
+        self.levels.append(target)
+
+        if epsilon_limits is None:
+            epsilon_limits = [max(COARSE_EPSILON_LIMIT, self.paramObj.epsilon_limit)] * (len(self.levels) - 1)
+        if len(epsilon_limits) != len(self.levels) - 1:
+            raise ValueError("{} epsilon limits given for {} coarse levels.".format(len(epsilon_limits), len(self.levels) - 1))
+        self.epsilon_limits = list(epsilon_limits) + [self.paramObj.epsilon_limit]
+
+        self.stepper = None
+        self.statistics = []
+
+    def run(self):
+        '''Calculates all levels, starting with ParameterObject.psi0_choice on the coarsest grid.
+
+        Returns:
+            The ImaginaryTimeStepper instance of the last level. Its DataManager still has the file open.
+        '''
+        psi = None
+        for i, (resolution, epsilon_limit) in enumerate(zip(self.levels, self.epsilon_limits)):
+            last = i == len(self.levels) - 1
+            # the ParameterObject itself is used for the last level, so a custom potential is kept
+            p = self.paramObj if last else self.paramObj.copyWithResolution(*resolution)
+            p.epsilon_limit = epsilon_limit
+
+            if psi is None:
+                psi = WaveFunction2D(p)
+                psi.initPsi_0()
+            else:
+                psi = psi.interpolate(p)
+
+            print("[INFO] Continuation level {} of {}, resolution {}.".format(i+1, len(self.levels), resolution))
+            stepper = ImaginaryTimeStepper(psi, p, in_memory=not last)
+            if last:
+                stepper.dataM.file.attrs['continuation_levels'] = [r[0] for r in self.levels]
+            start = time()
+            getattr(stepper, self.method)()
+            self.statistics.append((resolution, stepper.n, time() - start))
+
+            psi = stepper.psi_n
+            if not last:
+                stepper.dataM.closeFile()
+        self.stepper = stepper
+
+        for resolution, n, seconds in self.statistics:
+            print("[INFO] Resolution {}: {} iterations in {:.2f} s.".format(resolution, n, seconds))
+        return self.stepper
+
+
+class ParameterContinuation:
+    '''This class calculates the ground states along a sequence of values of one parameter, e.g. increasing omega (parameter continuation).
+    Only the first point starts from ParameterObject.psi0_choice, every following point starts from the converged wavefunction of the point before.
+    Neighbouring ground states differ only slightly, so the vortices do not have to be nucleated again for every point,
+    which is the slowest part of the imaginary time flow.
+
+    A warm start keeps the symmetry of the previous ground state. If the next ground state has less symmetry, e.g. an additional vortex
+    enters off center, a small random phase noise can be added to the initial wavefunction to break it.
+
+    Every point is saved to its own file continuation_<index>.hdf5 in the directory, and its row (the value, n, epsilon, E, L, Nabla,
+    the run time and the filename) is appended to the catalog CATALOG_FILENAME as soon as it is finished.
+    Points whose file is already finished are not calculated again, their last frame is the warm start of the next point,
+    so an interrupted continuation continues where it stopped when it is run again.
+
+    Attributes:
+        paramObj: A ParameterObject instance with all other parameters.
+        name: A string, the name of the parameter, see sweep.setParameter.
+        values: A list with the values of the parameter in the order they are calculated.
+        directory: A string, the directory of the files and the catalog.
+        method: A string, 'BFFP' or 'PCG'.
+        phase_noise: A float, the standard deviation of the random phase (in radians) that is added to every warm start. 0 turns it off.
+        rng: A numpy random Generator for the phase noise.
+        results: A list with the catalog row of every point, once run was called.
+    '''
+    def __init__(self, parameterObject, name, values, directory='continuation', method='BFFP', phase_noise=0, seed=None):
+        '''Initializes the instance.
+
+        Arguments:
+            parameterObject: A ParameterObject instance with all other parameters.
+            name: A string, the name of the parameter, e.g. 'omega', 'beta2' or 'potential_alpha'.
+            values: A list of values, e.g. np.linspace(0, 0.95, 20).
+            directory: A string, the directory of the files and the catalog. It is created if it does not exist.
+            method: A string, 'BFFP' or 'PCG'.
+            phase_noise: A float, the standard deviation of the random phase of the warm starts in radians.
+            seed: An optional integer, the seed of the phase noise.
+        '''
+        if type(parameterObject) != ParameterObject:
+            raise TypeError("Parameter parameterObject is not of type ParameterObject")
+        if method not in ('BFFP', 'PCG'):
+            raise ValueError("Method {} not recognized. Available are 'BFFP' and 'PCG'.".format(method))
+        if len(values) == 0:
+            raise ValueError("A continuation needs at least one value.")
+        if phase_noise < 0:
+            raise ValueError("phase_noise has to be positive, not {}.".format(phase_noise))
+        self.paramObj = parameterObject
+        self.name = name
+        self.values = list(values)
+        setParameter(copy.deepcopy(self.paramObj), name, self.values[0])
+        self.directory = directory
+        self.method = method
+        self.phase_noise = phase_noise
+        self.rng = np.random.default_rng(seed)
+        self.results = None
+
+    def getParameterObject(self, index):
+        '''Returns a copy of paramObj with the value of the point index, which is saved to continuation_<index>.hdf5.
+        '''
+        p = copy.deepcopy(self.paramObj)
+        setParameter(p, self.name, self.values[index])
+        p.filename = os.path.join(self.directory, "continuation_{:05d}.hdf5".format(index))
+        # the potential depends on the parameters of the point, the grid caches are rebuilt
+        p.spectralGrid = None
+        p.quadratures = {}
+        p.initV()
+        return p
+
+    def warmStart(self, psi, parameterObject):
+        '''Returns the initial wavefunction of a point from the converged wavefunction psi of the point before.
+        It is interpolated if the grid changed, and phase noise is added if phase_noise > 0.
+
+        Arguments:
+            psi: A WaveFunction2D instance, the ground state of the point before.
+            parameterObject: The ParameterObject instance of the next point.
+
+        Returns:
+            A new WaveFunction2D instance.
+        '''
+        if psi.paramObj.getResolution() != parameterObject.getResolution():
+            psi = psi.interpolate(parameterObject)
+        array = np.array(psi.psi_array, dtype=np.complex128)
+        # a phase does not change |psi|, so the wavefunction stays normalized
+        if self.phase_noise > 0:
+            array *= np.exp(1j * self.rng.normal(0, self.phase_noise, array.shape))
+        psi0 = WaveFunction2D(parameterObject)
+        psi0.setPsi(array)
+        return psi0
+
+    def readPsi(self, parameterObject):
+        '''Returns the last frame of the finished file of a point as a WaveFunction2D instance.
+        '''
+        dataM = DataManager(parameterObject.filename)
+        dataM.loadFile(read_only=True)
+        try:
+            array, attributes = dataM.getDset(dataM.getLastKey())
+        finally:
+            dataM.closeFile()
+        psi = WaveFunction2D(parameterObject)
+        psi.setPsi(np.array(array, dtype=np.complex128))
+        return psi
+
+    def run(self):
+        '''Calculates all points in the order of values and writes the catalog.
+
+        Returns:
+            A list with the catalog row (a dictionary with the parameter and SUMMARY_COLUMNS) of every point.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        catalog = os.path.join(self.directory, CATALOG_FILENAME)
+        self.results = []
+        psi = None
+        with open(catalog, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=[self.name] + list(SUMMARY_COLUMNS))
+            writer.writeheader()
+            for i, value in enumerate(self.values):
+                p = self.getParameterObject(i)
+                row = dict.fromkeys(SUMMARY_COLUMNS, '')
+                row.update({self.name: value, 'method': self.method, 'filename': p.filename})
+                start = time()
+
+                if os.path.isfile(p.filename) and finishedFile(p.filename):
+                    # a finished point is only read, its last frame is the warm start of the next point
+                    print("[INFO] Point {} of {}, {} = {} is already finished.".format(i+1, len(self.values), self.name, value))
+                    psi = self.readPsi(p)
+                else:
+                    print("[INFO] Point {} of {}, {} = {}.".format(i+1, len(self.values), self.name, value))
+                    if psi is None:
+                        psi0 = WaveFunction2D(p)
+                        psi0.initPsi_0()
+                    else:
+                        psi0 = self.warmStart(psi, p)
+                    stepper = ImaginaryTimeStepper(psi0, p)
+                    stepper.dataM.file.attrs['continuation_parameter'] = self.name
+                    getattr(stepper, self.method)()
+                    stepper.dataM.closeFile()
+                    psi = stepper.psi_n
+
+                row.update(readSummary(p.filename))
+                row['seconds'] = time() - start
+                self.results.append(row)
+                # every row is written at once, so the catalog is complete up to the last finished point
+                writer.writerow(row)
+                f.flush()
+                print("[INFO] {} = {}: E = {:.6f} after {} iterations in {:.2f} s.".format(self.name, value, row['E'], row['n'], row['seconds']))
+
+        print("[INFO] Wrote the catalog of the continuation to {}.".format(catalog))
+        return self.results
@@ -1,10 +1,89 @@
+import os
 import numpy as np
 import h5py
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+import zlib
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-from .wave_function import WaveFunction2D
 from .parameter_object import ParameterObject, Psi0Choice, PotentialChoice
+from .observables import ObservableEngine
+
+# optional HDF5 filters, only required if the codec 'blosc' or 'zstd' is selected
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+# name of the group that contains the checkpoint of a running simulation
+CHECKPOINT_KEY = 'checkpoint'
+
+# storage layout of the frames. Version 1 has one dataset with attributes per frame, named by makeKey.
+# Version 2 has a single extendable dataset FRAMES_KEY of shape (n_frames, M, N), with one chunk per frame,
+# and the attributes of the frames are columns of shape (n_frames,) in the group FRAME_ATTRIBUTES_KEY.
+LAYOUT_VERSION = 2
+FRAMES_KEY = 'frames'
+FRAME_ATTRIBUTES_KEY = 'frame_attributes'
+
+# codecs the frames can be compressed with
+CODECS = ('gzip', 'lzf', 'blosc', 'zstd', None)
+
+# number of frames that may wait for the background writer, addDset blocks if the queue is full
+WRITE_QUEUE_SIZE = 4
+
+# name of the group with the time series of every step and the dtype of its columns.
+# n is the step, wall the unix time of the step. Entries that were not calculated, e.g. E for most steps of BFFP, are NaN.
+TIMESERIES_KEY = 'timeseries'
+TIMESERIES_COLUMNS = {
+    'n': np.int64,
+    't': np.float64,
+    'dt': np.float64,
+    'epsilon': np.float64,
+    'alpha': np.float64,
+    'E': np.float64,
+    'L': np.complex128,
+    'Nabla': np.float64,
+    'wall': np.float64
+}
+
+# number of frames the observables are calculated for in one batch by DataManager.calcObservables
+OBSERVABLES_BLOCK_SIZE = 16
+
+def importMatplotlib():
+    '''Imports matplotlib for the plots and animations of DataManager. It is only imported when a plot is made,
+    so the DataManager and the solvers work on machines without matplotlib or a display.
+
+    Returns:
+        A 2-tuple (matplotlib.pyplot, matplotlib.animation).
+    '''
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+    return plt, animation
+
+def calcFrameObservables(frames, parameterObject):
+    '''Calculates the observables of a stack of frames in one batch with ObservableEngine.calcFrameObservables,
+    the same values as WaveFunction2D.calcObservables of every single frame.
+
+    Arguments:
+        frames: A (K, M, N) complex numpy array.
+        parameterObject: A ParameterObject instance with the parameters of the frames, the potential has to be initialized.
+
+    Returns:
+        3 numpy arrays of length K, E, L and Nabla.
+    '''
+    return ObservableEngine(parameterObject).calcFrameObservables(frames)
+
+def calcObservablesBlock(filename, start, stop):
+    '''Opens the file read-only and returns calcFrameObservables of the frames start, ..., stop-1.
+    This runs in the worker processes of DataManager.calcObservables.
+    '''
+    dataM = DataManager(filename)
+    dataM.loadFile(read_only=True)
+    try:
+        return calcFrameObservables(dataM.getFrames(start, stop), dataM.getParameterObject())
+    finally:
+        dataM.closeFile()
 
 class DataManager:
     '''This class handles anything related to the saving of simulated data to .hdf5 data files.
@@ -13,16 +92,38 @@ class DataManager:
         filename: A string that contains the name of the file to open or create.
         file: pyh5 File object, a handle for the file once it is opened.
         fileOpen: A boolean that states whether a file is opened. 
-        compressionAlgo: A string that sets the compression algorithm for pyh5. Default is gzip.
+        compressionAlgo: A string that sets the compression algorithm of the frames, one of CODECS. Default is gzip.
+        compressionLevel: An integer, the compression level of gzip, blosc and zstd.
         incKey: An integer that contains the current number for the next keyframe.
+        in_memory: A boolean, if True newFile creates the file only in memory and nothing is written to the disk.
+        layoutVersion: An integer, the storage layout of the open file (see LAYOUT_VERSION). New files always use the latest layout.
+        async_writes: A boolean, if True addDset only copies the frame and a background thread compresses and writes it.
+        writeQueue: A queue.Queue with the frames that are not written yet, None until the first frame is added.
+        bufferPool: A queue.Queue with the recycled frame buffers of the background writer.
+        bufferDtype: The numpy dtype of the buffers in bufferPool.
+        writer: The threading.Thread of the background writer.
+        writeError: The exception raised in the background writer, it is raised again by the next call of addDset or flush.
     '''
-    def __init__(self, filename="default.hdf5"):
+    def __init__(self, filename="default.hdf5", in_memory=False, compression='gzip', compression_level=4, async_writes=False):
         '''This function initializes this class.'''
         self.filename = filename
+        self.in_memory = in_memory
         self.file = None
         self.fileOpen = False
-        self.compressionAlgo = 'gzip'
+        self.async_writes = async_writes
+        self.writeQueue = None
+        self.bufferPool = None
+        self.bufferDtype = None
+        self.writer = None
+        self.writeError = None
+        if compression not in CODECS:
+            raise ValueError("Compression {} not recognized. Available are {}.".format(compression, CODECS))
+        if compression in ('blosc', 'zstd') and hdf5plugin is None:
+            raise ImportError("The compression '{}' requires hdf5plugin to be installed.".format(compression))
+        self.compressionAlgo = compression
+        self.compressionLevel = compression_level
         self.incKey = 0
+        self.layoutVersion = LAYOUT_VERSION
 
     def __del__(self):
         '''As the destructor of this class this funtion is called when a instance of this class is deleted.
@@ -46,23 +147,34 @@ class DataManager:
         if self.file or self.fileOpen:
             self.closeFile()
             raise Exception("A File was already open! Closed it to be sure...")
-        self.file = h5py.File(self.filename, "w")
+        if self.in_memory:
+            self.file = h5py.File(self.filename, "w", driver='core', backing_store=False)
+        else:
+            self.file = h5py.File(self.filename, "w")
         if self.file:
             print("[INFO] Created new file", self.filename)
         self.fileOpen = True
+        self.layoutVersion = LAYOUT_VERSION
+        self.file.attrs['layout_version'] = LAYOUT_VERSION
+        self.incKey = 0
 
-    def loadFile(self):
-        '''This function will open an already present file in read/write mode. This mode should NOT be used to add more frames to a file,
-        but rather to calculate the observables and display the file.
+    def loadFile(self, read_only=False):
+        '''This function will open an already present file in read/write mode. This mode is used to calculate the observables and display the file.
+        New frames are added after the last frame, which is only done when a simulation is resumed (see ImaginaryTimeStepper.resume).
+
+        Arguments:
+            read_only: A boolean, if True the file is opened in read mode, so several processes can read it at the same time.
         '''
         if self.file or self.fileOpen:
             self.closeFile()
             raise Exception("A File was already open! Closed it to be sure...")
-        self.file = h5py.File(self.filename, "r+")
+        self.file = h5py.File(self.filename, "r" if read_only else "r+")
         if self.file:
             print("[INFO] Loaded file", self.filename)
         self.fileOpen = True
-        self.incKey = self.getNFrames() + 1
+        # files without the attribute were written before the layout was versioned
+        self.layoutVersion = int(self.file.attrs.get('layout_version', 1))
+        self.incKey = int(self.getLastKey()) + 1 if self.getNFrames() > 0 else 0
 
     def closeFile(self):
         '''This function closes any opened files. This function should always be called after the file is no longer used.
@@ -70,8 +182,80 @@ class DataManager:
         if not self.file or not self.fileOpen:
             print("[INFO] No open file present, no need to close anything.")
             return
-        self.file.close()
-        self.fileOpen = False
+        # write all queued frames before the file is closed
+        try:
+            self.stopWriter()
+        finally:
+            self.file.close()
+            self.fileOpen = False
+
+    def startWriter(self, shape, dtype):
+        '''Starts the background writer thread and fills the buffer pool with buffers of the given shape.
+        One more buffer than the queue can hold is needed, since the writer holds one while it writes it.
+        '''
+        self.writeQueue = queue.Queue(WRITE_QUEUE_SIZE)
+        self.bufferPool = queue.Queue()
+        self.bufferDtype = np.dtype(dtype)
+        for _ in range(WRITE_QUEUE_SIZE + 1):
+            self.bufferPool.put(np.empty(shape, dtype=dtype))
+        self.writeError = None
+        # daemon thread, so a DataManager that was never closed does not keep the interpreter alive
+        self.writer = threading.Thread(target=self.writerLoop, name='DataManager writer', daemon=True)
+        self.writer.start()
+
+    def writerLoop(self):
+        '''The loop of the background writer, it writes the queued frames in order until it gets None.
+        After an error the remaining frames are dropped, the error is raised in the main thread.
+        '''
+        while True:
+            job = self.writeQueue.get()
+            if job is None:
+                self.writeQueue.task_done()
+                return
+            key, array, attributes = job
+            try:
+                if self.writeError is None:
+                    self.writeFrame(key, array, attributes)
+            except Exception as e:
+                self.writeError = e
+            finally:
+                self.bufferPool.put(array)
+                self.writeQueue.task_done()
+
+    def flush(self):
+        '''Waits until the background writer has written all queued frames.
+        Raises the exception of the writer, if there was one.
+        '''
+        if self.writeQueue is not None:
+            self.writeQueue.join()
+        if self.writeError is not None:
+            e, self.writeError = self.writeError, None
+            raise e
+
+    def stopWriter(self):
+        '''Writes all queued frames and stops the background writer thread, if it is running.
+        '''
+        if self.writer is None:
+            return
+        self.writeQueue.put(None)
+        self.writer.join()
+        self.writer = None
+        self.writeQueue = None
+        self.bufferPool = None
+        self.flush()
+
+    def getCompressionArguments(self):
+        '''Returns a dictionary with the keyword arguments of h5py.Group.create_dataset for the selected compression.
+        '''
+        if self.compressionAlgo == 'gzip':
+            return {'compression': 'gzip', 'compression_opts': self.compressionLevel}
+        elif self.compressionAlgo == 'lzf':
+            return {'compression': 'lzf'}
+        elif self.compressionAlgo == 'blosc':
+            return dict(hdf5plugin.Blosc(cname='zstd', clevel=self.compressionLevel, shuffle=hdf5plugin.Blosc.SHUFFLE))
+        elif self.compressionAlgo == 'zstd':
+            return dict(hdf5plugin.Zstd(clevel=self.compressionLevel))
+        return {}
 
     def addDset(self, array, attributes):
         '''This function adds a frame of simulation and adds it to the file. This should be used to add a frame to the file.
@@ -83,10 +267,70 @@ class DataManager:
         # make a new key
         key = "{:05d}".format(self.incKey)
         self.incKey += 1
-        # save array
-        self.file.create_dataset(key, array.shape, dtype=array.dtype, data=array, compression=self.compressionAlgo)
-        for a in attributes:
-            self.file[key].attrs[a] = attributes[a]
+        if not self.async_writes:
+            self.writeFrame(key, array, attributes)
+            return
+
+        # the buffers have the dtype of the first frame, they are replaced if it changes, e.g. when BFFP switches to double precision
+        if self.writer is not None and self.bufferDtype != array.dtype:
+            self.stopWriter()
+        if self.writer is None:
+            self.startWriter(array.shape, array.dtype)
+        if self.writeError is not None:
+            self.flush()
+        # blocks until the writer returns a buffer if all of them are queued, the caller may change array afterwards
+        buffer = self.bufferPool.get()
+        np.copyto(buffer, array)
+        self.writeQueue.put((key, buffer, dict(attributes)))
+
+    def writeFrame(self, key, array, attributes):
+        '''Writes a frame to the file, this is called by addDset or the background writer.
+        '''
+        if self.layoutVersion == 1:
+            # save array
+            self.file.create_dataset(key, array.shape, dtype=array.dtype, data=array, **self.getCompressionArguments())
+            for a in attributes:
+                self.file[key].attrs[a] = attributes[a]
+            return
+
+        # the frames dataset is created with the first frame, since its shape is not known before
+        if FRAMES_KEY not in self.file:
+            self.file.create_dataset(FRAMES_KEY, (0,) + array.shape, dtype=array.dtype, maxshape=(None,) + array.shape,
+                chunks=(1,) + array.shape, **self.getCompressionArguments())
+            self.file.create_group(FRAME_ATTRIBUTES_KEY)
+        frames = self.file[FRAMES_KEY]
+        # a frame is never stored at a lower precision than it was calculated in, e.g. after BFFP switched from single to double precision
+        if np.result_type(frames.dtype, array.dtype) != frames.dtype:
+            frames = self.widenFrames(np.result_type(frames.dtype, array.dtype))
+        array = np.ascontiguousarray(array, dtype=frames.dtype)
+        i = frames.shape[0]
+        frames.resize(i + 1, axis=0)
+        # every frame is exactly one chunk. zlib releases the GIL while it compresses, so the solver keeps running
+        # during the compression, and the compressed chunk is written directly, which bypasses the filters of HDF5
+        if self.compressionAlgo == 'gzip':
+            frames.id.write_direct_chunk((i, 0, 0), zlib.compress(np.ascontiguousarray(array), self.compressionLevel))
+        elif self.compressionAlgo is None:
+            frames.id.write_direct_chunk((i, 0, 0), np.ascontiguousarray(array).tobytes())
+        else:
+            frames[i] = array
+        self.setFrameAttributes(key, attributes)
+
+    def widenFrames(self, dtype):
+        '''Converts the frames dataset to a wider dtype, e.g. complex64 to complex128. The frames are copied one by one
+        to a new dataset, which replaces the old one. This happens at most once per simulation.
+
+        Returns:
+            The new frames dataset.
+        '''
+        old = self.file[FRAMES_KEY]
+        print("[INFO] Storing the frames in {} from now on.".format(np.dtype(dtype)))
+        new = self.file.create_dataset(FRAMES_KEY + '_widened', old.shape, dtype=dtype, maxshape=old.maxshape,
+            chunks=old.chunks, **self.getCompressionArguments())
+        for i in range(old.shape[0]):
+            new[i] = old[i]
+        del self.file[FRAMES_KEY]
+        self.file.move(FRAMES_KEY + '_widened', FRAMES_KEY)
+        return self.file[FRAMES_KEY]
 
     def getDset(self, key):
         '''Returns a dataset and its attributes for a given key.
@@ -97,11 +341,98 @@ class DataManager:
             A tupel with 2 elements. The first entry is the array itself and
             the second entry is a dictionary that contains the attributes of that frame.
             (array, attributes)'''
-        return np.array(self.file[key]), self.file[key].attrs
+        self.flush()
+        if self.layoutVersion == 1:
+            return np.array(self.file[key]), self.file[key].attrs
+        return self.file[FRAMES_KEY][int(key)], self.getFrameAttributes(key)
+
+    def getFrames(self, start=0, stop=None):
+        '''Returns the frames start, ..., stop-1 as one (n, M, N) numpy array, which is a single read in layout version 2.
+
+        Arguments:
+            start, stop: Integers, the range of the frames like in a slice. By default all frames are returned.
+        '''
+        self.flush()
+        if self.layoutVersion == 1:
+            return np.array([self.getDset(key)[0] for key in self.getFrameKeys()[start:stop]])
+        return self.file[FRAMES_KEY][start:stop]
+
+    def getFrameAttributes(self, key):
+        '''Returns a dictionary with the attributes of the frame with the given key.
+        '''
+        self.flush()
+        if self.layoutVersion == 1:
+            return dict(self.file[key].attrs)
+        i = int(key)
+        columns = self.file[FRAME_ATTRIBUTES_KEY]
+        return {a: columns[a][i] for a in columns}
+
+    def setFrameAttributes(self, key, attributes):
+        '''Adds attributes to the frame with the given key or overwrites them.
+
+        Arguments:
+            key: A string that has to be the key for a frame in the file.
+            attributes: A dictionary with the attributes.
+        '''
+        if self.layoutVersion == 1:
+            for a in attributes:
+                self.file[key].attrs[a] = attributes[a]
+            return
+
+        # every attribute is a column with one entry per frame, frames without the attribute contain the fill value
+        i = int(key)
+        n_frames = self.file[FRAMES_KEY].shape[0]
+        columns = self.file[FRAME_ATTRIBUTES_KEY]
+        for a in columns:
+            if columns[a].shape[0] != n_frames:
+                columns[a].resize(n_frames, axis=0)
+        for a in attributes:
+            if a not in columns:
+                dtype = np.asarray(attributes[a]).dtype
+                fillvalue = -1 if np.issubdtype(dtype, np.integer) else np.array(np.nan, dtype=dtype)
+                columns.create_dataset(a, (n_frames,), dtype=dtype, maxshape=(None,), chunks=(1024,), fillvalue=fillvalue)
+            columns[a][i] = attributes[a]
+
+    def setFrameAttributeColumn(self, name, values):
+        '''Sets one attribute of all frames, which is a single write in layout version 2.
+
+        Arguments:
+            name: A string, the name of the attribute, e.g. 'E'.
+            values: A 1D array with one value for every frame.
+        '''
+        if self.layoutVersion == 1:
+            for key, value in zip(self.getFrameKeys(), values):
+                self.file[key].attrs[name] = value
+            return
+        columns = self.file[FRAME_ATTRIBUTES_KEY]
+        if name in columns:
+            del columns[name]
+        values = np.asarray(values)
+        columns.create_dataset(name, data=values, maxshape=(None,), chunks=(1024,), fillvalue=np.array(np.nan, dtype=values.dtype))
+
+    def getFrameAttributeColumn(self, name):
+        '''Returns one attribute of all frames as a numpy array, which is a single read in layout version 2.
+
+        Arguments:
+            name: A string, the name of the attribute, e.g. 't'.
+        '''
+        self.flush()
+        if self.layoutVersion == 1:
+            return np.array([self.file[key].attrs[name] for key in self.getFrameKeys()])
+        return self.file[FRAME_ATTRIBUTES_KEY][name][:]
 
     def removeDset(self, key):
-        '''Deletes a dataset given a valid key.'''
-        del self.file[key]
+        '''Deletes a dataset given a valid key. In layout version 2 only the last frame can be deleted.'''
+        if self.layoutVersion == 1:
+            del self.file[key]
+            return
+        n_frames = self.file[FRAMES_KEY].shape[0]
+        if int(key) != n_frames - 1:
+            raise ValueError("Only the last frame can be deleted, {} is not the last frame.".format(key))
+        self.file[FRAMES_KEY].resize(n_frames - 1, axis=0)
+        columns = self.file[FRAME_ATTRIBUTES_KEY]
+        for a in columns:
+            columns[a].resize(n_frames - 1, axis=0)
     
     def numberDsets(self):
         '''Returns the number of datasets in a file.'''
@@ -118,15 +449,161 @@ class DataManager:
         '''
         return "{:05d}".format(key)
     
+    def getFrameKeys(self):
+        '''Returns a sorted list of the keys of all frames. Other groups in the file, like the checkpoint, are left out.
+        '''
+        self.flush()
+        if self.layoutVersion == 1:
+            return sorted(key for key in self.file.keys() if key.isdigit())
+        if FRAMES_KEY not in self.file:
+            return []
+        return [self.makeKey(i) for i in range(self.file[FRAMES_KEY].shape[0])]
+
     def getNFrames(self):
         '''Returns the number of datasets in a file.
         '''
-        return len(self.file.keys())
+        return len(self.getFrameKeys())
 
     def getLastKey(self):
         '''Returns the key of the frame with the highest integer key, which should be the last frame.
         '''
-        return list(self.file.keys())[-1]
+        return self.getFrameKeys()[-1]
+
+    def removeFramesAfter(self, n):
+        '''Deletes all frames whose time step is larger than n, the next frame gets the key after the last remaining frame.
+        This is used when a simulation is resumed from a checkpoint, since these frames are calculated again.
+
+        Arguments:
+            n: An integer, the time step of the checkpoint.
+        '''
+        for key in reversed(self.getFrameKeys()):
+            if self.getFrameAttributes(key)['n'] <= n:
+                break
+            self.removeDset(key)
+        self.incKey = int(self.getLastKey()) + 1 if self.getNFrames() > 0 else 0
+
+        # the steps are appended in order, so the rows after n are at the end of the time series
+        if TIMESERIES_KEY in self.file:
+            rows = np.searchsorted(self.file[TIMESERIES_KEY]['n'][:], n, side='right')
+            for column in self.file[TIMESERIES_KEY].values():
+                column.resize(rows, axis=0)
+
+    def appendTimeSeries(self, columns):
+        '''Appends rows to the time series, every column is written with a single call.
+
+        Arguments:
+            columns: A dictionary with names of TIMESERIES_COLUMNS as keys and 1D arrays of the same length as values.
+                     Columns that are not given are filled with NaN (-1 for n).
+        '''
+        for name in columns:
+            if name not in TIMESERIES_COLUMNS:
+                raise ValueError("Column {} not recognized. Available are {}.".format(name, tuple(TIMESERIES_COLUMNS)))
+        lengths = set(len(values) for values in columns.values())
+        if len(lengths) != 1:
+            raise ValueError("All columns must have the same length.")
+        length = lengths.pop()
+
+        if TIMESERIES_KEY not in self.file:
+            group = self.file.create_group(TIMESERIES_KEY)
+            for name, dtype in TIMESERIES_COLUMNS.items():
+                fillvalue = -1 if name == 'n' else np.array(np.nan, dtype=dtype)
+                group.create_dataset(name, (0,), dtype=dtype, maxshape=(None,), chunks=(4096,), fillvalue=fillvalue)
+        group = self.file[TIMESERIES_KEY]
+        rows = group['n'].shape[0]
+        for name in TIMESERIES_COLUMNS:
+            group[name].resize(rows + length, axis=0)
+            if name in columns:
+                group[name][rows:] = columns[name]
+
+    def getTimeSeries(self, *names):
+        '''Returns columns of the time series, every column is read with a single call.
+
+        Arguments:
+            names: Strings, the names of the columns. By default all columns are returned.
+
+        Returns:
+            A dictionary with the names as keys and 1D numpy arrays as values, which are empty if the file has no time series.
+        '''
+        names = names or tuple(TIMESERIES_COLUMNS)
+        if TIMESERIES_KEY not in self.file:
+            return {name: np.zeros(0, dtype=TIMESERIES_COLUMNS[name]) for name in names}
+        return {name: self.file[TIMESERIES_KEY][name][:] for name in names}
+
+    def writeCheckpoint(self, array, attributes):
+        '''Writes psi and the state of a simulation to the checkpoint group, which is overwritten by every call.
+        The file is flushed, so the checkpoint is complete on the disk even if the process is killed afterwards.
+
+        Arguments:
+            array: A 2D complex numpy array, psi of the current time step.
+            attributes: A dictionary that contains the state of the simulation, e.g. n, t and dt.
+        '''
+        # the frames before the checkpoint have to be on the disk as well
+        self.flush()
+        if CHECKPOINT_KEY not in self.file:
+            self.file.create_group(CHECKPOINT_KEY)
+        group = self.file[CHECKPOINT_KEY]
+        if 'psi' not in group or group['psi'].shape != array.shape or group['psi'].dtype != array.dtype:
+            if 'psi' in group:
+                del group['psi']
+            group.create_dataset('psi', array.shape, dtype=array.dtype)
+        group['psi'][...] = array
+        for a in attributes:
+            group.attrs[a] = attributes[a]
+        self.file.flush()
+
+    def readCheckpoint(self):
+        '''Returns the checkpoint of the file.
+
+        Returns:
+            A tuple (array, attributes) like getDset or None if the file has no checkpoint.
+        '''
+        if CHECKPOINT_KEY not in self.file:
+            return None
+        group = self.file[CHECKPOINT_KEY]
+        return np.array(group['psi']), dict(group.attrs)
+
+    def removeCheckpoint(self):
+        '''Deletes the checkpoint, if there is one.
+        '''
+        if CHECKPOINT_KEY in self.file:
+            del self.file[CHECKPOINT_KEY]
+
+    def getParameterObject(self):
+        '''Creates a ParameterObject from the global attributes of the file. The potential is initialized.
+        Attributes that are missing in files written by older versions get their default values.
+        '''
+        file_attr = self.file.attrs
+        V_param = {
+            "gamma_y" : file_attr['potential_gamma_y'],
+            "alpha" : file_attr['potential_alpha'],
+            "V0" : file_attr['potential_V0'],
+            "kappa_optic" : file_attr['potential_kappa_optic'],
+            "kappa_quartic" : file_attr['potential_kappa_quartic']
+        }
+        psi0_param = {
+            "gamma_y" : file_attr['psi0_gamma_y'],
+            "sigma" : file_attr['psi0_sigma'],
+            "x0" : file_attr['psi0_x0'],
+            "y0" : file_attr['psi0_y0']
+        }
+        p = ParameterObject(resolutionX=int(file_attr['resX']), resolutionY=int(file_attr['resY']),
+        x_low=file_attr['x_low'], x_high=file_attr['x_high'], y_low=file_attr['y_low'], y_high=file_attr['y_high'],
+        beta2=file_attr['beta'], omega=file_attr['omega'],
+        epsilon_limit=file_attr['epsilon_limit'], epsilon_threshold=file_attr['epsilon_threshold'], dt=file_attr['dt'],
+        maxIterations=int(file_attr['maxIterations']), filename=self.filename,
+        potential_choice=PotentialChoice(int(file_attr['potential_choice'])), potential_parameters=V_param,
+        psi0_choice=Psi0Choice(int(file_attr['psi0_choice'])), psi0_parameters=psi0_param,
+        fft_backend=file_attr.get('fft_backend', 'numpy'), fft_threads=int(file_attr.get('fft_threads', 1)),
+        anderson_depth=int(file_attr.get('anderson_depth', 0)), anderson_start=file_attr.get('anderson_start', 1e-4),
+        adaptive_dt=bool(file_attr.get('adaptive_dt', False)), dt_safety=file_attr.get('dt_safety', 0.9),
+        checkpoint_interval=int(file_attr.get('checkpoint_interval', 0)),
+        compression=file_attr.get('compression', 'gzip') or None, compression_level=int(file_attr.get('compression_level', 4)),
+        async_writes=bool(file_attr.get('async_writes', True)),
+        inline_observables=bool(file_attr.get('inline_observables', False)),
+        observables_interval=int(file_attr.get('observables_interval', 0)),
+        precision=file_attr.get('precision', 'double'), precision_switch=file_attr.get('precision_switch', 1e-4))
+        p.initV()
+        return p
 
     def listInfo(self):
         '''A function that prints out all global attributes, of the file.
@@ -157,12 +634,7 @@ class DataManager:
     def listFrames(self):
         '''This functions returns a list that contains the arrays of each dataset.
         '''
-        #each dataset is a frame, so each key is a frame
-        frames = []
-        for key in self.file.keys():
-            frame, _ = self.getDset(key)
-            frames.append(frame)
-        return frames
+        return list(self.getFrames())
 
     def saveFrames(self, filename='default.mp4', fps=10, dpi=500, dynamic_colorbar=True):
         '''This function saves the sequence of datasets to a .mp4 video file. This will only work if ffmpeg is installed on the system.
@@ -173,6 +645,7 @@ class DataManager:
             dpi: An integer that determines the resolution of the video.
             dynamic_colorbar: A boolean that determines whether the range of the colorbar changes to have the optimal display range.
         '''
+        plt, animation = importMatplotlib()
         print("[INFO] Saving data to .mp4 file...")
         fig, ax = plt.subplots()
         shape = (self.file.attrs['resX'], self.file.attrs['resY'])
@@ -209,6 +682,7 @@ class DataManager:
     def displayLastFrame(self, figsize=(10, 8)):
         '''This function produces a plot that shows the last frame of the simulation, which should be the ground state.
         '''
+        plt, animation = importMatplotlib()
         frame, attributes = self.getDset(self.getLastKey())
         frame = np.abs(frame)**2
         vmin = np.min(frame)
@@ -230,8 +704,14 @@ class DataManager:
             self.file.attrs['calculated_observables'] = False
         return file_attr['calculated_observables']
 
-    def calcObservables(self):
+    def calcObservables(self, processes=1, block_size=OBSERVABLES_BLOCK_SIZE):
         '''This function checks if the observables have to be calculated and does so if they are not.
+        The frames are read and calculated in blocks (see calcFrameObservables), which can be distributed over a pool of processes.
+        The worker processes are spawned, so the script that calls this has to use an if __name__ == '__main__': guard.
+
+        Arguments:
+            processes: An integer, the number of worker processes. None uses one per CPU, 1 calculates every block in this process.
+            block_size: An integer, the number of frames per block.
         '''
         file_attr = self.file.attrs
         try:
@@ -246,42 +726,35 @@ class DataManager:
             # they have to be calculated.
             # create a parameter object from the global attributes.
             print("[INFO] Calculating Observables now, this may take a while.")
-            V_param = {
-                "gamma_y" : file_attr['potential_gamma_y'],
-                "alpha" : file_attr['potential_alpha'],
-                "V0" : file_attr['potential_V0'],
-                "kappa_optic" : file_attr['potential_kappa_optic'],
-                "kappa_quartic" : file_attr['potential_kappa_quartic']
-            }
-            p = ParameterObject(resolutionX=file_attr['resX'], resolutionY=file_attr['resY'],
-            x_low=file_attr['x_low'], x_high=file_attr['x_high'], y_low=file_attr['y_low'], y_high=file_attr['y_high'],
-            beta2=file_attr['beta'], omega=file_attr['omega'], potential_choice=file_attr['potential_choice'],
-            potential_parameters=V_param)
-
-            p.initV()
-            w = WaveFunction2D(p)
-
-            # calculate the observables for every frame
-            for i in range(self.getNFrames()):
-                # get dataset and calculate precursor components
-                array, _ = self.getDset(self.makeKey(i))
-                w.setPsi(array)
-                w.calcFFT()
-                w.calcL()
-                w.calcNabla()
-
-                # calculate and add observables as attributes to the dataset (frame)
-                self.file[self.makeKey(i)].attrs['E'] = w.calcEnergy()
-                self.file[self.makeKey(i)].attrs['L'] = w.calcL_expectation()
-                self.file[self.makeKey(i)].attrs['Nabla'] = w.calcNabla_expectation()
+            n_frames = self.getNFrames()
+            starts = list(range(0, n_frames, block_size))
+            stops = [min(start + block_size, n_frames) for start in starts]
+            processes = processes or os.cpu_count()
+
+            if processes == 1 or len(starts) < 2 or self.in_memory:
+                p = self.getParameterObject()
+                results = [calcFrameObservables(self.getFrames(start, stop), p) for start, stop in zip(starts, stops)]
+            else:
+                # the workers open the file read-only, which HDF5 does not allow while it is open for writing in this process.
+                # They are spawned instead of forked, since a fork after the numba threads were started can deadlock.
+                self.closeFile()
+                try:
+                    with ProcessPoolExecutor(min(processes, len(starts)), mp_context=multiprocessing.get_context('spawn')) as pool:
+                        results = list(pool.map(calcObservablesBlock, [self.filename]*len(starts), starts, stops))
+                finally:
+                    self.loadFile()
+
+            # add the observables as attributes to the frames, one column at a time
+            for name, values in zip(('E', 'L', 'Nabla'), zip(*results)):
+                self.setFrameAttributeColumn(name, np.concatenate(values))
             self.file.attrs['calculated_observables'] = True
             print("[INFO] Calculated the obsevables successfully.")
 
     def getObservables(self):
-        '''This function returns list for every observable for every frame.
+        '''This function returns an array for every observable for every frame.
 
         Returns:
-            4 lists with length equal to the number of frames which contain the observable value for every frame.
+            4 numpy arrays with length equal to the number of frames which contain the observable value for every frame.
             The order of the lists is
 
             E, L, Nabla, t
@@ -293,18 +766,13 @@ class DataManager:
             t: time of the step
         '''
         self.calcObservables()
-        E, L, Nabla, t = [], [], [], []
-        for i in range(self.getNFrames()):
-            attributes = self.file[self.makeKey(i)].attrs
-            t.append(attributes['t'])
-            E.append(attributes['E'])
-            L.append(attributes['L'])
-            Nabla.append(attributes['Nabla'])
+        E, L, Nabla, t = [self.getFrameAttributeColumn(name) for name in ('E', 'L', 'Nabla', 't')]
         return E, L, Nabla, t
 
     def plotObservables(self):
         '''Produces a plot that shows the observables over time.
         '''
+        plt, animation = importMatplotlib()
         E, L, Nabla, t = self.getObservables()
         
         plt.plot(t, E, label='E')
@@ -322,6 +790,7 @@ class DataManager:
             figsize: A 2-tuple of integers that determines the size of the display.
         '''
         # set up the matplotlib figure
+        plt, animation = importMatplotlib()
         fig, ax = plt.subplots(figsize=figsize)
         shape = (self.file.attrs['resX'], self.file.attrs['resY'])
         data = np.random.rand(*shape)
@@ -372,6 +841,7 @@ class DataManager:
             figsize: A 2-tuple of integers that determines the size of the display.
         '''
         # set up matplotlib figure
+        plt, animation = importMatplotlib()
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=figsize)
         shape = (self.file.attrs['resX'], self.file.attrs['resY'])
         data = np.random.rand(*shape)
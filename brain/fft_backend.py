@@ -0,0 +1,219 @@
+import os
+import pickle
+import numpy as np
+
+# optional FFT libraries, only required if the corresponding backend is selected
+try:
+    import scipy.fft as scipy_fft
+except ImportError:
+    scipy_fft = None
+
+try:
+    import pyfftw
+except ImportError:
+    pyfftw = None
+
+# the convention used in this package is psi_hat = fft(psi)/(M*N) and psi = ifft(psi_hat)*(M*N),
+# which is exactly the 'forward' normalization mode. This way no extra normalization pass is needed.
+NORM = 'forward'
+
+# numpy.fft has an out argument since numpy 2.0
+NUMPY_FFT_OUT = int(np.__version__.split('.')[0]) >= 2
+
+# the 2D transforms always act on the last two axes, so stacks of arrays (k, M, N) are transformed as a batch
+AXES = (-2, -1)
+
+
+class FFTBackend:
+    '''Base class of all FFT backends. A backend calculates the 2D fourier transform over the last two axes of an array,
+    using the normalization convention of this package.
+
+    Attributes:
+        name: A string that identifies the backend.
+        threads: An integer, the number of threads the backend may use.
+    '''
+    name = None
+
+    def __init__(self, threads=1):
+        '''Initializes the instance.
+
+        Arguments:
+            threads: An integer, the number of threads the backend may use.
+        '''
+        self.threads = max(1, int(threads))
+
+    def fft2(self, array, out=None):
+        '''Calculates the forward transform, array/(M*N) is already included.
+
+        Arguments:
+            array: A numpy array with at least 2 dimensions.
+            out: An optional complex numpy array with the same shape as array, which the result is written into.
+                 It may be array itself, then the transform is done in place.
+
+        Returns:
+            The transformed array.
+        '''
+        raise NotImplementedError
+
+    def ifft2(self, array, out=None):
+        '''Calculates the inverse transform, the factor M*N is already included.
+        The arguments are the same as for fft2.
+        '''
+        raise NotImplementedError
+
+
+class NumpyFFTBackend(FFTBackend):
+    '''FFT backend that uses numpy.fft. It is single threaded and always available.
+    '''
+    name = 'numpy'
+
+    def _transform(self, func, array, out):
+        # numpy >= 2.0 writes directly into out, older versions have no out argument, so the result is copied
+        if NUMPY_FFT_OUT:
+            return func(array, axes=AXES, norm=NORM, out=out)
+        result = func(array, axes=AXES, norm=NORM)
+        if out is None:
+            return result
+        out[...] = result
+        return out
+
+    # fftn is used since fft2 does not respect out in every version
+    def fft2(self, array, out=None):
+        return self._transform(np.fft.fftn, array, out)
+
+    def ifft2(self, array, out=None):
+        return self._transform(np.fft.ifftn, array, out)
+
+
+class ScipyFFTBackend(FFTBackend):
+    '''FFT backend that uses scipy.fft with multiple workers.
+    If out is given, the input is copied into out and the transform is done in place with overwrite_x.
+    '''
+    name = 'scipy'
+
+    def __init__(self, threads=1):
+        if scipy_fft is None:
+            raise ImportError("The FFT backend 'scipy' requires scipy to be installed.")
+        FFTBackend.__init__(self, threads)
+
+    def _transform(self, func, array, out):
+        if out is None:
+            return func(array, axes=AXES, norm=NORM, workers=self.threads)
+        if out is not array:
+            np.copyto(out, array)
+        result = func(out, axes=AXES, norm=NORM, workers=self.threads, overwrite_x=True)
+        # scipy only overwrites the input if it is possible, so copy if it did not
+        if result is not out and not np.shares_memory(result, out):
+            np.copyto(out, result)
+        return out
+
+    def fft2(self, array, out=None):
+        return self._transform(scipy_fft.fftn, array, out)
+
+    def ifft2(self, array, out=None):
+        return self._transform(scipy_fft.ifftn, array, out)
+
+
+class PyFFTWBackend(FFTBackend):
+    '''FFT backend that uses pyFFTW. Every shape and data type gets its own preplanned transform,
+    the plans are reused for every call and the FFTW wisdom is saved to a file so planning is fast next time.
+
+    Attributes:
+        wisdom_file: A string, the path of the file the wisdom is stored in.
+        planner_effort: A string, the FFTW planner flag.
+        plans: A dictionary that maps (shape, dtype, direction) to pyfftw.FFTW objects.
+    '''
+    name = 'pyfftw'
+
+    def __init__(self, threads=1, wisdom_file=None, planner_effort='FFTW_MEASURE'):
+        if pyfftw is None:
+            raise ImportError("The FFT backend 'pyfftw' requires pyFFTW to be installed.")
+        FFTBackend.__init__(self, threads)
+        if wisdom_file is None:
+            wisdom_file = os.path.join(os.path.expanduser('~'), '.bec_numeric', 'fftw_wisdom.pickle')
+        self.wisdom_file = wisdom_file
+        self.planner_effort = planner_effort
+        self.plans = {}
+        self.loadWisdom()
+
+    def loadWisdom(self):
+        '''Imports the FFTW wisdom from wisdom_file, if it exists.
+        '''
+        if os.path.isfile(self.wisdom_file):
+            try:
+                with open(self.wisdom_file, 'rb') as f:
+                    pyfftw.import_wisdom(pickle.load(f))
+            except (pickle.UnpicklingError, EOFError, ValueError) as e:
+                print("[WARNING] Could not read the FFTW wisdom {}: {}".format(self.wisdom_file, e))
+
+    def saveWisdom(self):
+        '''Exports the FFTW wisdom to wisdom_file. It is written to a temporary file of this process and then replaces wisdom_file
+        in one step, so processes that plan at the same time (e.g. the workers of a sweep) never read or write a partly written file.
+        '''
+        os.makedirs(os.path.dirname(self.wisdom_file) or '.', exist_ok=True)
+        tmp = "{}.{}.tmp".format(self.wisdom_file, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(pyfftw.export_wisdom(), f)
+        os.replace(tmp, self.wisdom_file)
+
+    def getPlan(self, shape, dtype, direction):
+        '''Returns the (cached) in-place plan for a given shape, dtype and direction.
+        '''
+        key = (tuple(shape), np.dtype(dtype), direction)
+        if key not in self.plans:
+            # planning overwrites the arrays, so it is done on a scratch array
+            buffer = pyfftw.empty_aligned(shape, dtype=dtype)
+            self.plans[key] = pyfftw.FFTW(buffer, buffer, axes=AXES, direction=direction,
+                flags=(self.planner_effort,), threads=self.threads)
+            self.saveWisdom()
+        return self.plans[key]
+
+    def _transform(self, array, out, direction):
+        dtype = np.result_type(array.dtype, np.complex64)
+        if out is None:
+            out = pyfftw.empty_aligned(array.shape, dtype=dtype)
+        if out is not array:
+            np.copyto(out, array)
+        plan = self.getPlan(out.shape, out.dtype, direction)
+        # execute() does no normalization at all, the plan is pointed to out if it is aligned
+        if out.flags.c_contiguous and pyfftw.is_byte_aligned(out, n=plan.input_alignment):
+            plan.update_arrays(out, out)
+            plan.execute()
+        else:
+            plan.input_array[...] = out
+            plan.execute()
+            out[...] = plan.output_array
+        return out
+
+    def fft2(self, array, out=None):
+        out = self._transform(array, out, 'FFTW_FORWARD')
+        # FFTW has no forward normalization, so the factor 1/(M*N) is applied in place
+        out *= 1/np.prod(out.shape[-2:])
+        return out
+
+    def ifft2(self, array, out=None):
+        return self._transform(array, out, 'FFTW_BACKWARD')
+
+
+FFT_BACKENDS = {
+    NumpyFFTBackend.name: NumpyFFTBackend,
+    ScipyFFTBackend.name: ScipyFFTBackend,
+    PyFFTWBackend.name: PyFFTWBackend,
+}
+
+# backends are shared, so the plans are only made once per process
+_backend_instances = {}
+
+def getFFTBackend(name='numpy', threads=1):
+    '''Returns the (shared) FFT backend instance for the given name and number of threads.
+
+    Arguments:
+        name: A string, one of 'numpy', 'scipy' or 'pyfftw'.
+        threads: An integer, the number of threads the backend may use.
+    '''
+    if name not in FFT_BACKENDS:
+        raise ValueError("FFT backend {} not recognized. Available are {}.".format(name, list(FFT_BACKENDS.keys())))
+    key = (name, max(1, int(threads)))
+    if key not in _backend_instances:
+        _backend_instances[key] = FFT_BACKENDS[name](threads=threads)
+    return _backend_instances[key]
@@ -0,0 +1,276 @@
+# References used in comments:
+# [1] Zeng, R & Zhang, Yanzhi. (2009). Efficiently computing vortex lattices in rapid rotating Bose–Einstein condensates.
+#     Computer Physics Communications. 180. 854-860. 10.1016/j.cpc.2008.12.003.
+#
+# Fused numba kernels for the BFFP scheme. Every kernel does a single sweep over the arrays
+# instead of one numpy pass per term, since the time step is limited by memory bandwidth.
+
+import numpy as np
+from numba import njit, prange
+
+@njit(parallel=True, fastmath=True, cache=True)
+def real_space_stage(V, beta2, omega, psi, Dx_psi, Dy_psi, x, y, L_psi, G0):
+    '''Calculates the real space part of a BFFP step in a single sweep.
+
+    L_psi = x*D_y(psi) - y*D_x(psi) and G0 = omega*L_psi - (V + beta2*|psi|^2)*psi are written into the given arrays,
+    at the same time the minimum and maximum of b = V + beta2*|psi|^2 are reduced for the stabilization parameter.
+    G0 is G_m [1] without the term alpha*psi, which is added in fourier space by spectral_stage.
+
+    Arguments:
+        V: A real 2D numpy array, the potential.
+        beta2, omega: Floats, the physical parameters.
+        psi, Dx_psi, Dy_psi: Complex 2D numpy arrays, the wave function and its spatial derivatives.
+        x, y: 1D numpy arrays with the coordinates.
+        L_psi, G0: Complex 2D numpy arrays the results are written into.
+
+    Returns:
+        A 2-tuple (bmin, bmax).
+    '''
+    M, N = psi.shape
+    bmin = np.inf
+    bmax = -np.inf
+    for i in prange(M):
+        for j in range(N):
+            p = psi[i, j]
+            b = V[i, j] + beta2*(p.real*p.real + p.imag*p.imag)
+            bmin = min(bmin, b)
+            bmax = max(bmax, b)
+            L = x[i]*Dy_psi[i, j] - y[j]*Dx_psi[i, j]
+            L_psi[i, j] = L
+            G0[i, j] = omega*L - b*p
+    return bmin, bmax
+
+@njit(parallel=True, fastmath=True, cache=True)
+def spectral_stage(psi_hat, G0_hat, k2, dt, alpha, out):
+    '''Calculates the fourier transform of the next time step of the BFFP scheme [1] in a single sweep.
+
+    out = (psi_hat + dt*(alpha*psi_hat + G0_hat)) * 2/(2 + dt*(2*alpha + k2)), which is the same as (psi_hat + dt*G_m_hat) * denominator
+    since the fourier transform is linear. The denominator is calculated on the fly, so it does not need its own pass. out may be G0_hat itself.
+    '''
+    M, N = psi_hat.shape
+    c = 1 + dt*alpha
+    d = 2 + 2*dt*alpha
+    for i in prange(M):
+        for j in range(N):
+            out[i, j] = (c*psi_hat[i, j] + dt*G0_hat[i, j]) * (2 / (d + dt*k2[i, j]))
+
+@njit(parallel=True, fastmath=True, cache=True)
+def interior_norm2(psi):
+    '''Returns the sum of |psi|^2 without the boundary, which is used for the normalization [1].
+    '''
+    M, N = psi.shape
+    s = 0.0
+    for i in prange(1, M-1):
+        for j in range(1, N-1):
+            p = psi[i, j]
+            s += p.real*p.real + p.imag*p.imag
+    return s
+
+@njit(parallel=True, fastmath=True, cache=True)
+def renormalize_epsilon(psi, psi_old, factor):
+    '''Multiplies psi by factor in place and returns max(|psi_old - psi|) of the renormalized psi in the same sweep.
+    '''
+    M, N = psi.shape
+    # the maximum is taken of the squared difference, so only one square root is needed
+    epsilon2 = 0.0
+    for i in prange(M):
+        for j in range(N):
+            p = psi[i, j] * factor
+            psi[i, j] = p
+            d = psi_old[i, j] - p
+            epsilon2 = max(epsilon2, d.real*d.real + d.imag*d.imag)
+    return np.sqrt(epsilon2)
+
+@njit(parallel=True, fastmath=True, cache=True)
+def potential_stage(V, beta2, psi, b):
+    '''Writes b = V + beta2*|psi|^2 and returns the sums of |psi|^4 and b*|psi|^2 in a single sweep.
+    They are needed for the interaction energy and the potential preconditioner of ImaginaryTimeStepper.PCG.
+
+    Returns:
+        A 2-tuple (sum |psi|^4, sum b*|psi|^2).
+    '''
+    M, N = psi.shape
+    s4 = 0.0
+    sb = 0.0
+    for i in prange(M):
+        for j in range(N):
+            p = psi[i, j]
+            rho = p.real*p.real + p.imag*p.imag
+            b[i, j] = V[i, j] + beta2*rho
+            s4 += rho*rho
+            sb += b[i, j]*rho
+    return s4, sb
+
+@njit(parallel=True, fastmath=True, cache=True)
+def hamiltonian_stage(b, omega, phi, Dx_phi, Dy_phi, T_phi, x, y, out):
+    '''Applies the (linearized) hamiltonian H = T + b - omega*L to phi in a single sweep,
+    where T_phi = -1/2 Laplace phi and the derivatives were calculated in fourier space.
+    '''
+    M, N = phi.shape
+    for i in prange(M):
+        for j in range(N):
+            L = x[i]*Dy_phi[i, j] - y[j]*Dx_phi[i, j]
+            out[i, j] = T_phi[i, j] + b[i, j]*phi[i, j] - omega*L
+
+@njit(parallel=True, fastmath=True, cache=True)
+def kinetic_sum(psi_hat, k2):
+    '''Returns the sum of k2*|psi_hat|^2, which is proportional to the kinetic energy by Parseval's theorem.
+    '''
+    M, N = psi_hat.shape
+    s = 0.0
+    for i in prange(M):
+        for j in range(N):
+            p = psi_hat[i, j]
+            s += k2[i, j]*(p.real*p.real + p.imag*p.imag)
+    return s
+
+@njit(parallel=True, fastmath=True, cache=True)
+def observables_stage(V, beta2, psi, Dx_psi, Dy_psi, x, y, wx, wy):
+    '''Integrates the potential and interaction energy and the angular momentum of psi in a single sweep,
+    with the separable quadrature weights wx[i]*wy[j] of a Quadrature2D.
+
+    Returns:
+        A 3-tuple (int (V + beta2/2*|psi|^2)*|psi|^2, real and imaginary part of int conj(psi)*L_psi),
+        where L_psi = x*D_y(psi) - y*D_x(psi).
+    '''
+    M, N = psi.shape
+    sv = 0.0
+    sl_real = 0.0
+    sl_imag = 0.0
+    for i in prange(M):
+        for j in range(N):
+            w = wx[i]*wy[j]
+            p = psi[i, j]
+            rho = p.real*p.real + p.imag*p.imag
+            sv += w*(V[i, j] + 0.5*beta2*rho)*rho
+            l = w*p.conjugate()*(x[i]*Dy_psi[i, j] - y[j]*Dx_psi[i, j])
+            sl_real += l.real
+            sl_imag += l.imag
+    return sv, sl_real, sl_imag
+
+@njit(parallel=True, fastmath=True, cache=True)
+def weighted_vdot(f, g, wx, wy):
+    '''Returns the sum of wx[i]*wy[j]*conj(f[i, j])*g[i, j] in a single sweep, the integral of conj(f)*g with separable quadrature weights.
+    '''
+    M, N = f.shape
+    s_real = 0.0
+    s_imag = 0.0
+    for i in prange(M):
+        for j in range(N):
+            v = wx[i]*wy[j]*f[i, j].conjugate()*g[i, j]
+            s_real += v.real
+            s_imag += v.imag
+    return s_real, s_imag
+
+# batched versions of the BFFP kernels for a stack (K, M, N) of independent wave functions, see BatchedTimeStepper.
+# every member has its own physical parameters, the members are distributed over the threads.
+
+@njit(parallel=True, fastmath=True, cache=True)
+def batched_real_space_stage(V, beta2, omega, psi, Dx_psi, Dy_psi, x, y, G0, bmin, bmax):
+    '''real_space_stage for every member of a stack. L_psi is not stored, the bounds of every member are written into bmin and bmax.
+
+    Arguments:
+        V: A real (K, M, N) numpy array with the potential of every member.
+        beta2, omega: 1D numpy arrays of length K with the physical parameters of every member.
+        psi, Dx_psi, Dy_psi: Complex (K, M, N) numpy arrays, the wave functions and their spatial derivatives.
+        x, y: 1D numpy arrays with the coordinates.
+        G0: A complex (K, M, N) numpy array the result is written into.
+        bmin, bmax: 1D numpy arrays of length K the minimum and maximum of V + beta2*|psi|^2 are written into.
+    '''
+    K, M, N = psi.shape
+    for k in prange(K):
+        lo = np.inf
+        hi = -np.inf
+        for i in range(M):
+            for j in range(N):
+                p = psi[k, i, j]
+                b = V[k, i, j] + beta2[k]*(p.real*p.real + p.imag*p.imag)
+                lo = min(lo, b)
+                hi = max(hi, b)
+                L = x[i]*Dy_psi[k, i, j] - y[j]*Dx_psi[k, i, j]
+                G0[k, i, j] = omega[k]*L - b*p
+        bmin[k] = lo
+        bmax[k] = hi
+
+@njit(parallel=True, fastmath=True, cache=True)
+def batched_spectral_stage(psi_hat, G0_hat, k2, dt, alpha, out):
+    '''spectral_stage for every member of a stack, dt and alpha are 1D numpy arrays of length K. out may be G0_hat itself.
+    '''
+    K, M, N = psi_hat.shape
+    for k in prange(K):
+        c = 1 + dt[k]*alpha[k]
+        d = 2 + 2*dt[k]*alpha[k]
+        for i in range(M):
+            for j in range(N):
+                out[k, i, j] = (c*psi_hat[k, i, j] + dt[k]*G0_hat[k, i, j]) * (2 / (d + dt[k]*k2[i, j]))
+
+@njit(parallel=True, fastmath=True, cache=True)
+def batched_interior_norm2(psi, out):
+    '''interior_norm2 for every member of a stack, the sums are written into out.
+    '''
+    K, M, N = psi.shape
+    for k in prange(K):
+        s = 0.0
+        for i in range(1, M-1):
+            for j in range(1, N-1):
+                p = psi[k, i, j]
+                s += p.real*p.real + p.imag*p.imag
+        out[k] = s
+
+@njit(parallel=True, fastmath=True, cache=True)
+def batched_renormalize_epsilon(psi, psi_old, factor, out):
+    '''renormalize_epsilon for every member of a stack with its own factor, max(|psi_old - psi|) of every member is written into out.
+    '''
+    K, M, N = psi.shape
+    for k in prange(K):
+        epsilon2 = 0.0
+        for i in range(M):
+            for j in range(N):
+                p = psi[k, i, j] * factor[k]
+                psi[k, i, j] = p
+                d = psi_old[k, i, j] - p
+                epsilon2 = max(epsilon2, d.real*d.real + d.imag*d.imag)
+        out[k] = np.sqrt(epsilon2)
+
+# batched versions of the observables kernels for a stack (K, M, N) of frames on the same grid with the same potential,
+# see ObservableEngine.calcFrameObservables. The frames are distributed over the threads.
+
+@njit(parallel=True, fastmath=True, cache=True)
+def batched_kinetic_sum(psi_hat, k2, out):
+    '''kinetic_sum for every frame of a stack, the sums are written into out.
+    '''
+    K, M, N = psi_hat.shape
+    for k in prange(K):
+        s = 0.0
+        for i in range(M):
+            for j in range(N):
+                p = psi_hat[k, i, j]
+                s += k2[i, j]*(p.real*p.real + p.imag*p.imag)
+        out[k] = s
+
+@njit(parallel=True, fastmath=True, cache=True)
+def batched_observables_stage(V, beta2, psi, Dx_psi, Dy_psi, x, y, wx, wy, sv, sl_real, sl_imag):
+    '''observables_stage for every frame of a stack, the three integrals of every frame are written into sv, sl_real and sl_imag.
+
+    Arguments:
+        V: A real (M, N) numpy array, the potential of all frames.
+        psi, Dx_psi, Dy_psi: Complex (K, M, N) numpy arrays, the frames and their spatial derivatives.
+        sv, sl_real, sl_imag: 1D numpy arrays of length K.
+    '''
+    K, M, N = psi.shape
+    for k in prange(K):
+        s_v = 0.0
+        s_real = 0.0
+        s_imag = 0.0
+        for i in range(M):
+            for j in range(N):
+                w = wx[i]*wy[j]
+                p = psi[k, i, j]
+                rho = p.real*p.real + p.imag*p.imag
+                s_v += w*(V[i, j] + 0.5*beta2*rho)*rho
+                l = w*p.conjugate()*(x[i]*Dy_psi[k, i, j] - y[j]*Dx_psi[k, i, j])
+                s_real += l.real
+                s_imag += l.imag
+        sv[k] = s_v
+        sl_real[k] = s_real
+        sl_imag[k] = s_imag
@@ -0,0 +1,95 @@
+# References used in comments:
+# [1] Zeng, R & Zhang, Yanzhi. (2009). Efficiently computing vortex lattices in rapid rotating Bose–Einstein condensates.
+#     Computer Physics Communications. 180. 854-860. 10.1016/j.cpc.2008.12.003.
+
+import numpy as np
+
+from .parameter_object import ParameterObject
+from .kernels import kinetic_sum, observables_stage, batched_kinetic_sum, batched_observables_stage
+
+# quadrature rule of the integrals in real space, see ParameterObject.getQuadrature
+QUADRATURE_RULE = 'rectangle'
+
+class ObservableEngine:
+    '''This class calculates the observables of a wavefunction: the energy E [1], the angular momentum <L> and the kinetic energy (Nabla).
+
+    The kinetic energy is calculated in fourier space with Parseval's theorem, 1/2 int |nabla psi|^2 = 1/2 (b-a)(d-c) sum k^2 |psi_hat|^2,
+    so it needs no inverse transform. <L> needs D_x(psi) and D_y(psi), which are one batched inverse transform if they are not given.
+    The potential, the interaction and the angular momentum are reduced together in one sweep over the grid.
+    The integrals in real space use the weights of the cached Quadrature2D of QUADRATURE_RULE, the measure dx*dy,
+    so E is the same energy PCG minimizes.
+
+    Attributes:
+        paramObj: A ParameterObject instance with the grid and the physical parameters, the potential has to be initialized.
+    '''
+    def __init__(self, parameterObject):
+        '''Initializes the instance.
+        '''
+        if type(parameterObject) != ParameterObject:
+            raise TypeError("Parameter parameterObject is not of type ParameterObject")
+        self.paramObj = parameterObject
+
+    def calcDerivatives(self, psi_hat):
+        '''Returns a (2, ...) array with D_x(psi) and D_y(psi) for psi_hat of shape (M, N) or a stack (K, M, N), in one inverse transform.
+        '''
+        grid = self.paramObj.getSpectralGrid()
+        derivatives = np.empty((2,) + psi_hat.shape, dtype=np.result_type(psi_hat.dtype, np.complex64))
+        np.multiply(grid.my_p, psi_hat, out=derivatives[0], dtype=derivatives.dtype)
+        np.multiply(grid.lambda_q, psi_hat, out=derivatives[1], dtype=derivatives.dtype)
+        return self.paramObj.getFFTBackend().ifft2(derivatives, out=derivatives)
+
+    def calcObservables(self, psi, psi_hat=None, derivatives=None):
+        '''Calculates the observables of psi.
+
+        Arguments:
+            psi: A complex 2D numpy array.
+            psi_hat: The fourier transform of psi, it is calculated if it is not given.
+            derivatives: A (2, M, N) array with D_x(psi) and D_y(psi), e.g. WaveFunction2D.derivatives_array. They are calculated if not given.
+
+        Returns:
+            A 3-tuple (E, L, Nabla).
+        '''
+        p = self.paramObj
+        grid = p.getSpectralGrid()
+        if psi_hat is None:
+            psi_hat = p.getFFTBackend().fft2(psi)
+        if derivatives is None:
+            derivatives = self.calcDerivatives(psi_hat)
+        quadrature = p.getQuadrature(QUADRATURE_RULE)
+
+        # 1/2 int |nabla psi|^2, psi_hat is normalized by 1/MN and MN*dx*dy is the area of the box
+        M, N = psi.shape
+        Nabla = 0.5 * kinetic_sum(psi_hat, grid.k2) * M*N*p.dx*p.dy
+        potential, L_real, L_imag = observables_stage(p.V, p.beta2, psi, derivatives[0], derivatives[1], grid.xx[:, 0], grid.yy[0],
+            quadrature.wx, quadrature.wy)
+        L = complex(L_real, L_imag)
+        E = Nabla + potential - p.omega*L.real
+        return E, L, Nabla
+
+    def calcFrameObservables(self, frames):
+        '''Calculates the observables of a stack of frames. The fourier transforms of all frames are done in one batch,
+        and the whole stack is reduced by one call of the batched kernels, the same sums as calcObservables of every frame.
+
+        Arguments:
+            frames: A (K, M, N) complex numpy array.
+
+        Returns:
+            3 numpy arrays of length K, E, L and Nabla.
+        '''
+        p = self.paramObj
+        grid = p.getSpectralGrid()
+        K, M, N = frames.shape
+        if K == 0:
+            return np.zeros(0), np.zeros(0, dtype=complex), np.zeros(0)
+        frames_hat = p.getFFTBackend().fft2(frames)
+        derivatives = self.calcDerivatives(frames_hat)
+        quadrature = p.getQuadrature(QUADRATURE_RULE)
+
+        Nabla, potential, L_real, L_imag = [np.empty(K) for _ in range(4)]
+        batched_kinetic_sum(frames_hat, grid.k2, Nabla)
+        Nabla *= 0.5 * M*N*p.dx*p.dy
+        batched_observables_stage(p.V, p.beta2, frames, derivatives[0], derivatives[1], grid.xx[:, 0], grid.yy[0],
+            quadrature.wx, quadrature.wy, potential, L_real, L_imag)
+        L = L_real + 1j*L_imag
+        E = Nabla + potential - p.omega*L_real
+        return E, L, Nabla
@@ -1,6 +1,17 @@
+import copy
 import numpy as np
 from enum import IntEnum
 
+from .spectral_grid import SpectralGrid
+from .fft_backend import getFFTBackend
+from .quadrature import Quadrature2D
+
+# numpy dtypes of the complex and the real arrays of every precision
+PRECISIONS = {
+    'single': (np.complex64, np.float32),
+    'double': (np.complex128, np.float64),
+}
+
 class PotentialChoice(IntEnum):
     '''A simple enumerator to aviod confusion.
     '''
@@ -29,16 +40,36 @@ class ParameterObject:
         omega: rotation frequency.
         epsilon_limit: exit condition.
         epsilon_thershold: a measure for the amout of frames saved.
-        dt: time step.
+        dt: time step. If adaptive_dt is set, this is only the initial time step.
         maxIterations: exit condition.
         filename: filename of the .hdf5 file.
         potential_choice: A PotentialChoice Enum.
         potential_parameters: A dictionary that contains all potential parameters.
         psi0_choice: A Psi0Choice Enum.
         psi0_parameters: A dictionary that contains all initial wavefunction parameters.
+        fft_backend: A string that selects the FFT library, one of 'numpy', 'scipy' or 'pyfftw'.
+        fft_threads: An integer, the number of threads the FFT library may use.
+        anderson_depth: An integer, the history depth of the Anderson acceleration of BFFP. 0 turns it off.
+        anderson_start: A float, the Anderson acceleration is only used once epsilon is smaller than this value.
+        adaptive_dt: A boolean, if True BFFP adapts the time step to the time step constraint of the current wavefunction.
+        dt_safety: A float, the fraction of the time step constraint the adaptive time step grows towards.
+        checkpoint_interval: An integer, the number of iterations between two checkpoints of the simulation. 0 turns them off.
+        compression: A string that selects the codec of the saved frames, one of 'gzip', 'lzf', 'blosc', 'zstd' or None.
+                     'blosc' and 'zstd' require hdf5plugin.
+        compression_level: An integer, the compression level of gzip, blosc and zstd.
+        async_writes: A boolean, if True the frames are compressed and written by a background thread while the simulation continues.
+        inline_observables: A boolean, if True E, L and Nabla of every saved frame are calculated during the simulation,
+                            so DataManager.calcObservables does not have to read the file again.
+        observables_interval: An integer, if > 0 the observables are also added to the time series every observables_interval steps.
+        precision: A string, 'single' or 'double'. With 'single' BFFP calculates and the frames are saved in complex64/float32
+                   until it switches to double precision.
+        precision_switch: A float, BFFP switches from single to double precision once epsilon is smaller than this value. 0 turns it off,
+                          then epsilon can not get much smaller than the rounding error of single precision divided by dt.
 
         V: A 2D numpy array that contains the trapping potential.
         x, y: 1D numpy arrays that contain a linear space corresponding to the bounds and resolutions.
+        spectralGrid: A SpectralGrid instance that caches the arrays in fourier space, use getSpectralGrid().
+        quadratures: A dictionary with the cached Quadrature2D instances of every rule, use getQuadrature().
     '''
     def __init__(self, resolutionX = 256, resolutionY = 256,
     x_low = -16, x_high = 16, y_low = -16, y_high = 16,
@@ -46,7 +77,10 @@ class ParameterObject:
     epsilon_limit=1e-10, epsilon_threshold=1, dt=0.005, maxIterations=30_000,
     filename='default.hdf5',
     potential_choice=PotentialChoice.HARMONIC, potential_parameters={'gamma_y':1, 'alpha':1.2, 'kappa_quartic':0.3, 'kappa_optic':0.7, 'V0':5},
-    psi0_choice=Psi0Choice.THOMAS_FERMI, psi0_parameters={'gamma_y':1, 'sigma':1, 'x0':0, 'y0':0}):
+    psi0_choice=Psi0Choice.THOMAS_FERMI, psi0_parameters={'gamma_y':1, 'sigma':1, 'x0':0, 'y0':0},
+    fft_backend='numpy', fft_threads=1, anderson_depth=0, anderson_start=1e-4,
+    adaptive_dt=False, dt_safety=0.9, checkpoint_interval=0, compression='gzip', compression_level=4,
+    async_writes=True, inline_observables=True, observables_interval=0, precision='double', precision_switch=1e-4):
         '''Initializes the instance with all the given parameters.
         Contains all standard parameters.
         '''
@@ -61,6 +95,8 @@ class ParameterObject:
         self.y_high = y_high
 
         # calculate the spatial step and make a 2D coordinate array
+        self.spectralGrid = None
+        self.quadratures = {}
         self.updateGrid()
 
         # constants for the BEC itself
@@ -82,6 +118,24 @@ class ParameterObject:
         self.psi0_choice = psi0_choice
         self.psi0_parameters = psi0_parameters
 
+        # performance settings
+        self.fft_backend = fft_backend
+        self.fft_threads = fft_threads
+        self.anderson_depth = anderson_depth
+        self.anderson_start = anderson_start
+        self.adaptive_dt = adaptive_dt
+        self.dt_safety = dt_safety
+        self.checkpoint_interval = checkpoint_interval
+        self.compression = compression
+        self.compression_level = compression_level
+        self.async_writes = async_writes
+        self.inline_observables = inline_observables
+        self.observables_interval = observables_interval
+        if precision not in PRECISIONS:
+            raise ValueError("Precision {} not recognized. Available are {}.".format(precision, list(PRECISIONS.keys())))
+        self.precision = precision
+        self.precision_switch = precision_switch
+
     def __repr__(self):
         '''This function is called when a ParameterObject is converted to a string and returns all information as a formated string.
         '''
@@ -109,6 +163,65 @@ class ParameterObject:
         self.dy = (self.y_high - self.y_low)/self.resolutionY
         self.y = np.linspace(self.y_low, self.y_high, self.resolutionY)
 
+    def getSpectralGrid(self):
+        '''Returns the SpectralGrid for the current bounds and resolution.
+        It is only rebuilt if the bounds or the resolution changed since the last call.
+        '''
+        if self.spectralGrid is None or not self.spectralGrid.matches(self):
+            self.updateGrid()
+            self.spectralGrid = SpectralGrid(self)
+        return self.spectralGrid
+
+    def getQuadrature(self, rule='rectangle'):
+        '''Returns the Quadrature2D of the given rule for the current bounds and resolution.
+        Like the SpectralGrid, the weights are only calculated again if the bounds or the resolution changed.
+
+        Arguments:
+            rule: A string, one of Quadrature2D.RULES.
+        '''
+        quadrature = self.quadratures.get(rule)
+        if quadrature is None or not quadrature.matches(self):
+            self.updateGrid()
+            quadrature = Quadrature2D(self, rule)
+            self.quadratures[rule] = quadrature
+        return quadrature
+
+    def copyWithResolution(self, resolutionX, resolutionY):
+        '''Returns a copy of this instance with another resolution. All other parameters are the same,
+        the grid is recalculated and the potential is initialized again if it was initialized.
+
+        Arguments:
+            resolutionX, resolutionY: Integers, the resolution of the copy.
+        '''
+        p = copy.copy(self)
+        p.potential_parameters = dict(self.potential_parameters)
+        p.psi0_parameters = dict(self.psi0_parameters)
+        p.resolutionX = resolutionX
+        p.resolutionY = resolutionY
+        p.spectralGrid = None
+        p.quadratures = {}
+        p.updateGrid()
+        if self.V is not None:
+            p.initV()
+        return p
+
+    def getDtypes(self, precision=None):
+        '''Returns a 2-tuple with the numpy dtypes of the complex and the real arrays of a precision.
+
+        Arguments:
+            precision: A string, 'single' or 'double'. The default is the precision of this instance.
+        '''
+        if precision is None:
+            precision = self.precision
+        if precision not in PRECISIONS:
+            raise ValueError("Precision {} not recognized. Available are {}.".format(precision, list(PRECISIONS.keys())))
+        return PRECISIONS[precision]
+
+    def getFFTBackend(self):
+        '''Returns the FFT backend selected by fft_backend and fft_threads.
+        '''
+        return getFFTBackend(self.fft_backend, self.fft_threads)
+
     def initVharmonic(self, V0 = 1, gamma_y = 1):
         '''This function initializes a harmonic potential.
         '''
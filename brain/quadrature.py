@@ -0,0 +1,90 @@
+import numpy as np
+
+from .kernels import weighted_vdot
+
+# weights of the 1D simpson rule of wave_function.simpson, so an integral is a dot product with them:
+# simpson for an even amount of intervals, for an odd amount the last interval uses the trapezoid rule.
+
+def simpsonWeights(x):
+    '''Returns the weights w of the simpson rule for the equally spaced points x, so that np.sum(w*y) is the integral of y.
+
+    Arguments:
+        x: A 1D numpy array with at least 3 equally spaced points.
+    '''
+    N = len(x)
+    w = np.zeros(N)
+    # simpson rule on the first n points, where n is odd
+    n = N if N%2 == 1 else N-1
+    h = (x[n-1]-x[0])/(n-1)
+    w[0:n] = 2
+    w[1:n-1:2] = 4
+    w[0] = 1
+    w[n-1] = 1
+    w *= h/3
+    # trapezoid rule for the last interval
+    if n < N:
+        w[-2] += (x[-1]-x[-2])/2
+        w[-1] += (x[-1]-x[-2])/2
+    return w
+
+class Quadrature2D:
+    '''This class holds the weights of a 2D quadrature rule on the grid of a ParameterObject. They are calculated once per grid,
+    use ParameterObject.getQuadrature(rule) to get the cached instance. The weights are separable, w[i, j] = wx[i]*wy[j],
+    so an integral is a single contraction and the (M, N) weight matrix is never needed.
+
+    The rules are
+        'rectangle': dx*dy for every point, the measure of the normalization and of the ObservableEngine.
+        'interior': dx*dy for every point but the boundary, which is the normalization of the wavefunction [1] of WaveFunction2D.
+
+    Attributes:
+        rule: A string, one of RULES.
+        resolution: A 2-tuple (M, N) of the grid resolution this instance was built for.
+        boundaries: A 4-tuple (x_low, x_high, y_low, y_high) of the bounds this instance was built for.
+        wx, wy: 1D numpy arrays with the weights in x and y direction.
+    '''
+    RULES = ('rectangle', 'interior')
+
+    def __init__(self, parameterObject, rule='rectangle'):
+        '''Initializes the instance and calculates the weights.
+
+        Arguments:
+            parameterObject: A ParameterObject instance whose grid is used.
+            rule: A string, one of RULES.
+        '''
+        if rule not in self.RULES:
+            raise ValueError("Quadrature rule {} not recognized. Available are {}.".format(rule, self.RULES))
+        self.rule = rule
+        self.resolution = tuple(parameterObject.getResolution())
+        self.boundaries = tuple(parameterObject.getBoundaries())
+
+        self.wx = np.full(self.resolution[0], parameterObject.dx)
+        self.wy = np.full(self.resolution[1], parameterObject.dy)
+        if rule == 'interior':
+            self.wx[[0, -1]] = 0
+            self.wy[[0, -1]] = 0
+
+    def matches(self, parameterObject):
+        '''Checks whether this instance was built for the current grid of a ParameterObject.
+
+        Returns:
+            A boolean.
+        '''
+        return (self.resolution == tuple(parameterObject.getResolution())
+            and self.boundaries == tuple(parameterObject.getBoundaries()))
+
+    def integrate(self, f):
+        '''Returns the integral of f over the grid.
+
+        Arguments:
+            f: A (M, N) numpy array or a stack (..., M, N), then an array with the integral of every (M, N) array is returned.
+        '''
+        return (f @ self.wy) @ self.wx
+
+    def integrateProduct(self, f, g):
+        '''Returns the integral of conj(f)*g, e.g. <psi, L psi>, in a single sweep without a temporary array for the product.
+
+        Arguments:
+            f, g: Complex (M, N) numpy arrays.
+        '''
+        s_real, s_imag = weighted_vdot(f, g, self.wx, self.wy)
+        return complex(s_real, s_imag)
@@ -0,0 +1,71 @@
+import numpy as np
+
+class SpectralGrid:
+    '''This class holds all arrays that only depend on the grid and are needed by the operators in fourier space.
+    They are calculated once and then shared by the solver and all wavefunctions, instead of being rebuild on every call.
+
+    Attributes:
+        resolution: A 2-tuple (M, N) of the grid resolution this instance was built for.
+        boundaries: A 4-tuple (x_low, x_high, y_low, y_high) of the bounds this instance was built for.
+        my_p: A (M, 1) numpy array of the (shifted) 'derivation' constants in x direction.
+        lambda_q: A (1, N) numpy array of the (shifted) 'derivation' constants in y direction.
+        k2: A (M, N) numpy array that contains my_p**2 + lambda_q**2, the symbol of the laplacian.
+        xx, yy: A (M, 1) and a (1, N) numpy array with the spatial coordinates, they broadcast like a meshgrid.
+    '''
+    def __init__(self, parameterObject):
+        '''Initializes the instance and calculates all grid dependent arrays.
+
+        Arguments:
+            parameterObject: A ParameterObject instance whose grid is used.
+        '''
+        # set up aliases
+        a, b, c, d = parameterObject.getBoundaries()
+        M, N = parameterObject.getResolution()
+        self.resolution = (M, N)
+        self.boundaries = (a, b, c, d)
+
+        # set up grid in fourier space and shift it, will give wrong results otherwise
+        p = np.fft.fftshift(np.arange(-M//2, M//2, 1))
+        q = np.fft.fftshift(np.arange(-N//2, N//2, 1))
+
+        # set up 'derivation' constants in fourier space
+        # only the 1D axes are stored, they broadcast to the full grid
+        self.my_p = (2*p*np.pi/(b-a)).reshape(M, 1)
+        self.lambda_q = (2*q*np.pi/(d-c)).reshape(1, N)
+        self.k2 = self.my_p**2 + self.lambda_q**2
+
+        # spatial coordinates, used for the angular momentum operator
+        self.xx = np.array(parameterObject.x, dtype=float).reshape(M, 1)
+        self.yy = np.array(parameterObject.y, dtype=float).reshape(1, N)
+
+        # cache for the denominator of the BFFP scheme
+        self._denominator = np.empty((M, N))
+        self._denominator_key = None
+
+    def matches(self, parameterObject):
+        '''Checks whether this instance was built for the current grid of a ParameterObject.
+
+        Returns:
+            A boolean.
+        '''
+        return (self.resolution == tuple(parameterObject.getResolution())
+            and self.boundaries == tuple(parameterObject.getBoundaries()))
+
+    def getDenominator(self, dt, alpha):
+        '''Returns the factor 2/(2 + dt*(2*alpha + k^2)) of the BFFP scheme.
+        The array is only recalculated if dt or alpha changed since the last call and it is always written into the same buffer.
+
+        Arguments:
+            dt: A float, the time step.
+            alpha: A float, the stabilization parameter.
+
+        Returns:
+            A 2D numpy array, which must not be modified by the caller.
+        '''
+        if self._denominator_key != (dt, alpha):
+            np.add(self.k2, 2*alpha, out=self._denominator)
+            self._denominator *= dt
+            self._denominator += 2
+            np.divide(2, self._denominator, out=self._denominator)
+            self._denominator_key = (dt, alpha)
+        return self._denominator
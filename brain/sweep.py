@@ -0,0 +1,340 @@
+import os
+import csv
+import copy
+import itertools
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import time
+
+import numpy as np
+import numba
+
+from .parameter_object import ParameterObject
+from .wave_function import WaveFunction2D
+from .data_manager import DataManager
+from .time_stepper import ImaginaryTimeStepper
+from .batch_stepper import BatchedTimeStepper, unsupportedFeatures
+
+# environment variables that limit the threads of BLAS, OpenMP and numba in the worker processes.
+# they are only read when the libraries are loaded, so they are set before the workers are started.
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMBA_NUM_THREADS')
+
+# name of the summary table in the sweep directory and its columns after the axes
+SUMMARY_FILENAME = 'summary.csv'
+SUMMARY_COLUMNS = ('method', 'n', 'epsilon', 'E', 'L', 'Nabla', 'seconds', 'filename', 'error')
+
+def setParameter(parameterObject, name, value):
+    '''Sets the parameter name of a ParameterObject. Names of the form potential_<key> and psi0_<key>
+    set an entry of potential_parameters or psi0_parameters, like the global attributes of the .hdf5 files are named.
+    '''
+    for prefix, parameters in (('potential_', parameterObject.potential_parameters), ('psi0_', parameterObject.psi0_parameters)):
+        if name.startswith(prefix) and name[len(prefix):] in parameters:
+            parameters[name[len(prefix):]] = value
+            return
+    if not hasattr(parameterObject, name) or callable(getattr(parameterObject, name)):
+        raise ValueError("{} is not a parameter of ParameterObject.".format(name))
+    setattr(parameterObject, name, value)
+
+def initSweepWorker(threads):
+    '''Initializer of the worker processes, limits the threads of numba to the threads of one job.
+    '''
+    numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+
+def runSweepJob(parameterObject, method='BFFP', log=True):
+    '''Calculates the ground state of one job of a sweep and returns its row of the summary.
+    A job whose file is already finished is not calculated again, its row is read from the file.
+    This is a module level function, so it can be run by the worker processes of ParameterSweep.
+
+    Arguments:
+        parameterObject: A ParameterObject instance, the result is saved to its filename.
+        method: A string, 'BFFP' or 'PCG'.
+        log: A boolean, if True the output of the solver is written to the filename with the extension .log instead of the console.
+
+    Returns:
+        A dictionary with the keys of SUMMARY_COLUMNS.
+    '''
+    p = parameterObject
+    row = dict.fromkeys(SUMMARY_COLUMNS, '')
+    row.update(method=method, filename=p.filename)
+    start = time()
+    try:
+        if os.path.isfile(p.filename) and finishedFile(p.filename):
+            row.update(readSummary(p.filename))
+            return row
+
+        logfile = open(os.path.splitext(p.filename)[0] + '.log', 'w') if log else None
+        try:
+            with contextlib.redirect_stdout(logfile) if log else contextlib.nullcontext():
+                stepper = None
+                if os.path.isfile(p.filename):
+                    # an interrupted job continues from its checkpoint, if it has one
+                    try:
+                        stepper = ImaginaryTimeStepper.resume(p.filename)
+                    except (ValueError, OSError, KeyError) as e:
+                        print("[WARNING] Could not resume {}, starting again: {}".format(p.filename, e))
+                if stepper is None:
+                    if p.V is None:
+                        p.initV()
+                    psi0 = WaveFunction2D(p)
+                    psi0.initPsi_0()
+                    stepper = ImaginaryTimeStepper(psi0, p)
+                    getattr(stepper, method)()
+                else:
+                    getattr(stepper, stepper.resumeState['method'])()
+                stepper.dataM.closeFile()
+        finally:
+            if logfile is not None:
+                logfile.close()
+        row.update(readSummary(p.filename))
+    except Exception as e:
+        row['error'] = "{}: {}".format(type(e).__name__, e)
+    row['seconds'] = time() - start
+    return row
+
+def runSweepBatch(parameterObjects, log=True):
+    '''Calculates the ground states of some jobs on the same grid with one BatchedTimeStepper (BFFP) and returns their rows of the summary.
+    Finished jobs are read from their files like in runSweepJob, interrupted jobs start again, since the batch writes no checkpoints.
+
+    Arguments:
+        parameterObjects: A list of ParameterObject instances with the same grid.
+        log: A boolean, if True the output of the solver is written to the filename of the first job with the extension .log.
+
+    Returns:
+        A list with a dictionary with the keys of SUMMARY_COLUMNS for every job.
+    '''
+    rows = []
+    for p in parameterObjects:
+        row = dict.fromkeys(SUMMARY_COLUMNS, '')
+        row.update(method='BFFP', filename=p.filename)
+        rows.append(row)
+    start = time()
+    pending = []
+    for p, row in zip(parameterObjects, rows):
+        try:
+            if os.path.isfile(p.filename) and finishedFile(p.filename):
+                row.update(readSummary(p.filename))
+                continue
+        except Exception as e:
+            print("[WARNING] Could not read {}, starting again: {}".format(p.filename, e))
+        pending.append((p, row))
+    if len(pending) == 0:
+        return rows
+
+    try:
+        logfile = open(os.path.splitext(pending[0][0].filename)[0] + '.log', 'w') if log else None
+        try:
+            with contextlib.redirect_stdout(logfile) if log else contextlib.nullcontext():
+                stepper = BatchedTimeStepper([p for p, row in pending])
+                results = stepper.BFFP()
+        finally:
+            if logfile is not None:
+                logfile.close()
+        for (p, row), result in zip(pending, results):
+            row.update(result)
+    except Exception as e:
+        for p, row in pending:
+            row['error'] = "{}: {}".format(type(e).__name__, e)
+    # the time of the batch is shared by its jobs
+    for p, row in pending:
+        row['seconds'] = (time() - start) / len(pending)
+    return rows
+
+def runSweepJobs(parameterObjects, method='BFFP', log=True):
+    '''Calculates the jobs of one batch of a sweep and returns their rows of the summary, with runSweepJob for a single job
+    and with runSweepBatch otherwise. This is a module level function, so it can be run by the worker processes of ParameterSweep.
+
+    Returns:
+        A list with a dictionary with the keys of SUMMARY_COLUMNS for every job.
+    '''
+    if len(parameterObjects) == 1:
+        return [runSweepJob(parameterObjects[0], method, log)]
+    return runSweepBatch(parameterObjects, log)
+
+def finishedFile(filename):
+    '''Returns True if the simulation of the .hdf5 file is finished, i.e. it has the attribute n_frames.
+    '''
+    dataM = DataManager(filename)
+    dataM.loadFile(read_only=True)
+    try:
+        return 'n_frames' in dataM.file.attrs
+    finally:
+        dataM.closeFile()
+
+def readSummary(filename):
+    '''Reads n, epsilon and the observables of the last frame of a finished simulation.
+
+    Returns:
+        A dictionary with the keys n, epsilon, E, L and Nabla. L is the real part of <L>.
+    '''
+    dataM = DataManager(filename)
+    dataM.loadFile(read_only=True)
+    try:
+        psi, attributes = dataM.getDset(dataM.getLastKey())
+        if 'E' in attributes:
+            E, L, Nabla = attributes['E'], attributes['L'], attributes['Nabla']
+        else:
+            w = WaveFunction2D(dataM.getParameterObject())
+            w.setPsi(psi)
+            E, L, Nabla = w.calcObservables()
+    finally:
+        dataM.closeFile()
+    return {'n': int(attributes['n']), 'epsilon': float(attributes['epsilon']),
+        'E': float(np.real(E)), 'L': float(np.real(L)), 'Nabla': float(np.real(Nabla))}
+
+
+class ParameterSweep:
+    '''This class calculates the ground states of all combinations of some parameters (a parameter sweep),
+    e.g. for the phase diagram of the vortex lattice over omega and beta2.
+
+    Every combination is a job with its own .hdf5 file in the directory of the sweep. The jobs are calculated one after another
+    or by a pool of worker processes, and the final n, epsilon, E, L and Nabla of every job are collected in a summary table,
+    which is also written to SUMMARY_FILENAME in the directory. Jobs whose file is already finished are not calculated again,
+    so an interrupted sweep continues where it stopped when it is run again.
+
+    With batch_size > 1 and the method 'BFFP', jobs with the same grid are calculated together by a BatchedTimeStepper
+    (see runSweepBatch), which is faster on small grids. Interrupted batches start again instead of resuming from a checkpoint.
+    Jobs with adaptive_dt, Anderson mixing, checkpoints or single precision are calculated on their own.
+
+    The workers are spawned processes, so a script that runs a sweep with processes > 1 needs an
+    if __name__ == '__main__': guard.
+
+    Attributes:
+        paramObj: A ParameterObject instance with the parameters that are the same for every job.
+        axes: A dictionary that maps parameter names to the list of their values. Entries of potential_parameters
+              and psi0_parameters are named potential_<key> and psi0_<key>.
+        directory: A string, the directory of the files and the summary.
+        method: A string, 'BFFP' or 'PCG'.
+        processes: An integer, the number of worker processes. With 1 the jobs are calculated in this process.
+        threads: An integer, the number of threads of every job (FFT, numba and BLAS).
+        batch_size: An integer, the maximum number of jobs of one BatchedTimeStepper. 1 calculates every job on its own.
+        log: A boolean, if True the output of every job is written to a .log file next to its .hdf5 file.
+        results: A list with the summary row of every job, in the order of getJobs, once run was called.
+    '''
+    def __init__(self, parameterObject, axes, directory='sweep', method='BFFP', processes=1, threads=1, log=True, batch_size=1):
+        '''Initializes the instance.
+
+        Arguments:
+            parameterObject: A ParameterObject instance with the parameters that are the same for every job.
+            axes: A dictionary that maps parameter names to a list of values, e.g. {'omega': np.linspace(0, 0.95, 20), 'beta2': [100, 500, 1000]}.
+            directory: A string, the directory of the files and the summary. It is created if it does not exist.
+            method: A string, 'BFFP' or 'PCG'.
+            processes: An integer, the number of worker processes. None uses one per CPU.
+            threads: An integer, the number of threads of every job.
+            log: A boolean, if True the output of every job is written to a .log file instead of the console.
+            batch_size: An integer, the maximum number of jobs with the same grid that are calculated together. Only used with 'BFFP'.
+        '''
+        if type(parameterObject) != ParameterObject:
+            raise TypeError("Parameter parameterObject is not of type ParameterObject")
+        if method not in ('BFFP', 'PCG'):
+            raise ValueError("Method {} not recognized. Available are 'BFFP' and 'PCG'.".format(method))
+        if len(axes) == 0:
+            raise ValueError("A sweep needs at least one axis.")
+        self.paramObj = parameterObject
+        self.axes = {name: list(values) for name, values in axes.items()}
+        for name in self.axes:
+            setParameter(copy.deepcopy(self.paramObj), name, self.axes[name][0])
+        self.directory = directory
+        self.method = method
+        self.processes = processes or os.cpu_count()
+        self.threads = max(1, int(threads))
+        self.log = log
+        self.batch_size = max(1, int(batch_size))
+        self.results = None
+
+    def getJobs(self):
+        '''Returns a list with a ParameterObject for every combination of the values of the axes.
+        The last axis changes fastest, the files are named sweep_<index>.hdf5.
+        '''
+        jobs = []
+        for i, values in enumerate(itertools.product(*self.axes.values())):
+            p = copy.deepcopy(self.paramObj)
+            for name, value in zip(self.axes, values):
+                setParameter(p, name, value)
+            p.filename = os.path.join(self.directory, "sweep_{:05d}.hdf5".format(i))
+            p.fft_threads = self.threads
+            # the potential depends on the parameters of the job, the grid caches are rebuilt in the job
+            p.V = None
+            p.spectralGrid = None
+            p.quadratures = {}
+            jobs.append(p)
+        return jobs
+
+    def getBatches(self, jobs):
+        '''Groups the indices of the jobs into batches of at most batch_size jobs with the same grid.
+        Without batching (batch_size 1 or the method 'PCG') every job is its own batch, and so is every job
+        that uses a setting the BatchedTimeStepper ignores (see batch_stepper.unsupportedFeatures).
+
+        Returns:
+            A list of lists of indices.
+        '''
+        if self.batch_size == 1 or self.method != 'BFFP':
+            return [[i] for i in range(len(jobs))]
+        grids = {}
+        singles = []
+        for i, p in enumerate(jobs):
+            if unsupportedFeatures(p):
+                singles.append([i])
+            else:
+                grids.setdefault((p.getResolution(), p.getBoundaries()), []).append(i)
+        return [indices[j:j+self.batch_size] for indices in grids.values() for j in range(0, len(indices), self.batch_size)] + singles
+
+    def run(self):
+        '''Calculates all jobs and writes the summary.
+
+        Returns:
+            A list with the summary row (a dictionary with the axes and SUMMARY_COLUMNS) of every job.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        jobs = self.getJobs()
+        combinations = list(itertools.product(*self.axes.values()))
+        batches = self.getBatches(jobs)
+        rows = [None] * len(jobs)
+        print("[INFO] Sweep of {} jobs in {} batches with {} processes.".format(len(jobs), len(batches), min(self.processes, len(batches))))
+
+        def finish(i, row):
+            rows[i] = dict(zip(self.axes, combinations[i]), **row)
+            done = sum(r is not None for r in rows)
+            status = "failed, " + row['error'] if row['error'] else "E = {:.6f}, n = {}".format(row['E'], row['n'])
+            print("[INFO] Job {} of {} ({}/{} done): {}".format(i, len(jobs), done, len(jobs), status))
+
+        if self.processes == 1 or len(batches) == 1:
+            for indices in batches:
+                for i, row in zip(indices, runSweepJobs([jobs[i] for i in indices], self.method, self.log)):
+                    finish(i, row)
+        else:
+            # the spawned workers inherit the environment, so the thread limits are set while the pool starts them.
+            # They are spawned instead of forked, since a fork after the numba threads were started can deadlock.
+            environment = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+            os.environ.update({name: str(self.threads) for name in THREAD_ENV_VARS})
+            try:
+                with ProcessPoolExecutor(min(self.processes, len(batches)), mp_context=multiprocessing.get_context('spawn'),
+                    initializer=initSweepWorker, initargs=(self.threads,)) as pool:
+                    futures = {pool.submit(runSweepJobs, [jobs[i] for i in indices], self.method, self.log): indices for indices in batches}
+                    for future in as_completed(futures):
+                        for i, row in zip(futures[future], future.result()):
+                            finish(i, row)
+            finally:
+                for name, value in environment.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+
+        self.results = rows
+        self.writeSummary()
+        return self.results
+
+    def writeSummary(self, filename=None):
+        '''Writes the summary rows to a .csv file.
+
+        Arguments:
+            filename: A string, the default is SUMMARY_FILENAME in the directory of the sweep.
+        '''
+        if filename is None:
+            filename = os.path.join(self.directory, SUMMARY_FILENAME)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.axes) + list(SUMMARY_COLUMNS))
+            writer.writeheader()
+            writer.writerows(self.results)
+        print("[INFO] Wrote the summary of the sweep to {}.".format(filename))
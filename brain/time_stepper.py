@@ -5,15 +5,29 @@
 # [2] Weizhu Bao, I-Liang Chern & Fong Yin Lim. (2006). Efficient and spectrally accurate numerical methods for computing ground
 #     and first excited states in Bose–Einstein condensates. Journal of Computational Physics. Volume 219, Issue 2.
 #     https://doi.org/10.1016/j.jcp.2006.04.019.
+#
+# [3] Xavier Antoine, Antoine Levitt & Qinglin Tang. (2017). Efficient spectral computation of the stationary states of rotating
+#     Bose–Einstein condensates by preconditioned nonlinear conjugate gradient methods. Journal of Computational Physics. Volume 343.
+#     https://doi.org/10.1016/j.jcp.2017.04.040.
 
 from .wave_function import WaveFunction2D
 from .parameter_object import ParameterObject
-from .data_manager import DataManager
+from .data_manager import DataManager, TIMESERIES_COLUMNS
+from .workspace import Workspace
+from .anderson import AndersonMixer
+from .kernels import real_space_stage, spectral_stage, interior_norm2, renormalize_epsilon, potential_stage, hamiltonian_stage
 
 import numpy as np
-from numba import jit
 from time import time
 
+# factors the time step is changed by in the adaptive mode of BFFP
+DT_GROWTH = 1.05
+DT_SHRINK = 0.5
+# the time step is only reduced if epsilon grows faster than this factor per step, a slower growth is physical (e.g. vortex nucleation)
+EPSILON_GROWTH_LIMIT = 1.1
+# number of steps that are recorded in memory before they are appended to the time series of the file
+TIMESERIES_BUFFER_SIZE = 1000
+
 def timer(func):
     '''This function can be used as a decorator to time the execution of another function.
     '''
@@ -24,6 +38,52 @@ def timer(func):
         return r
     return wrapper
 
+def getGlobalAttributes(parameterObject):
+    '''Returns a dictionary with the contents of a ParameterObject in the format of the global attributes of the .hdf5 files,
+    DataManager.getParameterObject is the inverse.
+    '''
+    return {
+        'omega': parameterObject.omega,
+        'beta': parameterObject.beta2,
+        'dt': parameterObject.dt,
+        'adaptive_dt': parameterObject.adaptive_dt,
+        'resX': parameterObject.resolutionX,
+        'resY': parameterObject.resolutionY,
+        'x_low' : parameterObject.x_low,
+        'x_high' : parameterObject.x_high,
+        'y_low' : parameterObject.y_low,
+        'y_high' : parameterObject.y_high,
+        'epsilon_limit': parameterObject.epsilon_limit,
+        'epsilon_threshold' : parameterObject.epsilon_threshold,
+        'maxIterations': parameterObject.maxIterations,
+        'potential_choice': int(parameterObject.potential_choice),
+        'psi0_choice' : int(parameterObject.psi0_choice),
+        'potential_gamma_y' : parameterObject.potential_parameters['gamma_y'],
+        'potential_alpha' : parameterObject.potential_parameters['alpha'],
+        'potential_kappa_quartic' : parameterObject.potential_parameters['kappa_quartic'],
+        'potential_kappa_optic' : parameterObject.potential_parameters['kappa_optic'],
+        'potential_V0' : parameterObject.potential_parameters['V0'],
+        'psi0_gamma_y' : parameterObject.psi0_parameters['gamma_y'],
+        'psi0_sigma' : parameterObject.psi0_parameters['sigma'],
+        'psi0_x0' : parameterObject.psi0_parameters['x0'],
+        'psi0_y0' : parameterObject.psi0_parameters['y0'],
+        'fft_backend' : parameterObject.fft_backend,
+        'fft_threads' : parameterObject.fft_threads,
+        'anderson_depth' : parameterObject.anderson_depth,
+        'anderson_start' : parameterObject.anderson_start,
+        'dt_safety' : parameterObject.dt_safety,
+        'checkpoint_interval' : parameterObject.checkpoint_interval,
+        # None can not be saved as an attribute
+        'compression' : parameterObject.compression or '',
+        'compression_level' : parameterObject.compression_level,
+        'async_writes' : parameterObject.async_writes,
+        'inline_observables' : parameterObject.inline_observables,
+        'observables_interval' : parameterObject.observables_interval,
+        'precision' : parameterObject.precision,
+        'precision_switch' : parameterObject.precision_switch,
+        'calculated_observables' : False
+    }
+
 class ImaginaryTimeStepper:
     '''This class is used to solve the Gross-Pitaevski equation (GPE).
 
@@ -35,15 +95,23 @@ class ImaginaryTimeStepper:
         maxIterations: A float that is an alias for ParameterObject.maxIterations
         psi_n: A WavveFunction2D instance that contains the current wave function at time step t_n
         n: An integer that refers to the current time step
+        t: A float, the imaginary time of the current time step, the sum of all time steps so far.
         dataM: A DataManager instance that is handling the saving of the time steps to the disk.
+        workspace: A Workspace instance that contains all arrays used during a time step of BFFP, in the precision BFFP currently calculates in.
+        mixer: An AndersonMixer instance if BFFP is accelerated (ParameterObject.anderson_depth > 0), None otherwise.
         globalAttributes: A dictionary that has the contents of ParameterObject but the right format for the DataManager.
+        resumeState: A dictionary with the state of a checkpoint the next call of BFFP or PCG continues from, None for a new simulation.
+        timeSeries: A dictionary of lists with the recorded steps that are not appended to the file yet, see recordStep.
         '''
-    def __init__(self, psi_0, parameterObject):
+    def __init__(self, psi_0, parameterObject, in_memory=False, dataManager=None):
         '''Initializes an instance of this class.
 
         Arguments:
             psi_0: A WaveFunction2D instance that has the initial wavefunction in it.
             parameterObject: A ParameterObject instance that contains all setting and parameters for the simulation.
+            in_memory: A boolean, if True the frames are only kept in memory and not written to ParameterObject.filename.
+            dataManager: An optional DataManager instance with an open file the frames are added to, used by resume.
+                         By default a new file is created.
         '''
         # check if psi_0 is an instance of WaveFunction2D
         if type(psi_0) != WaveFunction2D:
@@ -63,37 +131,128 @@ class ImaginaryTimeStepper:
         # set up array for the nth time step, starting at 0
         self.psi_n = self.psi_0
         self.n = 0
+        self.t = 0
+        self.resumeState = None
+        self.timeSeries = {name: [] for name in TIMESERIES_COLUMNS}
+
+        # set up the buffers for the time steps
+        self.workspace = Workspace(self.paramObj)
+        self.mixer = None
+        if self.paramObj.anderson_depth > 0:
+            self.mixer = AndersonMixer(self.paramObj.anderson_depth, self.paramObj.getResolution())
 
         # set up data manager
-        self.dataM = DataManager(self.paramObj.filename)
-        self.dataM.newFile()
-        self.globalAttributes = {
-            'omega': self.paramObj.omega,
-            'beta': self.paramObj.beta2,
+        self.dataM = dataManager
+        if self.dataM is None:
+            self.dataM = DataManager(self.paramObj.filename, in_memory,
+                self.paramObj.compression, self.paramObj.compression_level, self.paramObj.async_writes)
+            self.dataM.newFile()
+        self.globalAttributes = getGlobalAttributes(self.paramObj)
+        if dataManager is None:
+            self.dataM.setGlobalAttributes(self.globalAttributes)
+
+    @classmethod
+    def resume(cls, filename):
+        '''Continues a simulation that was interrupted. The ParameterObject is rebuild from the global attributes of the file
+        and the simulation starts from the checkpoint, or from the last frame if no checkpoint was written.
+        Frames that were saved after the checkpoint are deleted, the new frames are added to the same file.
+        Call the method that was used before (ImaginaryTimeStepper.resumeState['method']) on the returned instance to continue.
+
+        Arguments:
+            filename: A string, the name of the .hdf5 file of the interrupted simulation.
+
+        Returns:
+            An ImaginaryTimeStepper instance.
+        '''
+        dataM = DataManager(filename)
+        dataM.loadFile()
+        # the number of frames is written at the end of a simulation
+        if 'n_frames' in dataM.file.attrs:
+            dataM.closeFile()
+            raise ValueError("The simulation in {} is already finished.".format(filename))
+
+        p = dataM.getParameterObject()
+        dataM.async_writes = p.async_writes
+        checkpoint = dataM.readCheckpoint()
+        if checkpoint is None:
+            if dataM.getNFrames() == 0:
+                dataM.closeFile()
+                raise ValueError("The file {} contains neither a checkpoint nor a frame to resume from.".format(filename))
+            array, attributes = dataM.getDset(dataM.getLastKey())
+            state = {'method': 'BFFP', 'n': attributes['n'], 't': attributes['t'], 'dt': attributes.get('dt', p.dt),
+                'epsilon': attributes['epsilon'], 'epsilon_sum': 0}
+        else:
+            array, state = checkpoint
+        dataM.removeFramesAfter(state['n'])
+
+        psi_0 = WaveFunction2D(p)
+        psi_0.setPsi(array)
+        stepper = cls(psi_0, p, dataManager=dataM)
+        stepper.resumeState = state
+        print("[INFO] Resuming {} from time step {}.".format(state['method'], state['n']))
+        return stepper
+
+    def saveCheckpoint(self, method, epsilon, epsilon_sum, **state):
+        '''Writes psi and the state of the simulation to the checkpoint of the file, see resume.
+        There are no random numbers involved in the iteration, so no random state has to be stored.
+
+        Arguments:
+            method: A string, the name of the method that is running ('BFFP' or 'PCG').
+            epsilon: A float, epsilon of the current step.
+            epsilon_sum: A float, the sum of epsilon since the last saved frame.
+            state: Further floats the method needs to continue, e.g. alpha.
+        '''
+        attributes = {
+            'method': method,
+            'n': self.n,
+            't': self.t,
             'dt': self.dt,
-            'resX': self.paramObj.resolutionX,
-            'resY': self.paramObj.resolutionY,
-            'x_low' : self.paramObj.x_low,
-            'x_high' : self.paramObj.x_high,
-            'y_low' : self.paramObj.y_low,
-            'y_high' : self.paramObj.y_high,
-            'epsilon_limit': self.epsilon_iteration_step_limit,
-            'epsilon_threshold' : self.paramObj.epsilon_threshold,
-            'maxIterations': self.maxIterations,
-            'potential_choice': int(self.paramObj.potential_choice),
-            'psi0_choice' : int(self.paramObj.psi0_choice),
-            'potential_gamma_y' : self.paramObj.potential_parameters['gamma_y'],
-            'potential_alpha' : self.paramObj.potential_parameters['alpha'],
-            'potential_kappa_quartic' : self.paramObj.potential_parameters['kappa_quartic'],
-            'potential_kappa_optic' : self.paramObj.potential_parameters['kappa_optic'],
-            'potential_V0' : self.paramObj.potential_parameters['V0'],
-            'psi0_gamma_y' : self.paramObj.psi0_parameters['gamma_y'],
-            'psi0_sigma' : self.paramObj.psi0_parameters['sigma'],
-            'psi0_x0' : self.paramObj.psi0_parameters['x0'],
-            'psi0_y0' : self.paramObj.psi0_parameters['y0'],
-            'calculated_observables' : False
+            'epsilon': epsilon,
+            'epsilon_sum': epsilon_sum
         }
-        self.dataM.setGlobalAttributes(self.globalAttributes)
+        attributes.update(state)
+        # the time series has to contain every step up to the checkpoint
+        self.flushTimeSeries()
+        self.dataM.writeCheckpoint(self.returnPsi(), attributes)
+
+    def recordStep(self, **values):
+        '''Records the values of the current step for the time series of the file.
+        The steps are kept in memory and appended to the file in bulk, see flushTimeSeries.
+
+        Arguments:
+            values: Floats, the values of the columns of DataManager.TIMESERIES_COLUMNS, e.g. epsilon.
+                    n and wall are added, missing columns are NaN.
+        '''
+        row = self.timeSeries
+        row['n'].append(self.n)
+        row['wall'].append(time())
+        for name in TIMESERIES_COLUMNS:
+            if name not in ('n', 'wall'):
+                row[name].append(values.get(name, np.nan))
+        if len(row['n']) >= TIMESERIES_BUFFER_SIZE:
+            self.flushTimeSeries()
+
+    def calcObservables(self):
+        '''Calculates E, L and Nabla of psi_n (see ObservableEngine) like DataManager.calcObservables does after the simulation.
+        psi_n only calculates them once per step. psi_hat and the derivatives stay in psi_n, so the next step of BFFP reuses them.
+
+        Returns:
+            A dictionary with the keys 'E', 'L' and 'Nabla'.
+        '''
+        E, L, Nabla = self.psi_n.calcObservables()
+        return {'E': E, 'L': L, 'Nabla': Nabla}
+
+    def observablesDue(self):
+        '''Returns True if the observables of the current step are added to the time series (ParameterObject.observables_interval).
+        '''
+        return self.paramObj.observables_interval > 0 and self.n % self.paramObj.observables_interval == 0
+
+    def flushTimeSeries(self):
+        '''Appends the recorded steps to the time series of the file.
+        '''
+        if self.timeSeries['n']:
+            self.dataM.appendTimeSeries(self.timeSeries)
+        self.timeSeries = {name: [] for name in TIMESERIES_COLUMNS}
     
     def __del__(self):
         '''Destructor of this class, is called when the instance is deleted and closes any open files.
@@ -110,6 +269,35 @@ class ImaginaryTimeStepper:
         '''
         return self.psi_n.psi_array
 
+    def setUpWorkspace(self, precision, psi=None):
+        '''Sets up the workspace of BFFP in the given precision and lets psi_n work on it.
+        A new workspace is only allocated if the precision changed, then psi of the current and the previous step are copied into it.
+
+        Arguments:
+            precision: A string, 'single' or 'double'.
+            psi: An optional 2D numpy array, BFFP starts from it and the previous step is set to zero.
+
+        Returns:
+            The Workspace instance, the potential, k^2 and the coordinates are stored in it in the precision of the workspace.
+        '''
+        ws = self.workspace
+        if ws.precision != precision:
+            ws = Workspace(self.paramObj, precision)
+            ws.psi[...] = self.workspace.psi
+            ws.current = self.workspace.current
+            self.workspace = ws
+        if psi is not None:
+            ws.current = 0
+            ws.getPsi()[...] = psi
+            ws.getPreviousPsi()[...] = 0
+        self.psi_n.setPsi(ws.getPsi())
+        self.psi_n.psi_hat_array = ws.psi_hat
+        self.psi_n.L_psi_array = ws.L_psi
+
+        grid = self.paramObj.getSpectralGrid()
+        ws.setGrid(self.paramObj.V, grid.k2, grid.xx[:, 0], grid.yy[0])
+        return ws
+
     def calcAlpha(self):
         '''Calculate stability parameter alpha.
 
@@ -117,22 +305,56 @@ class ImaginaryTimeStepper:
             A (real) float.
         '''
         # This follows [1] and [2]. A stabilization parameter is used for faster convergence.
-        b_ = self.paramObj.V + self.paramObj.beta2*np.abs(self.psi_n.psi_array)**2
-        bmin = np.min(b_)
-        bmax = np.max(b_)
+        b_ = self.workspace.b
+        np.abs(self.psi_n.psi_array, out=b_)
+        np.square(b_, out=b_)
+        b_ *= self.paramObj.beta2
+        b_ += self.paramObj.V
+        return self.alphaFromBounds(np.min(b_), np.max(b_))
+
+    def alphaFromBounds(self, bmin, bmax):
+        '''Calculates the stability parameter alpha from the minimum and maximum of V + beta2*|psi|^2.
+
+        Returns:
+            A (real) float.
+        '''
         alpha = 0.5 * (bmax + bmin)
         # check whether the time step dt obeys the contraint.
         if self.dt > 2/(bmax+bmin):
             print("[WARNING] Delta t = {} is larger than time step constraint {}!".format(self.dt, 2/(bmax+bmin)))
         return alpha
 
-    @jit
-    def calcNextPsi_m(self, G_m, alpha):
+    def adaptTimeStep(self, bmin, bmax, epsilon_growth):
+        '''Adapts the time step dt of BFFP to the current wavefunction.
+        The time step constraint 2/(bmax+bmin) [1] grows while the density smooths out, so dt grows towards
+        ParameterObject.dt_safety times the constraint. If epsilon grew by more than EPSILON_GROWTH_LIMIT in the last step, dt is reduced instead.
+        dt is also reduced if the constraint becomes smaller than the current dt.
+
+        Arguments:
+            bmin, bmax: Floats, the minimum and maximum of V + beta2*|psi|^2.
+            epsilon_growth: A float, epsilon of the last step divided by the one before.
+
+        Returns:
+            A boolean that is True if dt was reduced, for any of both reasons.
+        '''
+        dt_old = self.dt
+        dt_target = self.paramObj.dt_safety * 2/(bmax+bmin)
+        if epsilon_growth > EPSILON_GROWTH_LIMIT:
+            self.dt = min(DT_SHRINK*self.dt, dt_target)
+        else:
+            self.dt = min(DT_GROWTH*self.dt, dt_target)
+        return self.dt < dt_old
+
+    def calcNextPsi_m(self, G_m, alpha, out=None):
         '''This function is used to iteratively solve the equation system in every time step.
 
         Arguments:
             G_m: A Wavefunction2D instance that contains all terms of the GPE that are not the second order spacial derivative. Calculated by WaveFunction2D.clacG_m.
             alpha: A float that is the stabilization parameter used in [1] and [2].
+            out: An optional complex 2D numpy array the result is written into. It may be G_m.psi_hat_array itself.
+
+        Returns:
+            The fourier transform of the next iteration step.
         '''
         # check if G_m is instance of WaveFunction2D
         if type(G_m) != WaveFunction2D:
@@ -142,29 +364,14 @@ class ImaginaryTimeStepper:
         if not self.psi_n.psi_hat_contains_values or not G_m.psi_hat_contains_values:
             raise ValueError("Something was not calculated...")
 
-        # set up aliases for grid parameters
-        a, b, c, d = self.paramObj.getBoundaries()
-        M, N = self.paramObj.getResolution()
-
-        # set up result WaveFunction2D
-        psi_m_next = WaveFunction2D(self.paramObj)
-        
-        # set up a grid in fourier space
-        p = np.arange(-M//2, M//2, 1)
-        q = np.arange(-N//2, N//2, 1)
-        pp, qq = np.meshgrid(p, q, indexing='ij')
-
-        # set up 'derivation' constants in fourier space
-        lambda_q = 2*qq*np.pi/(d-c)
-        my_p = 2*pp*np.pi/(b-a)
-
-        # shift 'derivation' constants, will give wrong results otherwise
-        my_p = np.fft.fftshift(my_p)
-        lambda_q = np.fft.fftshift(lambda_q)
+        if out is None:
+            out = np.empty_like(G_m.psi_hat_array)
 
         # calculate next iteration step with scheme given in [1]
-        psi_m_hat = self.psi_n.psi_hat_array + self.dt * G_m.psi_hat_array
-        psi_m_hat *= 2 / (2 + self.dt*(2*alpha + my_p**2 + lambda_q**2))
+        # the 'derivation' constants and the denominator are cached by the spectral grid
+        np.multiply(G_m.psi_hat_array, self.dt, out=out)
+        out += self.psi_n.psi_hat_array
+        out *= self.paramObj.getSpectralGrid().getDenominator(self.dt, alpha)
 
         # the old version
         # does the same thing but way slower, CONFIRMED
@@ -177,11 +384,8 @@ class ImaginaryTimeStepper:
         #         psi_m_hat[p,q] = self.psi_n.psi_hat_array[p,q] + dt * G_m.psi_hat_array[p,q]
         #         psi_m_hat[p,q] *= 2 / (2 + dt*(2*alpha + my_p**2 + lambda_q**2))
 
-        # return the result
-        psi_m_next.setPsiHat(psi_m_hat)
-        return psi_m_hat
+        return out
         
-    @jit
     def calculate_time_step(self):
         '''This function is not used anymore. It was used in the Backwards Euler Pseudo Fourier Scheme with an iterative approach.
         It calculates the next time step t_n+1 from the time step t_n with an iterative scheme.
@@ -242,62 +446,304 @@ class ImaginaryTimeStepper:
         The spatial derivatives are solved by Fourier Transformation while the time derivative is solved by the semi-implicit (symplectic) Euler scheme.
         For every time step, the equation system that arises is only solved approximately which imposes a constraint on the time step dt.
         This saves computational effort but limits the time step to small values. [2] 
+
+        If ParameterObject.anderson_depth > 0, the steps are accelerated with Anderson mixing, where one BFFP step is the fixed point map.
+        It is only used in the slow convergence tail, once epsilon is smaller than ParameterObject.anderson_start,
+        since the extrapolation can push the wavefunction into a metastable vortex configuration while the vortices are still forming.
+        The mixed wavefunction is renormalized and if epsilon of the following step is larger than the one before,
+        the history is deleted and the mixing starts again from there.
+
+        If ParameterObject.adaptive_dt is set, dt is adapted before every step (see adaptTimeStep)
+        and every frame stores the time step it was calculated with as attribute 'dt'.
+
+        If ParameterObject.precision is 'single', the steps are calculated in complex64 until epsilon is smaller than
+        ParameterObject.precision_switch, then BFFP continues in double precision (see setUpWorkspace).
         '''
         # set up epsilon
         epsilon_iteration_step = 1
+        epsilon_old = np.inf
         epsilon_sum = 0
-        psi_max_old = np.zeros(self.paramObj.getResolution())
-        psi_max = self.psi_0.psi_array
         self.n = 0
+        self.t = 0
+        self.dt = self.paramObj.dt
 
-        G_m = WaveFunction2D(self.paramObj)
-        
+        # continue from a checkpoint, psi_0 contains psi of the checkpoint
+        if self.resumeState is not None:
+            state = self.resumeState
+            self.n, self.t, self.dt, epsilon_sum = int(state['n']), state['t'], state['dt'], state['epsilon_sum']
+            epsilon_iteration_step, epsilon_old = state['epsilon'], state.get('epsilon_old', np.inf)
+            self.resumeState = None
+
+        # set up the buffers, psi_n works directly on the workspace
+        precision = self.paramObj.precision
+        ws = self.setUpWorkspace(precision, self.psi_0.psi_array)
+        real = ws.real_dtype
+        backend = self.paramObj.getFFTBackend()
+        if self.mixer is not None:
+            self.mixer.reset()
 
         # loop over imaginary time steps
         # conditions for loop are exit conditions
         while epsilon_iteration_step > self.epsilon_iteration_step_limit and self.n < self.maxIterations:
-            # calculate alpha for this time step
-            alpha = self.calcAlpha()
+            # single precision can not resolve small changes of psi, so the last part is calculated in double precision
+            if precision == 'single' and epsilon_iteration_step < self.paramObj.precision_switch:
+                print("[INFO] Switching to double precision at time step {}.".format(self.n))
+                precision = 'double'
+                ws = self.setUpWorkspace(precision)
+                real = ws.real_dtype
+                if self.mixer is not None:
+                    self.mixer.reset()
 
             # the linear system is aproximatively solved by only doing one iteration step to the iterative solution of the system.
-            # calculate psi_hat, L_psi and G_n
-            self.psi_n.calcFFT()
-            self.psi_n.calcL()
-            G_m.setPsi(self.psi_n.calcG_m(self.psi_n, alpha))
-            G_m.calcFFT()
-
-            # calculate the next psi_n
+            # calculate psi_hat and the spatial derivatives, every array is written into the workspace.
+            # psi_n only calculates them if they were not calculated for the observables of the last step
+            Dx_psi, Dy_psi = self.psi_n.calcDerivatives()
+
+            # calculate L_psi, G_n without alpha*psi and the bounds for alpha in one sweep
+            bmin, bmax = real_space_stage(ws.V, real(self.paramObj.beta2), real(self.paramObj.omega), self.psi_n.psi_array,
+                Dx_psi, Dy_psi, ws.x, ws.y, ws.L_psi, ws.G)
+            self.psi_n.L_psi_contains_values = True
+
+            # a reduced time step changes the fixed point map, so the history of the Anderson mixing is deleted
+            if self.paramObj.adaptive_dt and self.adaptTimeStep(bmin, bmax, epsilon_iteration_step/epsilon_old):
+                # epsilon is not comparable between different time steps, it increases after dt was reduced,
+                # so the next step is not compared to this one
+                epsilon_iteration_step = np.inf
+                if self.mixer is not None:
+                    self.mixer.reset()
+            alpha = self.alphaFromBounds(bmin, bmax)
+            backend.fft2(ws.G, out=ws.G)
+
+            # calculate the next psi_n into the buffer of the previous time step
             self.n += 1
-            self.psi_n.setPsiHat(self.calcNextPsi_m(G_m, alpha))
-            self.psi_n.calcIFFT()
-            self.psi_n.norm()
-
-            # calculate epsilon
-            psi_max_old = psi_max
-            psi_max = self.psi_n.psi_array
-            epsilon_iteration_step = np.max(np.abs(psi_max_old - psi_max)) / self.dt
+            self.t += self.dt
+            spectral_stage(ws.psi_hat, ws.G, ws.k2, real(self.dt), real(alpha), ws.G)
+            backend.ifft2(ws.G, out=ws.getPreviousPsi())
+            ws.swap()
+
+            # renormalize psi_n and calculate epsilon in the same sweep
+            factor = 1/np.sqrt(interior_norm2(ws.getPsi()) * self.paramObj.dx * self.paramObj.dy)
+            epsilon_old = epsilon_iteration_step
+            epsilon_iteration_step = renormalize_epsilon(ws.getPsi(), ws.getPreviousPsi(), real(factor)) / self.dt
+
+            # safeguard of the Anderson mixing, the residual of an extrapolated psi_n must be smaller than the one before
+            if self.mixer is not None and self.mixer.mixed and epsilon_iteration_step > epsilon_old:
+                print("[INFO] Anderson mixing increased epsilon, restarting it.")
+                self.mixer.reset()
+
+            # extrapolate the next psi_n from the history and renormalize it
+            if (self.mixer is not None and epsilon_iteration_step < self.paramObj.anderson_start
+                and self.mixer.mix(ws.getPreviousPsi(), ws.getPsi(), out=ws.getPsi())):
+                ws.getPsi()[...] *= 1/np.sqrt(interior_norm2(ws.getPsi()) * self.paramObj.dx * self.paramObj.dy)
+            # psi_n is the finished next step, its components are calculated again
+            self.psi_n.setPsi(ws.getPsi())
             print('n = {}, Epsilon = {:1.3e}, Epsilon sum = {:1.2f}'.format(self.n, epsilon_iteration_step, epsilon_sum))
+            self.recordStep(t=self.t, dt=self.dt, epsilon=epsilon_iteration_step, alpha=alpha,
+                **(self.calcObservables() if self.observablesDue() else {}))
             epsilon_sum += epsilon_iteration_step
 
             # see if a frame has to be saved
             if epsilon_sum > self.paramObj.epsilon_threshold:
-                attributes = {
-                    'n': self.n,
-                    't': self.n*self.dt,
-                    'epsilon': epsilon_iteration_step
-                }
-                self.dataM.addDset(self.returnPsi(), attributes)
+                self.saveFrame(epsilon_iteration_step, self.t, self.dt)
                 epsilon_sum = 0
                 print("Saved a frame. Frame number {}".format(self.dataM.incKey))
+
+            # see if a checkpoint has to be written
+            if self.paramObj.checkpoint_interval > 0 and self.n % self.paramObj.checkpoint_interval == 0:
+                self.saveCheckpoint('BFFP', epsilon_iteration_step, epsilon_sum, alpha=alpha, epsilon_old=epsilon_old)
         
         # end of iteration, psi_n should (hopefully) be the ground state
-        # add the last frame to the data manager
+        # add the last frame to the data manager, the checkpoint is not needed anymore
+        self.saveFrame(epsilon_iteration_step, self.t, self.dt)
+        self.flushTimeSeries()
+        self.dataM.removeCheckpoint()
+        self.dataM.file.attrs["n_frames"] = self.dataM.getNFrames()
+        self.dataM.file.attrs["calculated_observables"] = self.paramObj.inline_observables
+
+        print("Took {} (time) iteration steps. Saved {} frames.".format(self.n, self.dataM.incKey))
+
+    def saveFrame(self, epsilon, t, dt=None):
+        '''Adds psi of the current step as a frame to the data manager.
+
+        Arguments:
+            epsilon: A float, the value of epsilon of the current step.
+            t: A float, the (imaginary) time of the current step.
+            dt: An optional float, the time step of the current step.
+        '''
         attributes = {
-                    'n': self.n,
-                    't': self.n*self.dt,
-                    'epsilon': epsilon_iteration_step
-                }
+            'n': self.n,
+            't': t,
+            'epsilon': epsilon
+        }
+        if dt is not None:
+            attributes['dt'] = dt
+        if self.paramObj.inline_observables:
+            attributes.update(self.calcObservables())
         self.dataM.addDset(self.returnPsi(), attributes)
+
+    def PCG(self):
+        '''This function calculates the ground state with a preconditioned nonlinear conjugate gradient method [3].
+
+        Instead of following the gradient flow with a time step, the energy is minimized directly on the manifold of normalized wavefunctions.
+        Every iteration the gradient is preconditioned with the kinetic and the potential part of the hamiltonian, combined with
+        the previous search direction (Polak-Ribiere) and followed along a great circle with an energy line search.
+        This is not restricted by the time step constraint and needs far less iterations than BFFP for fast rotation and strong interaction.
+
+        Epsilon is the maximum of the residual |H psi - mu psi|, which is what BFFP measures as epsilon close to the ground state,
+        so epsilon_limit and epsilon_threshold can be used the same way. The frames use the iteration number as time t.
+        '''
+        # set up aliases
+        V = self.paramObj.V
+        beta2 = self.paramObj.beta2
+        omega = self.paramObj.omega
+        dA = self.paramObj.dx * self.paramObj.dy
+        grid = self.paramObj.getSpectralGrid()
+        x, y = grid.xx[:, 0], grid.yy[0]
+        backend = self.paramObj.getFFTBackend()
+        shape = self.paramObj.getResolution()
+
+        # set up all arrays once, PCG always calculates in double precision
+        complex_dtype, real_dtype = self.paramObj.getDtypes('double')
+        psi, psi_trial, H_psi, H_psi_trial = [np.zeros(shape, dtype=complex_dtype) for _ in range(4)]
+        r, r_old, P_r, d, d_hat, H_d = [np.zeros(shape, dtype=complex_dtype) for _ in range(6)]
+        b, b_trial, P_delta, sqrt_P_V, density = [np.zeros(shape, dtype=real_dtype) for _ in range(5)]
+        phi_hat = np.zeros(shape, dtype=complex_dtype)
+        stack = np.zeros((3,) + shape, dtype=complex_dtype)
+
+        def inner(u, v):
+            # real part of the L2 inner product
+            return np.vdot(u, v).real * dA
+
+        def normalize(phi):
+            # the same normalization as BFFP and WaveFunction2D.norm, the sum without the boundary
+            phi *= 1/np.sqrt(interior_norm2(phi) * dA)
+
+        def applyH(phi, b_, out):
+            # out = H phi with the potential part b_, returns the kinetic energy <phi, T phi>
+            backend.fft2(phi, out=phi_hat)
+            np.multiply(grid.my_p, phi_hat, out=stack[0])
+            np.multiply(grid.lambda_q, phi_hat, out=stack[1])
+            np.multiply(grid.k2, phi_hat, out=stack[2])
+            stack[2] *= 0.5
+            backend.ifft2(stack, out=stack)
+            hamiltonian_stage(b_, omega, phi, stack[0], stack[1], stack[2], x, y, out)
+            return inner(phi, stack[2])
+
+        def energy(phi, b_, H_phi):
+            # calculates b_ and H phi, returns the energy and the kinetic and potential parts used by the preconditioner
+            s4, sb = potential_stage(V, beta2, phi, b_)
+            kinetic = applyH(phi, b_, H_phi)
+            return inner(phi, H_phi) - 0.5*beta2*s4*dA, kinetic, sb*dA
+
+        # start with the normalized initial wavefunction
+        psi[...] = self.psi_0.psi_array
+        normalize(psi)
+        self.psi_n.setPsi(psi)
+        E, kinetic, potential = energy(psi, b, H_psi)
+
+        epsilon_iteration_step = 1
+        epsilon_sum = 0
+        rP_r_old = None
+        self.n = 0
+
+        # continue from a checkpoint, psi_0 contains psi of the checkpoint. The conjugate direction starts again.
+        if self.resumeState is not None:
+            self.n, epsilon_sum = int(self.resumeState['n']), self.resumeState['epsilon_sum']
+            self.resumeState = None
+
+        while self.n < self.maxIterations:
+            # residual of the eigenvalue problem, mu is the chemical potential (the Rayleigh quotient)
+            mu = inner(psi, H_psi) / inner(psi, psi)
+            np.multiply(psi, mu, out=r)
+            np.subtract(H_psi, r, out=r)
+            epsilon_iteration_step = np.max(np.abs(r, out=density))
+            if epsilon_iteration_step <= self.epsilon_iteration_step_limit:
+                break
+
+            # combined kinetic and potential preconditioner P = P_V^1/2 P_delta P_V^1/2 [3]
+            np.multiply(grid.k2, 0.5, out=P_delta)
+            P_delta += kinetic
+            np.divide(1, P_delta, out=P_delta)
+            np.add(b, potential, out=sqrt_P_V)
+            np.sqrt(sqrt_P_V, out=sqrt_P_V)
+            np.divide(1, sqrt_P_V, out=sqrt_P_V)
+            np.multiply(r, sqrt_P_V, out=P_r)
+            backend.fft2(P_r, out=P_r)
+            P_r *= P_delta
+            backend.ifft2(P_r, out=P_r)
+            P_r *= sqrt_P_V
+
+            # new conjugate direction with the Polak-Ribiere formula, restarted if it is not a descent direction
+            rP_r = inner(r, P_r)
+            beta_PR = 0
+            if rP_r_old is not None:
+                beta_PR = max(0, (rP_r - inner(r_old, P_r)) / rP_r_old)
+            d *= beta_PR
+            d -= P_r
+            d -= inner(psi, d) * psi
+            if inner(r, d) >= 0:
+                np.negative(P_r, out=d)
+                d -= inner(psi, d) * psi
+            r_old[...] = r
+            rP_r_old = rP_r
+
+            # line search along psi(theta) = cos(theta) psi + sin(theta) d_hat
+            # theta is the minimum of the second order expansion of E(theta), E'' is calculated with the linearized hamiltonian
+            np.divide(d, np.sqrt(inner(d, d)), out=d_hat)
+            slope = 2*inner(r, d_hat)
+            applyH(d_hat, b, H_d)
+            np.conjugate(psi, out=phi_hat)
+            phi_hat *= d_hat
+            curvature = 2*(inner(d_hat, H_d) - mu) + 4*beta2*np.sum(phi_hat.real**2)*dA
+            theta = -slope/curvature if curvature > 0 else 0.1
+            theta = min(theta, np.pi/4)
+
+            # the step is halved until the energy decreases
+            for _ in range(10):
+                np.multiply(psi, np.cos(theta), out=psi_trial)
+                psi_trial += np.sin(theta) * d_hat
+                normalize(psi_trial)
+                E_trial, kinetic_trial, potential_trial = energy(psi_trial, b_trial, H_psi_trial)
+                if E_trial <= E:
+                    break
+                theta /= 2
+            else:
+                # no decrease was found, so the conjugate direction is reset
+                rP_r_old = None
+                d[...] = 0
+
+            # accept the step and calculate epsilon like in BFFP
+            self.n += 1
+            self.t = self.n
+            psi, psi_trial = psi_trial, psi
+            b, b_trial = b_trial, b
+            H_psi, H_psi_trial = H_psi_trial, H_psi
+            E, kinetic, potential = E_trial, kinetic_trial, potential_trial
+            self.psi_n.setPsi(psi)
+
+            print('n = {}, Epsilon = {:1.3e}, E = {:1.6f}, Epsilon sum = {:1.2f}'.format(self.n, epsilon_iteration_step, E, epsilon_sum))
+            # E of the time series is the energy of the line search, which is calculated every step anyway
+            observables = dict(self.calcObservables(), E=E) if self.observablesDue() else {'E': E}
+            self.recordStep(t=self.n, epsilon=epsilon_iteration_step, **observables)
+            epsilon_sum += epsilon_iteration_step
+
+            # see if a frame has to be saved
+            if epsilon_sum > self.paramObj.epsilon_threshold:
+                self.saveFrame(epsilon_iteration_step, self.n)
+                epsilon_sum = 0
+                print("Saved a frame. Frame number {}".format(self.dataM.incKey))
+
+            # see if a checkpoint has to be written
+            if self.paramObj.checkpoint_interval > 0 and self.n % self.paramObj.checkpoint_interval == 0:
+                self.saveCheckpoint('PCG', epsilon_iteration_step, epsilon_sum)
+
+        # end of iteration, psi_n should be the ground state
+        # add the last frame to the data manager, the checkpoint is not needed anymore.
+        # psi is already normalized, so the frame is the state epsilon and E were calculated for
+        self.saveFrame(epsilon_iteration_step, self.n)
+        self.flushTimeSeries()
+        self.dataM.removeCheckpoint()
         self.dataM.file.attrs["n_frames"] = self.dataM.getNFrames()
+        self.dataM.file.attrs["calculated_observables"] = self.paramObj.inline_observables
 
-        print("Took {} (time) iteration steps. Saved {} frames.".format(self.n, self.dataM.incKey))
+        print("Took {} iteration steps. Saved {} frames.".format(self.n, self.dataM.incKey))
@@ -8,80 +8,141 @@
 
 import numpy as np
 import numpy.fft as fft
-from numba import jit
 
 from .parameter_object import ParameterObject, Psi0Choice
+from .observables import ObservableEngine
+from .quadrature import simpsonWeights
 
-# implementation of the simpson integration rule for the calculation of the observables
+# implementation of the simpson integration rule
 def simpson(y, x):
-    '''Simpson rule for any amount of intervals.
-    Only works for equal intervals.
+    '''Simpson rule for any amount of intervals, for an odd amount the last interval uses the trapezoid rule.
+    Only works for equal intervals. y is integrated along its last axis, so simpson(simpson(f, y), x) is the 2D integral of f[x, y].
+    For 2D integrals on the grid of a ParameterObject use the cached weights of ParameterObject.getQuadrature() instead.
     '''
-    N = len(x)
-    if N%2==1:
-        s = simpson_even(y, x)
-    else:
-        s = simpson_even(y[:-1], x[:-1])
-        # trapeziod rule for last iterval
-        s += (x[-1]-x[-2]) * (y[-1]+y[-2])/2
-    return s
-
-@jit
-def simpson_even(y, x):
-    '''Simpson rule for even amount of intervals.
-    Only works for equal intervals.
+    return y @ simpsonWeights(x)
+
+
+# derived components of the wavefunction and the components they are calculated from.
+# if a component is invalidated, all components that depend on it are invalidated as well.
+COMPONENT_DEPENDENCIES = {
+    'psi_hat': ('derivatives', 'L_psi', 'nabla_psi', 'observables'),
+    'derivatives': ('L_psi', 'nabla_psi', 'observables'),
+}
+
+def componentFlag(name):
+    '''Returns a property that tells whether the component name belongs to the current version of the wavefunction.
+    Setting it to True marks the component as current, setting it to False invalidates it.
     '''
-    N = len(x)
-    a = x[0]
-    b = x[-1]
-    h = (b-a)/(N-1)
-    
-    s = 2*np.sum(y[2:-1:2]) + 4*np.sum(y[1:-1:2])
-    s += y[0] + y[-1]
-    return s * h/3
+    def getter(self):
+        return self.isCurrent(name)
+    def setter(self, value):
+        if value:
+            self.markCurrent(name)
+        else:
+            self.invalidate(name)
+    return property(getter, setter)
 
 
 class WaveFunction2D:
     '''This class represents a complex wave function in 2 dimensions and contains all neccessary functions to manipulate it.
     Especially this class also contains functionality for the fourier transform psi_hat of the wave function and several other "components".
 
+    Every change of the wavefunction increases version. The derived components (psi_hat, the derivatives, L_psi, nabla_psi,
+    the norm, the density and the observables) remember the version they were calculated for, so the calc methods only calculate
+    them if the wavefunction changed since. Assigning psi_array, setPsi and setPsiHat increase the version automatically,
+    after psi_array was changed in place (e.g. psi_array[...] = ...) touch() has to be called.
+
+    The component arrays are only allocated when a component is calculated for the first time, so temporary
+    wavefunctions like G_m only use the memory of the components they need. The attributes are fixed by __slots__.
+
     Attributes:
         paramObj: A ParameterObject instance.
+        version: An integer that is increased every time the wavefunction changes.
+        componentVersions: A dictionary with the version every component was calculated for.
         psi_array: A 2D numpy array that contains complex values of the wavefunction.
-        psi_contains_values: A boolean that indicates whether psi_array was initialized.
-        psi_hat_array: A 2D numpy array that contains complex values of the fourier transform of the wavefunction.
-        psi_hat_contains_values: A boolean that indicates whether psi_hat_array was initialized.
-        L_psi_array: A 2D numpy array that contains complex values of the angular momentum operator applied to the wavefunction.
-        L_psi_contains_values: A boolean that indicates whether L_psi_array was initialized.
-        nabla_psi_array: A 2D numpy array that contains complex values of the Nabla operator applied to the wavefunction.
-        nabla_psi_contains_values: A boolean that indicates whether nabla_psi_array was initialized.
+        psi_contains_values: A boolean that indicates whether psi_array contains the current wavefunction.
+        psi_hat_array: A 2D numpy array that contains complex values of the fourier transform of the wavefunction. None until it is calculated.
+        psi_hat_contains_values: A boolean that indicates whether psi_hat_array belongs to the current wavefunction.
+        L_psi_array: A 2D numpy array that contains complex values of the angular momentum operator applied to the wavefunction. None until it is calculated.
+        L_psi_contains_values: A boolean that indicates whether L_psi_array belongs to the current wavefunction.
+        nabla_psi_array: A 2D numpy array that contains complex values of the Nabla operator applied to the wavefunction. None until it is calculated.
+        nabla_psi_contains_values: A boolean that indicates whether nabla_psi_array belongs to the current wavefunction.
+        derivatives_array: A (2, M, N) numpy array that contains D_x(Psi) and D_y(Psi), used by calcL and calcNabla.
+        derivatives_contains_values: A boolean that indicates whether derivatives_array belongs to the current wavefunction.
+        density_array: A real 2D numpy array that contains |psi|^2, see getDensity.
         E: The energy expectation value of the wavefunction.
         L_expectation: The angular momentum expectation value of the wavefunction.
         Nabla_expectation: The kinetic energy expectation value of the wavefunction.
     '''
+    psi_contains_values = componentFlag('psi')
+    psi_hat_contains_values = componentFlag('psi_hat')
+    L_psi_contains_values = componentFlag('L_psi')
+    nabla_psi_contains_values = componentFlag('nabla_psi')
+    derivatives_contains_values = componentFlag('derivatives')
+
+    __slots__ = ('paramObj', 'version', 'componentVersions', '_psi_array', 'psi_hat_array', 'L_psi_array', 'nabla_psi_array',
+        'derivatives_array', 'density_array', 'normValue', 'E', 'L_expectation', 'Nabla_expectation')
+
     def __init__(self, parameterObject):
-        """Initializes the instance. Sets all 2D arrays to zero."""
+        """Initializes the instance. No array is allocated until it is needed."""
         if type(parameterObject) != ParameterObject:
             raise TypeError("Argument parameterObject has to be of the type {}. Given is type {}.".format(type(ParameterObject), type(parameterObject)))
         
         self.paramObj = parameterObject
 
-        self.psi_contains_values = False
-        self.psi_array = np.zeros(self.paramObj.getResolution()) + (0+0j)
-
-        self.psi_hat_contains_values = False
-        self.psi_hat_array = np.zeros(self.paramObj.getResolution()) + (0+0j)
-
-        self.L_psi_contains_values = False
-        self.L_psi_array = np.zeros(self.paramObj.getResolution()) + (0+0j)
-
-        self.nabla_psi_contains_values = False
-        self.nabla_psi_array = np.zeros(self.paramObj.getResolution()) + (0+0j)
+        # nothing is current before psi is set
+        self.version = 0
+        self.componentVersions = {}
+        self._psi_array = None
+        self.psi_hat_array = None
+        self.L_psi_array = None
+        self.nabla_psi_array = None
+        self.derivatives_array = None
+        self.density_array = None
+        self.normValue = None
 
         self.E = None
         self.L_expectation = None
         self.Nabla_expectation = None
-    
+
+    @property
+    def psi_array(self):
+        # an unset wavefunction is zero
+        if self._psi_array is None:
+            self._psi_array = np.zeros(self.paramObj.getResolution(), dtype=np.complex128)
+        return self._psi_array
+
+    @psi_array.setter
+    def psi_array(self, array):
+        # assigning psi_array, also by psi_array /= ..., is a new wavefunction
+        self._psi_array = array
+        self.touch()
+
+    def touch(self):
+        """Marks the wavefunction as changed, all derived components are calculated again when they are needed.
+        Has to be called after psi_array was changed in place.
+        """
+        self.version += 1
+        self.componentVersions = {'psi': self.version}
+
+    def isCurrent(self, name):
+        """Returns True if the component name was calculated for the current version of the wavefunction.
+        """
+        return self.componentVersions.get(name) == self.version
+
+    def markCurrent(self, name):
+        """Marks the component name as calculated for the current version of the wavefunction.
+        Used by code that writes a component into its array directly, like BFFP does for L_psi.
+        """
+        self.componentVersions[name] = self.version
+
+    def invalidate(self, name):
+        """Marks the component name and every component that is calculated from it (COMPONENT_DEPENDENCIES) as outdated.
+        """
+        self.componentVersions.pop(name, None)
+        for dependent in COMPONENT_DEPENDENCIES.get(name, ()):
+            self.componentVersions.pop(dependent, None)
+
     def setPsi(self, array):
         """A method to manually set psi_array to a given 2d array.
 
@@ -92,7 +153,6 @@ class WaveFunction2D:
         if array.shape != self.paramObj.getResolution():
             raise ValueError("Shape {} of input array does not match the resolution {}.".format(array.shape, self.paramObj.getResolution()))
         self.psi_array = array
-        self.psi_contains_values = True
 
     def setPsiHat(self, array):
         """A method to manually set psi_hat_array to a given 2d array.
@@ -103,8 +163,10 @@ class WaveFunction2D:
         # checks if the shape of the array matches the reolution
         if array.shape != self.paramObj.getResolution():
             raise ValueError("Shape {} of input array does not match the resolution {}.".format(array.shape, self.paramObj.getResolution()))
+        # psi_hat is the new wavefunction now, psi_array is outdated until calcIFFT is called
         self.psi_hat_array = array
-        self.psi_hat_contains_values = True
+        self.touch()
+        self.componentVersions = {'psi_hat': self.version}
 
     def initPsi_0(self):
         """ Sets psi_arrays to the correct form.
@@ -129,7 +191,6 @@ class WaveFunction2D:
         my_g = 0.5*np.sqrt(4*self.paramObj.beta2*gamma_y)
         self.psi_array = np.sqrt(np.maximum(0, my_g - self.paramObj.V)/self.paramObj.beta2)
         self.norm()
-        self.psi_contains_values = True
 
     def initPsiGauss(self, sigma=1, x0=0, y0=0):
         """Initializes psi_array with a simple 2d gaussian.
@@ -143,7 +204,6 @@ class WaveFunction2D:
 
         self.psi_array = 1/(sigma**2) * np.exp(-0.5*((xx-x0)**2 + (yy-y0)**2)/sigma**2)
         self.norm()
-        self.psi_contains_values = True
 
     def initPsiGauss_double(self, sigma=1, x0=2, y0=0):
         """ initializes Psi with a double 2d gaussian
@@ -159,61 +219,125 @@ class WaveFunction2D:
         self.psi_array = 1/(sigma**2) * np.exp(-0.5*((xx-x0)**2 + (yy-y0)**2)/sigma**2)
         self.psi_array += 1/(sigma**2) * np.exp(-0.5*((xx+x0)**2 + (yy+y0)**2)/sigma**2)
         self.norm()
-        self.psi_contains_values = True
+
+    def interpolate(self, parameterObject):
+        """Interpolates the wavefunction spectrally onto the grid of another ParameterObject with the same bounds.
+        The trigonometric interpolant defined by psi_hat is evaluated at the new grid points, which is the same as
+        zero-padding psi_hat for a finer grid. It is evaluated explicitly since x and y contain both bounds,
+        so the grid points of different resolutions are not nested like the periodic grids assumed by zero-padding.
+
+        Arguments:
+            parameterObject: A ParameterObject instance whose resolution is used.
+
+        Returns:
+            A new, normalized WaveFunction2D instance.
+        """
+        if parameterObject.getBoundaries() != self.paramObj.getBoundaries():
+            raise ValueError("The bounds {} do not match the bounds {} of the wavefunction.".format(parameterObject.getBoundaries(), self.paramObj.getBoundaries()))
+        self.calcFFT()
+
+        # psi(x, y) = sum psi_hat * exp(i*(k_x*x + k_y*y)) with the period of the old grid points,
+        # it separates into one matrix for every direction
+        def fourierMatrix(x_old, x_new):
+            k = 2*np.pi * np.fft.fftfreq(len(x_old), d=x_old[1] - x_old[0])
+            return np.exp(1j * np.outer(x_new - x_old[0], k))
+
+        E_x = fourierMatrix(self.paramObj.x, parameterObject.x)
+        E_y = fourierMatrix(self.paramObj.y, parameterObject.y)
+        w = WaveFunction2D(parameterObject)
+        w.setPsi(E_x @ self.psi_hat_array @ E_y.T)
+        w.norm()
+        return w
 
     def norm(self):
         """Normalizes psi_array.
         Uses the normailization formula from [1].
         """
-        self.psi_array /= np.sqrt( np.sum(np.abs(self.psi_array[1:-1, 1:-1])**2) * self.paramObj.dx * self.paramObj.dy )
+        self.psi_array /= self.getNorm()
         return self.psi_array
 
     def getNorm(self):
-        """Returns the norm of psi_array.
+        """Returns the norm of psi_array, the integral of |psi|^2 with the 'interior' rule of ParameterObject.getQuadrature,
+        which leaves out the boundary [1]. It is only calculated once per version of the wavefunction.
+        """
+        if not self.isCurrent('norm'):
+            self.normValue = np.sqrt(self.paramObj.getQuadrature('interior').integrateProduct(self.psi_array, self.psi_array).real)
+            self.markCurrent('norm')
+        return self.normValue
+
+    def getDensity(self):
+        """Returns |psi|^2. It is only calculated once per version of the wavefunction, the array must not be changed.
         """
-        return np.sqrt( np.sum(np.abs(self.psi_array[1:-1, 1:-1])**2) * self.paramObj.dx * self.paramObj.dy )
+        if not self.isCurrent('density'):
+            if self.density_array is None or self.density_array.shape != self.psi_array.shape:
+                self.density_array = np.empty(self.psi_array.shape)
+            np.abs(self.psi_array, out=self.density_array)
+            np.square(self.density_array, out=self.density_array)
+            self.markCurrent('density')
+        return self.density_array
 
     def calcFFT(self):
-        """Calculates and saves the fast Fourier Tranform (FFT) of psi_array.
+        """Calculates and saves the fast Fourier Tranform (FFT) of psi_array, if it does not belong to the current wavefunction yet.
+
+        Returns:
+            psi_hat_array.
         """
+        if self.psi_hat_contains_values:
+            return self.psi_hat_array
         # checks if psi_array was initialized
         if not self.psi_contains_values:
             raise ValueError("Psi does not contain values or Psi was not initialized!")
         else:
-            # uses the numpy fft for speed since this operation has to be performed a lot.
-            self.psi_hat_array = np.fft.fft2(self.psi_array) /(np.prod(self.paramObj.getResolution()))
-            self.psi_hat_contains_values = True
+            # uses the selected FFT backend, the normalization is part of the transform.
+            # psi_hat_array is reused as the output buffer if it has the right form, single precision stays single precision.
+            out = self.psi_hat_array
+            dtype = np.result_type(self.psi_array.dtype, np.complex64)
+            if out is None or out.shape != self.psi_array.shape or out.dtype != dtype or np.may_share_memory(out, self.psi_array):
+                out = None
+            self.psi_hat_array = self.paramObj.getFFTBackend().fft2(self.psi_array, out=out)
+            self.markCurrent('psi_hat')
+            return self.psi_hat_array
 
     def calcIFFT(self):
-        """Calculates and saves the inverse fast Fourier Tranform (IFFT) of psi_array.
+        """Calculates and saves the inverse fast Fourier Tranform (IFFT) of psi_array, if psi_array does not contain the current wavefunction.
+
+        Returns:
+            psi_array.
         """
+        if self.psi_contains_values:
+            return self.psi_array
         # checks if psi_hat_array was initialized
         if not self.psi_hat_contains_values:
             raise ValueError("Psi_hat does not contain values or Psi_hat was not initialized!")
         else:
-            # uses the numpy fft for speed since this operation has to be performed a lot.
-            self.psi_array = np.fft.ifft2(self.psi_hat_array) * (np.prod(self.paramObj.getResolution()))
-            self.psi_contains_values = True
+            # uses the selected FFT backend, the normalization is part of the transform.
+            # a new array is returned, since other objects may still reference the old psi_array.
+            # the transform is the same wavefunction, so the version does not change
+            self._psi_array = self.paramObj.getFFTBackend().ifft2(self.psi_hat_array)
+            self.markCurrent('psi')
+            return self.psi_array
 
-    def calcEnergy(self):
-        """Calulates the expectaion value for the total (GPE) energy.
+    def calcObservables(self):
+        """Calculates the energy, the angular momentum and the kinetic energy with an ObservableEngine and saves them in
+        E, L_expectation and Nabla_expectation. They, psi_hat and the derivatives are only calculated once per version of the wavefunction.
 
         Returns:
-            Expectation value for the energy.
+            A 3-tuple (E, L, Nabla).
         """
-        # set up aliases
-        x = self.paramObj.x
-        y = self.paramObj.y
+        if not self.isCurrent('observables'):
+            derivatives = self.calcDerivatives()
+            self.E, self.L_expectation, self.Nabla_expectation = ObservableEngine(self.paramObj).calcObservables(
+                self.psi_array, self.psi_hat_array, derivatives)
+            self.markCurrent('observables')
+        return self.E, self.L_expectation, self.Nabla_expectation
 
-        # add each term of the GPE energy [1] to avoid mistakes
-        dE = 0.5*np.abs(self.nabla_psi_array)**2 
-        dE += self.paramObj.V * np.abs(self.psi_array)**2
-        dE += self.paramObj.beta2/2 * np.abs(self.psi_array)**4
-        dE -= self.paramObj.omega * (np.conjugate(self.psi_array)*self.L_psi_array).real
+    def calcEnergy(self):
+        """Calulates the expectaion value for the total (GPE) energy [1].
 
-        # 2d integrate by using the simpson rule twice on different axes
-        self.E = simpson(simpson(dE, y), x)
-        return self.E
+        Returns:
+            Expectation value for the energy.
+        """
+        return self.calcObservables()[0]
 
     def calcL_expectation(self):
         """Calculates the expectation value for the angular momentum.
@@ -221,102 +345,41 @@ class WaveFunction2D:
         Returns:
             Expectation value for the angular momentum.
         """
-        # set up aliases
-        x = self.paramObj.x
-        y = self.paramObj.y
-
-        # set up integrant
-        dL = np.conjugate(self.psi_array)*self.L_psi_array
-
-        # 2d integrate by using the simpson rule twice on different axes
-        self.L_expectation = simpson(simpson(dL, y), x)
-        return self.L_expectation
+        return self.calcObservables()[1]
 
     def calcNabla_expectation(self):
-        '''Calculates the expectation value for the kinetic energy.
+        '''Calculates the expectation value for the kinetic energy, 1/2 int |nabla psi|^2.
         '''
-        # set up aliases
-        x = self.paramObj.x
-        y = self.paramObj.y
-
-        # set up integrant
-        dN = 0.5*np.abs(self.nabla_psi_array)**2
+        return self.calcObservables()[2]
 
-        # 2d integrate by using the simpson rule twice on different axes
-        self.Nabla_expectation = simpson(simpson(dN, y), x)
-        return self.Nabla_expectation
-
-    def calcNabla(self):
-        """Calculates the spatial derivative operator nabla applied to the wavefunction.
-        Retruns:
-            The Wavefunction after the nabla operator was applied.
-        """
-        # set up aliases
-        a, b, c, d = self.paramObj.getBoundaries()
-        M, N = self.paramObj.getResolution()
-        
-        # set up grid in fourier space
-        p = np.arange(-M//2, M//2, 1)
-        q = np.arange(-N//2, N//2, 1)
-        pp, qq = np.meshgrid(p, q, indexing='ij')
-
-        # set up 'derivation' constants in fourier space
-        lambda_q = 2*qq*np.pi/(d-c)
-        my_p = 2*pp*np.pi/(b-a)
-
-        # shift 'derivation' constants, will give wrong results otherwise
-        my_p = np.fft.fftshift(my_p)
-        lambda_q = np.fft.fftshift(lambda_q)
-
-        # do spatial derivation by fourier transforming twice
-        n_psi = WaveFunction2D(self.paramObj)
-        n_psi.setPsiHat((my_p + lambda_q) * self.psi_hat_array)
-        n_psi.calcIFFT()
-
-        self.nabla_psi_array = n_psi.psi_array
-        self.nabla_psi_contains_values = True
-        return self.nabla_psi_array
-
-    @jit
-    def calcL(self):
-        """Calculates the angular momentum operator acting on the wavefunction.
-        This is done by L Psi = (x*d/dy - y*d/dx) Psi [1].
+    def calcDerivatives(self):
+        """Calculates the single spatial derivatives D_x(Psi) and D_y(Psi).
+        Both multipliers are stacked into one (2, M, N) buffer in fourier space and transformed back with one batched inverse FFT.
+        They are only calculated once per version of the wavefunction.
 
         Returns:
-            The Wavfunction after the angular momentum operator was applied.
+            A (2, M, N) numpy array that contains D_x(Psi) and D_y(Psi).
         """
-        # set some aliases
-        a, b, c, d = self.paramObj.getBoundaries()
-        M, N = self.paramObj.getResolution()
-
-        # calculate the FFT of Psi
-        if not self.psi_hat_contains_values:
-            print("[WARNING] Calculating psi_hat since it is empty")
-            self.calcFFT()
+        if self.derivatives_contains_values:
+            return self.derivatives_array
 
-        # calculating D_x(Psi) and D_y(Psi) first to later Calculate L
-        # set up grid in fourier space
-        p = np.arange(-M//2, M//2, 1)
-        q = np.arange(-N//2, N//2, 1)
-        pp, qq = np.meshgrid(p, q, indexing='ij')
+        # get the cached 'derivation' constants in fourier space
+        grid = self.paramObj.getSpectralGrid()
 
-        # set up 'derivation' constants in fourier space
-        lambda_q = 2*qq*np.pi/(d-c)
-        my_p = 2*pp*np.pi/(b-a)
+        # calculate the FFT of Psi, if it is not current
+        self.calcFFT()
 
-        # shift 'derivation' constants, will give wrong results otherwise
-        my_p = np.fft.fftshift(my_p)
-        lambda_q = np.fft.fftshift(lambda_q)
+        # the buffer is only allocated once
+        shape = (2,) + self.psi_hat_array.shape
+        if self.derivatives_array is None or self.derivatives_array.shape != shape or self.derivatives_array.dtype != self.psi_hat_array.dtype:
+            self.derivatives_array = np.empty(shape, dtype=self.psi_hat_array.dtype)
 
-        # Calculate single spatial derivative in x direction
-        Dx_psi = WaveFunction2D(self.paramObj)
-        Dx_psi.setPsiHat(my_p * self.psi_hat_array)
-        Dx_psi.calcIFFT()
-
-        # Calculate single spatial derivative in y direction
-        Dy_psi = WaveFunction2D(self.paramObj)
-        Dy_psi.setPsiHat(lambda_q * self.psi_hat_array)
-        Dy_psi.calcIFFT()
+        # do spatial derivation by fourier transforming twice, D_x in [0] and D_y in [1]
+        # the products are calculated in the precision of psi_hat
+        dtype = self.derivatives_array.dtype
+        np.multiply(grid.my_p, self.psi_hat_array, out=self.derivatives_array[0], dtype=dtype)
+        np.multiply(grid.lambda_q, self.psi_hat_array, out=self.derivatives_array[1], dtype=dtype)
+        self.paramObj.getFFTBackend().ifft2(self.derivatives_array, out=self.derivatives_array)
 
         #####
         # This code does the same thing but is slower. Easyer to read though.
@@ -342,14 +405,65 @@ class WaveFunction2D:
         # #Dy_psi.psi_array /= N*M
         #####
 
+        self.derivatives_contains_values = True
+        return self.derivatives_array
 
-        # adding Dx and Dy up to L
-        xx, yy = np.meshgrid(self.paramObj.x, self.paramObj.y, sparse=False, indexing='ij')
+    def calcNabla(self):
+        """Calculates the spatial derivative operator nabla applied to the wavefunction.
+        Since the transform is linear, this is D_x(Psi) + D_y(Psi) and the derivatives of calcL are reused if present.
+        It is only calculated once per version of the wavefunction.
 
-        self.L_psi_array = xx * Dy_psi.psi_array - yy * Dx_psi.psi_array
+        Retruns:
+            The Wavefunction after the nabla operator was applied.
+        """
+        if self.nabla_psi_contains_values:
+            return self.nabla_psi_array
+        Dx_psi, Dy_psi = self.calcDerivatives()
+
+        np.add(Dx_psi, Dy_psi, out=self._component_buffer('nabla_psi_array'))
+        self.nabla_psi_contains_values = True
+        return self.nabla_psi_array
+
+    def calcL(self, scratch=None):
+        """Calculates the angular momentum operator acting on the wavefunction.
+        This is done by L Psi = (x*d/dy - y*d/dx) Psi [1]. It is only calculated once per version of the wavefunction.
+
+        Arguments:
+            scratch: An optional complex 2D numpy array for the intermediate product, so no temporary array is allocated.
+
+        Returns:
+            The Wavfunction after the angular momentum operator was applied.
+        """
+        if self.L_psi_contains_values:
+            return self.L_psi_array
+
+        # get the cached coordinates
+        grid = self.paramObj.getSpectralGrid()
+
+        # calculating D_x(Psi) and D_y(Psi) first to later Calculate L, they are reused if present
+        Dx_psi, Dy_psi = self.calcDerivatives()
+
+        # adding Dx and Dy up to L
+        L_psi = self._component_buffer('L_psi_array')
+        np.multiply(grid.xx, Dy_psi, out=L_psi)
+        if scratch is None:
+            L_psi -= grid.yy * Dx_psi
+        else:
+            L_psi -= np.multiply(grid.yy, Dx_psi, out=scratch)
         self.L_psi_contains_values = True
         return self.L_psi_array
 
+    def _component_buffer(self, name):
+        """Returns the component array with the given attribute name so it can be overwritten in place.
+        A new array is allocated if it does not have the right form.
+        """
+        array = getattr(self, name)
+        dtype = np.result_type(self.psi_array.dtype, np.complex64)
+        if array is None or array.shape != self.paramObj.getResolution() or array.dtype != dtype:
+            array = np.empty(self.paramObj.getResolution(), dtype=dtype)
+            setattr(self, name, array)
+        return array
+
     def calcG_m(self, psi_m, alpha):
         """Calculates G_m which contains the action of potential, the density and the rotation term of the GPE on the wavefunction,
         as well as a stabilization factor.
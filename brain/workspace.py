@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class Workspace:
+    '''This class holds all arrays that are needed during a time step of the BFFP scheme.
+    They are allocated once when the solver is set up and every step writes into them, so no arrays have to be allocated while iterating.
+
+    Attributes:
+        precision: A string, 'single' or 'double', the precision of all arrays.
+        psi: A (2, M, N) complex numpy array with two buffers for psi. One contains the current time step,
+             the other one the previous time step (ping-pong buffers).
+        current: An integer, the index of the buffer in psi that contains the current time step.
+        psi_hat: A complex 2D numpy array for the fourier transform of the current psi.
+        G: A complex 2D numpy array for G_m, which is transformed in place to its fourier transform.
+        L_psi: A complex 2D numpy array for the angular momentum operator applied to the current psi.
+        b: A real 2D numpy array for V + beta2*|psi|^2, used by ImaginaryTimeStepper.calcAlpha.
+        real_dtype: The numpy dtype of the real arrays, scalars passed to the kernels are converted to it.
+        V, k2, x, y: The potential, k^2 and the coordinates in real_dtype, see setGrid.
+    '''
+    def __init__(self, parameterObject, precision=None):
+        '''Allocates all arrays.
+
+        Arguments:
+            parameterObject: A ParameterObject instance with the resolution of the grid.
+            precision: A string, 'single' or 'double'. The default is ParameterObject.precision.
+        '''
+        self.resolution = tuple(parameterObject.getResolution())
+        self.precision = precision or parameterObject.precision
+        complex_dtype, real_dtype = parameterObject.getDtypes(self.precision)
+        self.psi = np.zeros((2,) + self.resolution, dtype=complex_dtype)
+        self.current = 0
+
+        self.psi_hat = np.zeros(self.resolution, dtype=complex_dtype)
+        self.G = np.zeros(self.resolution, dtype=complex_dtype)
+        self.L_psi = np.zeros(self.resolution, dtype=complex_dtype)
+        self.b = np.zeros(self.resolution, dtype=real_dtype)
+
+        self.real_dtype = real_dtype
+        self.V = self.k2 = self.x = self.y = None
+
+    def setGrid(self, V, k2, x, y):
+        '''Stores the real arrays the kernels need in the precision of the workspace, so the kernels do not mix precisions.
+        In double precision no copies are made of contiguous arrays.
+
+        Arguments:
+            V, k2: Real 2D numpy arrays, the potential and k^2 of the SpectralGrid.
+            x, y: 1D numpy arrays with the coordinates.
+        '''
+        self.V, self.k2, self.x, self.y = [np.ascontiguousarray(a, dtype=self.real_dtype) for a in (V, k2, x, y)]
+
+    def getPsi(self):
+        '''Returns the buffer that contains psi of the current time step.
+        '''
+        return self.psi[self.current]
+
+    def getPreviousPsi(self):
+        '''Returns the buffer that contains psi of the previous time step. It is overwritten by the next step.
+        '''
+        return self.psi[1 - self.current]
+
+    def swap(self):
+        '''Exchanges the current and the previous buffer, after the next step was written into the previous buffer.
+        '''
+        self.current = 1 - self.current
@@ -1,7 +1,8 @@
 import sys
+import argparse
 sys.path.append("..")
 # pylint my show an error here, but there actually is none
-from brain import ParameterObject, WaveFunction2D, ImaginaryTimeStepper, PotentialChoice, Psi0Choice
+from brain import ParameterObject, WaveFunction2D, ImaginaryTimeStepper, ResolutionContinuation, PotentialChoice, Psi0Choice
 
 
 #### initialize parameters
@@ -12,7 +13,7 @@ x_high = 16
 y_low = -16
 y_high = 16
 beta2 = 1000
-omega = 0.9,
+omega = 0.9
 epsilon_limit=1e-10
 epsilon_threshold=1
 dt=0.005
@@ -23,22 +24,51 @@ potential_parameters={'gamma_y':1, 'alpha':1.2, 'kappa_quartic':0.3, 'kappa_opti
 psi0_choice=Psi0Choice.THOMAS_FERMI
 psi0_parameters={'gamma_y':1, 'sigma':1, 'x0':0, 'y0':0}
 
+#### performance settings, can be overwritten on the command line
+fft_backend='numpy'
+fft_threads=1
+anderson_depth=0
+adaptive_dt=False
+levels=[]
+checkpoint_interval=1000
+
+parser = argparse.ArgumentParser(description="Calculates the ground state of a rotating BEC without the GUI.")
+parser.add_argument('--fft-backend', default=fft_backend, choices=['numpy', 'scipy', 'pyfftw'], help="FFT library to use.")
+parser.add_argument('--fft-threads', default=fft_threads, type=int, help="Number of threads the FFT library may use.")
+parser.add_argument('--anderson-depth', default=anderson_depth, type=int, help="History depth of the Anderson acceleration, 0 turns it off.")
+parser.add_argument('--adaptive-dt', default=adaptive_dt, action='store_true', help="Adapt dt to the time step constraint, dt is the initial time step.")
+parser.add_argument('--checkpoint-interval', default=checkpoint_interval, type=int, help="Iterations between two checkpoints, 0 turns them off.")
+parser.add_argument('--resume', default=None, metavar='FILE', help="Continue the interrupted simulation in FILE, all other arguments are ignored.")
+parser.add_argument('--levels', default=levels, type=int, nargs='*', help="Coarse resolutions that are solved first, e.g. --levels 64 128.")
+args = parser.parse_args()
+
 #### initialize objects
 p = ParameterObject(res_x, res_y, x_low, x_high, y_low, y_high,
                     beta2, omega, epsilon_limit, epsilon_threshold, dt, maxIterations,
                     filename, potential_choice, potential_parameters,
-                    psi0_choice, psi0_parameters)
+                    psi0_choice, psi0_parameters,
+                    fft_backend=args.fft_backend, fft_threads=args.fft_threads,
+                    anderson_depth=args.anderson_depth, adaptive_dt=args.adaptive_dt,
+                    checkpoint_interval=args.checkpoint_interval)
 p.initV()
 
-# set up the initial wave function
-psi0 = WaveFunction2D(p)
-psi0.initPsi_0()
+if args.resume:
+    # continue from the checkpoint, with the parameters saved in the file
+    i = ImaginaryTimeStepper.resume(args.resume)
+    getattr(i, i.resumeState['method'])()
+elif args.levels:
+    # solve on the coarse grids first, i is the solver of the full resolution
+    i = ResolutionContinuation(p, args.levels).run()
+else:
+    # set up the initial wave function
+    psi0 = WaveFunction2D(p)
+    psi0.initPsi_0()
 
-# set up the GPE solver object
-i = ImaginaryTimeStepper(psi0, p)
+    # set up the GPE solver object
+    i = ImaginaryTimeStepper(psi0, p)
 
-# start the simulation
-i.BFFP()
+    # start the simulation
+    i.BFFP()
 
 # uncomment the following line to get a rough animation of the results.
 # i.dataM.displayFrames(30)
@@ -0,0 +1,68 @@
+import sys
+import argparse
+import numpy as np
+sys.path.append("..")
+# pylint my show an error here, but there actually is none
+from brain import ParameterObject, ParameterSweep, PotentialChoice, Psi0Choice
+
+
+#### initialize the parameters that are the same for every job
+res_x = 256
+res_y = 256
+x_low = -16
+x_high = 16
+y_low = -16
+y_high = 16
+beta2 = 1000
+omega = 0.9
+epsilon_limit=1e-10
+epsilon_threshold=1
+dt=0.005
+maxIterations=30_000
+potential_choice=PotentialChoice.HARMONIC
+potential_parameters={'gamma_y':1, 'alpha':1.2, 'kappa_quartic':0.3, 'kappa_optic':0.7, 'V0':5}
+psi0_choice=Psi0Choice.THOMAS_FERMI
+psi0_parameters={'gamma_y':1, 'sigma':1, 'x0':0, 'y0':0}
+
+#### sweep settings, can be overwritten on the command line
+directory='sweep'
+method='BFFP'
+processes=1
+threads=1
+batch_size=1
+
+parser = argparse.ArgumentParser(description="Calculates the ground states of all combinations of some parameters without the GUI.",
+    epilog="Example: python run_sweep.py --linspace omega 0 0.95 20 --values beta2 100 500 1000 --processes 4")
+parser.add_argument('--linspace', nargs=4, action='append', default=[], metavar=('NAME', 'START', 'STOP', 'NUM'),
+    help="An axis with NUM values from START to STOP.")
+parser.add_argument('--values', nargs='+', action='append', default=[], metavar='NAME VALUE',
+    help="An axis with the given values. Entries of the potential parameters are named potential_<key>, e.g. potential_alpha.")
+parser.add_argument('--directory', default=directory, help="Directory of the files and the summary.csv.")
+parser.add_argument('--method', default=method, choices=['BFFP', 'PCG'], help="Solver of every job.")
+parser.add_argument('--processes', default=processes, type=int, help="Number of jobs that are calculated at the same time.")
+parser.add_argument('--threads', default=threads, type=int, help="Number of threads of every job.")
+parser.add_argument('--batch-size', default=batch_size, type=int,
+    help="Number of BFFP jobs with the same grid that are calculated together as one batch.")
+parser.add_argument('--fft-backend', default='numpy', choices=['numpy', 'scipy', 'pyfftw'], help="FFT library to use.")
+
+# the jobs are calculated by spawned processes, which import this file again
+if __name__ == '__main__':
+    args = parser.parse_args()
+    axes = {}
+    for name, start, stop, num in args.linspace:
+        axes[name] = list(np.linspace(float(start), float(stop), int(num)))
+    for values in args.values:
+        if len(values) < 2:
+            parser.error("--values needs a name and at least one value.")
+        # integral values are integers, so e.g. the resolution can be swept as well
+        axes[values[0]] = [int(float(v)) if float(v).is_integer() else float(v) for v in values[1:]]
+    if not axes:
+        parser.error("The sweep needs at least one axis, use --linspace or --values.")
+
+    p = ParameterObject(res_x, res_y, x_low, x_high, y_low, y_high,
+                        beta2, omega, epsilon_limit, epsilon_threshold, dt, maxIterations,
+                        'sweep.hdf5', potential_choice, potential_parameters,
+                        psi0_choice, psi0_parameters, fft_backend=args.fft_backend)
+
+    sweep = ParameterSweep(p, axes, args.directory, args.method, args.processes, args.threads, batch_size=args.batch_size)
+    sweep.run()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# the tests import the package from the repository, like the scripts in no_gui
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brain import ParameterObject, WaveFunction2D
+
+
+@pytest.fixture
+def smallParameters(tmp_path):
+    '''Returns a function that creates a ParameterObject on a small grid, which converges in a few seconds.
+    Keyword arguments overwrite the defaults, the file is created in the temporary directory of the test.
+    '''
+    def make(**kwargs):
+        parameters = dict(resolutionX=32, resolutionY=32, x_low=-8, x_high=8, y_low=-8, y_high=8,
+            beta2=50, omega=0.3, epsilon_limit=1e-6, maxIterations=3000, filename=str(tmp_path / 'test.hdf5'), async_writes=False)
+        parameters.update(kwargs)
+        p = ParameterObject(**parameters)
+        p.initV()
+        return p
+    return make
+
+
+@pytest.fixture
+def groundState():
+    '''Returns a function that creates the normalized initial wavefunction of a ParameterObject.
+    '''
+    def make(p):
+        psi = WaveFunction2D(p)
+        psi.initPsi_0()
+        return psi
+    return make
@@ -0,0 +1,69 @@
+import numpy as np
+
+from brain import ImaginaryTimeStepper, DT_GROWTH, DT_SHRINK
+
+
+def test_adapt_time_step(smallParameters, groundState):
+    p = smallParameters(dt_safety=0.9)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.dataM.closeFile()
+    bmin, bmax = 0.0, 20.0
+    constraint = 0.9 * 2/(bmin + bmax)
+
+    # dt grows towards the constraint
+    stepper.dt = 0.05
+    assert not stepper.adaptTimeStep(bmin, bmax, 0.9)
+    assert np.isclose(stepper.dt, 0.05*DT_GROWTH)
+    stepper.dt = 0.0899
+    assert not stepper.adaptTimeStep(bmin, bmax, 0.9)
+    assert np.isclose(stepper.dt, constraint)
+
+    # it is reduced on fast growth of epsilon and if the constraint drops below dt
+    assert stepper.adaptTimeStep(bmin, bmax, 2.0)
+    assert np.isclose(stepper.dt, constraint*DT_SHRINK)
+    assert stepper.adaptTimeStep(bmin, 4*bmax, 0.9)
+    assert np.isclose(stepper.dt, 0.9 * 2/(4*bmax))
+
+
+def test_bffp_with_adaptive_dt(smallParameters, groundState, tmp_path):
+    runs = {}
+    for adaptive_dt in (False, True):
+        p = smallParameters(epsilon_limit=1e-8, adaptive_dt=adaptive_dt, filename=str(tmp_path / 'adaptive_{}.hdf5'.format(adaptive_dt)))
+        stepper = ImaginaryTimeStepper(groundState(p), p)
+        stepper.BFFP()
+        dt = stepper.dataM.getTimeSeries('dt')['dt']
+        stepper.dataM.closeFile()
+        runs[adaptive_dt] = stepper, dt
+    (fixed, fixed_dt), (adaptive, adaptive_dt) = runs[False], runs[True]
+    assert np.all(fixed_dt == fixed.paramObj.dt)
+    assert adaptive_dt.max() > 2*fixed.paramObj.dt
+    assert adaptive.n < fixed.n / 2
+    # the normalized gradient flow converges to the ground state up to an error of order dt
+    assert np.isclose(adaptive.psi_n.calcObservables()[0], fixed.psi_n.calcObservables()[0], rtol=1e-4)
+
+
+def test_anderson_history_is_reset_when_dt_drops(smallParameters, groundState):
+    p = smallParameters(epsilon_limit=1e-8, adaptive_dt=True, anderson_depth=5)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    state = {'dropped': False, 'drops': 0, 'mixes': 0}
+    adaptTimeStep, reset, mix = stepper.adaptTimeStep, stepper.mixer.reset, stepper.mixer.mix
+    def recordedAdaptTimeStep(*args):
+        dropped = adaptTimeStep(*args)
+        if dropped:
+            state['dropped'] = True
+            state['drops'] += 1
+        return dropped
+    def recordedReset():
+        state['dropped'] = False
+        reset()
+    def checkedMix(*args, **kwargs):
+        # no history of the larger time step may be mixed with the smaller one
+        assert not state['dropped']
+        state['mixes'] += 1
+        return mix(*args, **kwargs)
+    stepper.adaptTimeStep = recordedAdaptTimeStep
+    stepper.mixer.reset = recordedReset
+    stepper.mixer.mix = checkedMix
+    stepper.BFFP()
+    stepper.dataM.closeFile()
+    assert state['drops'] > 0 and state['mixes'] > 0
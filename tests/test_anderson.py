@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from brain import AndersonMixer, ImaginaryTimeStepper
+
+
+def linearIteration(shape):
+    '''A slow linear fixed point iteration x -> a*x + b with the fixed point b/(1-a).'''
+    rng = np.random.default_rng(0)
+    a = rng.uniform(0.5, 0.98, shape)
+    b = rng.normal(size=shape) + 1j*rng.normal(size=shape)
+    return (lambda x: a*x + b), b/(1 - a)
+
+
+def test_mixing_accelerates_a_linear_iteration():
+    g, fixed_point = linearIteration((4, 4))
+    x_plain = np.zeros((4, 4), dtype=complex)
+    x_mixed = np.zeros((4, 4), dtype=complex)
+    mixer = AndersonMixer(8, (4, 4))
+    for _ in range(40):
+        x_plain = g(x_plain)
+        mixer.mix(x_mixed, g(x_mixed), out=x_mixed)
+    assert np.abs(x_plain - fixed_point).max() > 1e-3
+    assert np.abs(x_mixed - fixed_point).max() < 1e-8
+
+
+def test_reset_starts_a_new_sequence():
+    g, fixed_point = linearIteration((4, 4))
+    mixer = AndersonMixer(3, (4, 4))
+    x = np.zeros((4, 4), dtype=complex)
+    assert not mixer.mix(x, g(x), out=x)
+    assert mixer.mix(x, g(x), out=x) and mixer.mixed
+    mixer.reset()
+    assert mixer.n_stored == 0 and not mixer.mixed
+    # the first pair after a reset only returns g(x)
+    gx = g(x)
+    assert not mixer.mix(x, gx, out=x)
+    assert np.array_equal(x, gx)
+    with pytest.raises(ValueError):
+        AndersonMixer(0, (4, 4))
+
+
+def test_bffp_with_anderson_reaches_the_same_ground_state(smallParameters, groundState, tmp_path):
+    runs = {}
+    for depth in (0, 5):
+        p = smallParameters(epsilon_limit=1e-8, anderson_depth=depth, filename=str(tmp_path / 'anderson_{}.hdf5'.format(depth)))
+        stepper = ImaginaryTimeStepper(groundState(p), p)
+        stepper.BFFP()
+        stepper.dataM.closeFile()
+        runs[depth] = stepper
+    assert runs[5].n < runs[0].n / 2
+    assert np.allclose(runs[5].psi_n.psi_array, runs[0].psi_n.psi_array, rtol=0, atol=1e-6)
+    assert np.isclose(runs[5].psi_n.calcObservables()[0], runs[0].psi_n.calcObservables()[0], rtol=1e-10)
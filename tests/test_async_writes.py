@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+import pytest
+
+from brain import DataManager, ImaginaryTimeStepper, FRAME_ATTRIBUTES_KEY, WRITE_QUEUE_SIZE
+
+
+def readFile(filename):
+    dataM = DataManager(filename)
+    dataM.loadFile(read_only=True)
+    try:
+        frames = dataM.getFrames()
+        columns = {name: dataM.getFrameAttributeColumn(name) for name in dataM.file[FRAME_ATTRIBUTES_KEY]}
+    finally:
+        dataM.closeFile()
+    return frames, columns
+
+
+def test_background_writer_writes_the_same_file(smallParameters, groundState, tmp_path):
+    files = {}
+    for async_writes in (False, True):
+        # a frame is saved after every step, so the queue and the buffer pool are full most of the time
+        p = smallParameters(maxIterations=60, epsilon_threshold=0, async_writes=async_writes,
+            filename=str(tmp_path / 'async_{}.hdf5'.format(async_writes)))
+        stepper = ImaginaryTimeStepper(groundState(p), p)
+        stepper.BFFP()
+        stepper.dataM.closeFile()
+        files[async_writes] = readFile(p.filename)
+
+    (frames, columns), (async_frames, async_columns) = files[False], files[True]
+    assert len(frames) >= 60
+    assert np.array_equal(frames, async_frames)
+    assert sorted(columns) == sorted(async_columns)
+    for name in columns:
+        assert np.array_equal(columns[name], async_columns[name], equal_nan=True)
+
+
+def slowWriter(dataM, seconds=0.01):
+    writeFrame = dataM.writeFrame
+    def slowWriteFrame(*args):
+        time.sleep(seconds)
+        writeFrame(*args)
+    dataM.writeFrame = slowWriteFrame
+
+
+def test_readers_see_all_queued_frames(tmp_path):
+    dataM = DataManager(str(tmp_path / 'queued.hdf5'), async_writes=True)
+    dataM.newFile()
+    slowWriter(dataM)
+    frames = np.random.default_rng(0).normal(size=(WRITE_QUEUE_SIZE + 3, 8, 8)) + 0j
+    for n, frame in enumerate(frames):
+        dataM.addDset(frame, {'n': n})
+    # the writer is still busy, the readers wait for it
+    assert dataM.writeQueue.qsize() > 0
+    assert dataM.getNFrames() == len(frames)
+    array, attributes = dataM.getDset(dataM.getLastKey())
+    assert np.array_equal(array, frames[-1]) and attributes['n'] == len(frames) - 1
+    assert np.array_equal(dataM.getFrames(), frames)
+    dataM.closeFile()
+
+
+class WriteFailed(Exception):
+    pass
+
+
+def failingWriter(dataM):
+    def failingWriteFrame(*args):
+        raise WriteFailed()
+    dataM.writeFrame = failingWriteFrame
+
+
+def test_writer_errors_are_raised_by_flush(tmp_path):
+    dataM = DataManager(str(tmp_path / 'failed.hdf5'), async_writes=True)
+    dataM.newFile()
+    failingWriter(dataM)
+    dataM.addDset(np.zeros((8, 8), dtype=complex), {'n': 0})
+    with pytest.raises(WriteFailed):
+        dataM.flush()
+    # the error is raised once
+    dataM.flush()
+    dataM.closeFile()
+
+
+def test_writer_errors_are_raised_by_close_file(tmp_path):
+    dataM = DataManager(str(tmp_path / 'failed.hdf5'), async_writes=True)
+    dataM.newFile()
+    failingWriter(dataM)
+    dataM.addDset(np.zeros((8, 8), dtype=complex), {'n': 0})
+    with pytest.raises(WriteFailed):
+        dataM.closeFile()
+    assert not dataM.fileOpen
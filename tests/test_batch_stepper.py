@@ -0,0 +1,34 @@
+import numpy as np
+
+from brain import BatchedTimeStepper, ImaginaryTimeStepper, ParameterSweep, unsupportedFeatures
+
+
+def test_batch_matches_the_single_runs(smallParameters, groundState, tmp_path):
+    members = [dict(omega=0.0, beta2=20), dict(omega=0.3, beta2=50)]
+    single = []
+    for k, kwargs in enumerate(members):
+        p = smallParameters(filename=str(tmp_path / 'single_{}.hdf5'.format(k)), **kwargs)
+        stepper = ImaginaryTimeStepper(groundState(p), p)
+        stepper.BFFP()
+        stepper.dataM.closeFile()
+        single.append((stepper.n, stepper.psi_n.psi_array))
+
+    batch = BatchedTimeStepper([smallParameters(filename=str(tmp_path / 'batch_{}.hdf5'.format(k)), **kwargs) for k, kwargs in enumerate(members)])
+    results = batch.BFFP()
+    for (n, psi), result, psi_final in zip(single, results, batch.psi_final):
+        assert result['n'] == n
+        assert np.allclose(psi_final.psi_array, psi, atol=1e-10)
+
+
+def test_unsupported_features_warn_and_are_not_batched(smallParameters, capsys, tmp_path):
+    plain = smallParameters()
+    assert unsupportedFeatures(plain) == []
+    special = smallParameters(adaptive_dt=True, anderson_depth=3, checkpoint_interval=10, precision='single')
+    assert unsupportedFeatures(special) == ['adaptive_dt', 'anderson_depth', 'checkpoint_interval', 'precision']
+
+    BatchedTimeStepper([plain, smallParameters(anderson_depth=3, filename=str(tmp_path / 'other.hdf5'))])
+    assert "Member 1 sets anderson_depth" in capsys.readouterr().out
+
+    sweep = ParameterSweep(smallParameters(), {'omega': [0.0, 0.1, 0.2], 'anderson_depth': [0, 3]}, str(tmp_path / 'sweep'), batch_size=4, log=False)
+    batches = sweep.getBatches(sweep.getJobs())
+    assert batches == [[0, 2, 4], [1], [3], [5]]
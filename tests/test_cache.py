@@ -0,0 +1,52 @@
+import numpy as np
+
+from brain import GroundStateCache, cacheKey
+
+
+def test_miss_then_hit(smallParameters, tmp_path):
+    cache = GroundStateCache(str(tmp_path / 'cache'))
+    p = smallParameters()
+    assert p not in cache and cache.lookup(p) is None
+    psi, results = cache.solve(p)
+    assert p in cache and len(cache) == 1
+    assert results['epsilon'] <= p.epsilon_limit
+
+    # a hit does not calculate, so it also works without the file of the run
+    q = smallParameters(filename=str(tmp_path / 'missing' / 'never_written.hdf5'))
+    psi_hit, results_hit = cache.solve(q)
+    assert results_hit == results
+    assert np.array_equal(psi_hit.psi_array, psi.psi_array)
+
+
+def test_near_hit_is_a_warm_start(smallParameters, tmp_path):
+    cache = GroundStateCache(str(tmp_path / 'cache'))
+    cold = cache.solve(smallParameters(omega=0.3))[1]
+    p = smallParameters(omega=0.31, filename=str(tmp_path / 'near.hdf5'))
+    assert cache.nearest(p)[1] < cache.max_distance
+    warm = cache.solve(p)[1]
+    assert warm['n'] < cold['n']
+    assert cache.nearest(smallParameters(omega=0.6)) is None
+
+
+def test_unconverged_runs_are_not_cached(smallParameters, tmp_path):
+    cache = GroundStateCache(str(tmp_path / 'cache'))
+    p = smallParameters(maxIterations=20)
+    psi, results = cache.solve(p)
+    assert results['n'] == 20 and results['epsilon'] > p.epsilon_limit
+    assert p not in cache and len(cache) == 0
+    # the same parameters with enough iterations are calculated again
+    q = smallParameters()
+    assert cacheKey(q) == cacheKey(p)
+    assert cache.solve(q)[1]['epsilon'] <= q.epsilon_limit
+
+
+def test_least_recently_used_entries_are_evicted(smallParameters, groundState, tmp_path):
+    cache = GroundStateCache(str(tmp_path / 'cache'), max_entries=2)
+    results = {'n': 1, 'epsilon': 0.0, 'E': 1.0, 'L': 0.0, 'Nabla': 0.5}
+    ps = [smallParameters(omega=omega) for omega in (0.0, 0.1, 0.2)]
+    cache.store(ps[0], groundState(ps[0]), results)
+    cache.store(ps[1], groundState(ps[1]), results)
+    cache.lookup(ps[0])
+    cache.store(ps[2], groundState(ps[2]), results)
+    assert ps[0] in cache and ps[1] not in cache and ps[2] in cache
+    assert not (tmp_path / 'cache' / (cacheKey(ps[1]) + '.hdf5')).exists()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from brain import DataManager, ImaginaryTimeStepper
+
+
+class Interrupt(Exception):
+    pass
+
+
+@pytest.mark.parametrize('method', ['BFFP', 'PCG'])
+def test_resume_continues_the_interrupted_run(smallParameters, groundState, tmp_path, method):
+    settings = dict(omega=0.5, epsilon_limit=1e-9, maxIterations=400, checkpoint_interval=50, epsilon_threshold=0.2)
+    p = smallParameters(filename=str(tmp_path / 'full.hdf5'), **settings)
+    full = ImaginaryTimeStepper(groundState(p), p)
+    getattr(full, method)()
+    full.dataM.closeFile()
+
+    # the run is interrupted after the first checkpoints, like a killed job
+    q = smallParameters(filename=str(tmp_path / 'interrupted.hdf5'), **settings)
+    stepper = ImaginaryTimeStepper(groundState(q), q)
+    saveFrame = stepper.saveFrame
+    def interruptedSaveFrame(*args, **kwargs):
+        saveFrame(*args, **kwargs)
+        if stepper.n > 120:
+            raise Interrupt()
+    stepper.saveFrame = interruptedSaveFrame
+    with pytest.raises(Interrupt):
+        getattr(stepper, method)()
+    stepper.dataM.closeFile()
+
+    resumed = ImaginaryTimeStepper.resume(q.filename)
+    assert resumed.resumeState['method'] == method
+    assert 0 < resumed.resumeState['n'] <= 120
+    getattr(resumed, resumed.resumeState['method'])()
+    assert resumed.n == full.n
+    E_full, E_resumed = full.psi_n.calcObservables()[0], resumed.psi_n.calcObservables()[0]
+    resumed.dataM.closeFile()
+
+    full_file, resumed_file = DataManager(p.filename), DataManager(q.filename)
+    full_file.loadFile(read_only=True)
+    resumed_file.loadFile(read_only=True)
+    try:
+        assert 'checkpoint' not in resumed_file.file
+        assert np.array_equal(full_file.getFrameAttributeColumn('n'), resumed_file.getFrameAttributeColumn('n'))
+        if method == 'BFFP':
+            # BFFP continues exactly where it stopped
+            assert np.array_equal(full_file.returnLastFrame(), resumed_file.returnLastFrame())
+        else:
+            # PCG starts a new conjugate direction, so only the ground state is the same
+            assert np.isclose(E_full, E_resumed, rtol=1e-8)
+    finally:
+        full_file.closeFile()
+        resumed_file.closeFile()
+
+
+def test_resume_of_a_finished_run_raises(smallParameters, groundState):
+    p = smallParameters(maxIterations=20)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.BFFP()
+    stepper.dataM.closeFile()
+    with pytest.raises(ValueError):
+        ImaginaryTimeStepper.resume(p.filename)
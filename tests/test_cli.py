@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from brain.cli import main, parseConfig, EXIT_SUCCESS, EXIT_FAILURE, EXIT_CONFIG_ERROR, EXIT_NOT_CONVERGED
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def writeConfig(tmp_path, **parameters):
+    config = {'method': 'BFFP', 'parameters': dict(resolutionX=32, resolutionY=32, x_low=-8, x_high=8, y_low=-8, y_high=8,
+        beta2=50, omega=0.3, epsilon_limit=1e-6, maxIterations=3000, filename=str(tmp_path / 'run.hdf5'), async_writes=False)}
+    config['parameters'].update(parameters)
+    filename = tmp_path / 'config.json'
+    filename.write_text(json.dumps(config))
+    return str(filename)
+
+
+def runMain(capsys, argv):
+    code = main(argv)
+    out = capsys.readouterr().out
+    return code, json.loads(out)
+
+
+def test_stdout_is_only_the_summary(tmp_path):
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    process = subprocess.run([sys.executable, '-m', 'brain', 'run', writeConfig(tmp_path)],
+        capture_output=True, text=True, env=environment, cwd=str(tmp_path))
+    assert process.returncode == EXIT_SUCCESS
+    lines = process.stdout.splitlines()
+    assert len(lines) == 1
+    summary = json.loads(lines[0])
+    assert summary['status'] == 'converged' and summary['exit_code'] == EXIT_SUCCESS
+    assert "[INFO]" in process.stderr
+
+
+def test_not_converged(capsys, tmp_path):
+    code, summary = runMain(capsys, ['run', writeConfig(tmp_path, maxIterations=20)])
+    assert code == EXIT_NOT_CONVERGED and summary['status'] == 'not_converged'
+    assert summary['n'] == 20
+
+
+@pytest.mark.parametrize('parameters', [dict(fft_backend='fftx'), dict(compression='zip'), dict(precision='half'),
+    dict(potential_choice='BOX'), dict(betta2=50), dict(beta2='abc'), dict(omega=None), dict(dt=float('nan')),
+    dict(resolutionX=32.5), dict(maxIterations=True), dict(async_writes=1), dict(filename=3),
+    dict(potential_parameters={'gamma_y': 'x'})])
+def test_config_errors(capsys, tmp_path, parameters):
+    code, summary = runMain(capsys, ['run', writeConfig(tmp_path, **parameters)])
+    assert code == EXIT_CONFIG_ERROR and summary['status'] == 'config_error'
+    assert summary['error'].startswith('ValueError')
+    # no file is created for a wrong config
+    assert not (tmp_path / 'run.hdf5').exists()
+
+
+def test_valid_values_of_other_types(tmp_path):
+    config = {'parameters': dict(beta2=100, x_low=-8.5, epsilon_threshold=0.5, compression=None, potential_choice=1,
+        potential_parameters={'gamma_y': 2})}
+    p = parseConfig(config)[1]
+    assert p.beta2 == 100 and p.compression is None and p.potential_parameters['gamma_y'] == 2
+
+
+def test_failed_run(capsys, tmp_path):
+    code, summary = runMain(capsys, ['resume', str(tmp_path / 'missing.hdf5')])
+    assert code == EXIT_FAILURE and summary['status'] == 'failed'
+
+
+def test_cache_directory_is_expanded(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    config = {'cache': '~/bec_cache', 'parameters': {'resolutionX': 32, 'resolutionY': 32}}
+    assert parseConfig(config)[3] == os.path.join(str(tmp_path), 'bec_cache')
@@ -0,0 +1,48 @@
+import csv
+import os
+
+import numpy as np
+
+from brain import ImaginaryTimeStepper, ParameterContinuation, ResolutionContinuation, CATALOG_FILENAME
+
+
+def test_resolution_continuation_reaches_the_same_ground_state(smallParameters, groundState, tmp_path):
+    p = smallParameters(epsilon_limit=1e-8, filename=str(tmp_path / 'direct.hdf5'))
+    direct = ImaginaryTimeStepper(groundState(p), p)
+    direct.PCG()
+    direct.dataM.closeFile()
+
+    q = smallParameters(epsilon_limit=1e-8, filename=str(tmp_path / 'continued.hdf5'))
+    continuation = ResolutionContinuation(q, [16], method='PCG')
+    stepper = continuation.run()
+    assert list(stepper.dataM.file.attrs['continuation_levels']) == [16, 32]
+    stepper.dataM.closeFile()
+    assert [statistics[0] for statistics in continuation.statistics] == [(16, 16), (32, 32)]
+    assert np.isclose(stepper.psi_n.calcObservables()[0], direct.psi_n.calcObservables()[0], rtol=1e-7)
+
+
+def test_parameter_continuation_warm_starts_and_catalog(smallParameters, tmp_path):
+    directory = str(tmp_path / 'continuation')
+    values = [0.2, 0.3, 0.4]
+    continuation = ParameterContinuation(smallParameters(), 'omega', values, directory, method='PCG', phase_noise=0.01, seed=1)
+    rows = continuation.run()
+    assert [row['omega'] for row in rows] == values
+    assert all(row['epsilon'] <= 1e-6 for row in rows)
+
+    with open(os.path.join(directory, CATALOG_FILENAME)) as f:
+        table = list(csv.DictReader(f))
+    assert [float(row['omega']) for row in table] == values
+
+    # the finished points are only read, also as warm start of the next point
+    rows_again = ParameterContinuation(smallParameters(), 'omega', values + [0.5], directory, method='PCG').run()
+    assert [row['n'] for row in rows_again[:3]] == [row['n'] for row in rows]
+    assert rows_again[3]['epsilon'] <= 1e-6
+
+
+def test_phase_noise_keeps_the_density(smallParameters, groundState):
+    p = smallParameters()
+    psi = groundState(p)
+    continuation = ParameterContinuation(p, 'omega', [0.3], phase_noise=0.1, seed=0)
+    noisy = continuation.warmStart(psi, p)
+    assert np.allclose(np.abs(noisy.psi_array), np.abs(psi.psi_array))
+    assert not np.allclose(noisy.psi_array, psi.psi_array)
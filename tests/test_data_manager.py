@@ -0,0 +1,77 @@
+import h5py
+import numpy as np
+
+from brain import DataManager, ImaginaryTimeStepper, ObservableEngine, FRAMES_KEY, FRAME_ATTRIBUTES_KEY
+
+
+def test_frames_are_one_extendable_dataset(smallParameters, groundState):
+    p = smallParameters(maxIterations=100, epsilon_threshold=0.5)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.BFFP()
+    stepper.dataM.closeFile()
+
+    dataM = DataManager(p.filename)
+    dataM.loadFile(read_only=True)
+    try:
+        frames = dataM.file[FRAMES_KEY]
+        n_frames = dataM.getNFrames()
+        assert n_frames == dataM.file.attrs['n_frames'] > 1
+        assert frames.shape == (n_frames,) + p.getResolution()
+        assert frames.chunks == (1,) + p.getResolution()
+        assert dataM.file[FRAME_ATTRIBUTES_KEY]['n'].shape == (n_frames,)
+        assert dataM.getFrameAttributeColumn('n')[-1] == stepper.n
+        assert np.array_equal(dataM.returnLastFrame(), stepper.psi_n.psi_array)
+    finally:
+        dataM.closeFile()
+
+
+def writeVersion1File(filename, p, frames, steps):
+    '''Writes frames like the DataManager before the layout was versioned: one dataset with attributes per frame.'''
+    with h5py.File(filename, 'w') as f:
+        f.attrs.update({'omega': p.omega, 'beta': p.beta2, 'dt': p.dt, 'resX': p.resolutionX, 'resY': p.resolutionY,
+            'x_low': p.x_low, 'x_high': p.x_high, 'y_low': p.y_low, 'y_high': p.y_high,
+            'epsilon_limit': p.epsilon_limit, 'epsilon_threshold': p.epsilon_threshold, 'maxIterations': p.maxIterations,
+            'potential_choice': int(p.potential_choice), 'psi0_choice': int(p.psi0_choice),
+            'calculated_observables': False, 'n_frames': len(frames)})
+        f.attrs.update({'potential_' + key: value for key, value in p.potential_parameters.items()})
+        f.attrs.update({'psi0_' + key: value for key, value in p.psi0_parameters.items()})
+        for i, (frame, n) in enumerate(zip(frames, steps)):
+            dset = f.create_dataset("{:05d}".format(i), data=frame, compression='gzip')
+            dset.attrs.update({'n': n, 't': n * p.dt, 'epsilon': 1.0 / (n + 1)})
+
+
+def test_version_1_files_are_read_and_their_observables_calculated(smallParameters, groundState, tmp_path):
+    p = smallParameters(omega=0.5, maxIterations=100, epsilon_threshold=0.5, inline_observables=False)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.BFFP()
+    stepper.dataM.closeFile()
+    dataM = DataManager(p.filename)
+    dataM.loadFile(read_only=True)
+    frames, steps = dataM.getFrames(), dataM.getFrameAttributeColumn('n')
+    dataM.closeFile()
+
+    filename = str(tmp_path / 'version1.hdf5')
+    writeVersion1File(filename, p, frames, steps)
+    old = DataManager(filename)
+    old.loadFile()
+    try:
+        assert old.layoutVersion == 1
+        assert old.getNFrames() == len(frames) and old.getFrameKeys()[0] == '00000'
+        assert np.array_equal(old.getFrames(), frames)
+        assert np.array_equal(old.getFrameAttributeColumn('n'), steps)
+        assert np.array_equal(old.returnLastFrame(), frames[-1])
+        q = old.getParameterObject()
+        assert (q.omega, q.beta2, q.getResolution()) == (p.omega, p.beta2, p.getResolution())
+
+        old.calcObservables(block_size=2)
+        E, L, Nabla, t = old.getObservables()
+        engine = ObservableEngine(q)
+        for k, frame in enumerate(frames):
+            assert np.allclose((E[k], L[k], Nabla[k]), engine.calcObservables(frame), rtol=1e-12, atol=1e-14)
+        assert old.file.attrs['calculated_observables']
+
+        # new frames of a version 1 file are added in its own layout
+        old.addDset(frames[-1], {'n': steps[-1] + 1})
+        assert '{:05d}'.format(len(frames)) in old.file and FRAMES_KEY not in old.file
+    finally:
+        old.closeFile()
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from brain import ImaginaryTimeStepper, getFFTBackend, NumpyFFTBackend, ScipyFFTBackend, PyFFTWBackend
+
+
+def makeBackend(name, tmp_path):
+    if name == 'scipy':
+        pytest.importorskip('scipy')
+        return ScipyFFTBackend()
+    if name == 'pyfftw':
+        pytest.importorskip('pyfftw')
+        return PyFFTWBackend(wisdom_file=str(tmp_path / 'wisdom.pickle'), planner_effort='FFTW_ESTIMATE')
+    return NumpyFFTBackend()
+
+
+def randomArray(shape, dtype=np.complex128):
+    rng = np.random.default_rng(0)
+    return (rng.normal(size=shape) + 1j*rng.normal(size=shape)).astype(dtype)
+
+
+@pytest.mark.parametrize('name', ['numpy', 'scipy', 'pyfftw'])
+def test_backends_match_numpy(name, tmp_path):
+    backend = makeBackend(name, tmp_path)
+    a = randomArray((3, 32, 24))
+    expected = np.fft.fft2(a) / (32*24)
+    psi_hat = backend.fft2(a)
+    assert np.allclose(psi_hat, expected, rtol=0, atol=1e-15)
+    assert np.allclose(backend.ifft2(psi_hat), a, rtol=0, atol=1e-14)
+    # a stack is the same as every array on its own
+    assert np.allclose(backend.fft2(a[1]), expected[1], rtol=0, atol=1e-15)
+
+
+@pytest.mark.parametrize('name', ['numpy', 'scipy', 'pyfftw'])
+def test_transforms_in_place_and_into_out(name, tmp_path):
+    backend = makeBackend(name, tmp_path)
+    a = randomArray((16, 16))
+    expected = np.fft.fft2(a) / 256
+
+    out = np.empty_like(a)
+    assert backend.fft2(a, out=out) is out
+    assert np.allclose(out, expected, rtol=0, atol=1e-15)
+
+    b = a.copy()
+    assert backend.fft2(b, out=b) is b
+    assert np.allclose(b, expected, rtol=0, atol=1e-15)
+    backend.ifft2(b, out=b)
+    assert np.allclose(b, a, rtol=0, atol=1e-14)
+
+
+@pytest.mark.parametrize('name', ['numpy', 'scipy', 'pyfftw'])
+def test_single_precision_stays_single(name, tmp_path):
+    backend = makeBackend(name, tmp_path)
+    a = randomArray((16, 16), np.complex64)
+    psi_hat = backend.fft2(a)
+    assert psi_hat.dtype == np.complex64
+    assert np.allclose(psi_hat, np.fft.fft2(a.astype(np.complex128)) / 256, rtol=0, atol=1e-6)
+
+
+def test_pyfftw_writes_its_wisdom(tmp_path):
+    backend = makeBackend('pyfftw', tmp_path)
+    backend.fft2(randomArray((8, 8)))
+    assert os.listdir(str(tmp_path)) == ['wisdom.pickle']
+
+
+def test_backends_are_shared_and_names_are_checked():
+    assert getFFTBackend('numpy', 2) is getFFTBackend('numpy', 2)
+    assert getFFTBackend('numpy', 1) is not getFFTBackend('numpy', 2)
+    with pytest.raises(ValueError):
+        getFFTBackend('fftx')
+
+
+@pytest.mark.parametrize('name', ['scipy', 'pyfftw'])
+def test_bffp_with_another_backend(name, smallParameters, groundState, tmp_path, monkeypatch):
+    pytest.importorskip(name)
+    # the shared pyfftw backend keeps its wisdom in the home directory
+    monkeypatch.setenv('HOME', str(tmp_path))
+    psi = {}
+    for backend in ('numpy', name):
+        p = smallParameters(maxIterations=200, fft_backend=backend, filename=str(tmp_path / '{}.hdf5'.format(backend)))
+        stepper = ImaginaryTimeStepper(groundState(p), p)
+        stepper.BFFP()
+        stepper.dataM.closeFile()
+        psi[backend] = stepper.psi_n.psi_array
+    assert np.allclose(psi[name], psi['numpy'], rtol=0, atol=1e-12)
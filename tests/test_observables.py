@@ -0,0 +1,15 @@
+import numpy as np
+
+from brain import ObservableEngine
+
+
+def test_frame_observables_match_the_single_frames(smallParameters, groundState):
+    p = smallParameters(omega=0.5)
+    psi = groundState(p).psi_array
+    rng = np.random.default_rng(0)
+    frames = np.array([psi * np.exp(1j * rng.normal(0, 0.3, psi.shape)) for _ in range(5)])
+    engine = ObservableEngine(p)
+    E, L, Nabla = engine.calcFrameObservables(frames)
+    for k, frame in enumerate(frames):
+        assert np.allclose((E[k], L[k], Nabla[k]), engine.calcObservables(frame), rtol=1e-12, atol=1e-14)
+    assert [len(values) for values in engine.calcFrameObservables(frames[:0])] == [0, 0, 0]
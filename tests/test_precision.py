@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from brain import DataManager, ImaginaryTimeStepper, ParameterObject, FRAMES_KEY
+
+
+def test_unknown_precision_raises():
+    with pytest.raises(ValueError):
+        ParameterObject(precision='half')
+
+
+def test_single_precision_switches_to_double(smallParameters, groundState):
+    p = smallParameters(precision='single', precision_switch=1e-3, epsilon_limit=1e-5)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.BFFP()
+    assert stepper.workspace.precision == 'double'
+    assert stepper.psi_n.psi_array.dtype == np.complex128
+
+    # the result is the ground state of a run in double precision
+    q = smallParameters(epsilon_limit=1e-5, filename=p.filename.replace('.hdf5', '_double.hdf5'))
+    reference = ImaginaryTimeStepper(groundState(q), q)
+    reference.BFFP()
+    assert np.isclose(stepper.psi_n.calcObservables()[0], reference.psi_n.calcObservables()[0], rtol=1e-6)
+    stepper.dataM.closeFile()
+    reference.dataM.closeFile()
+
+
+@pytest.mark.parametrize('async_writes', [False, True])
+def test_frames_after_the_switch_are_stored_in_double_precision(smallParameters, groundState, async_writes):
+    p = smallParameters(precision='single', precision_switch=1e-3, epsilon_limit=1e-10, maxIterations=10000,
+        epsilon_threshold=0.05, async_writes=async_writes)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.BFFP()
+    stepper.dataM.closeFile()
+
+    dataM = DataManager(p.filename)
+    dataM.loadFile(read_only=True)
+    try:
+        assert dataM.file[FRAMES_KEY].dtype == np.complex128
+        assert dataM.getNFrames() > 2
+        assert np.array_equal(dataM.returnLastFrame(), stepper.psi_n.psi_array)
+        # the frames before the switch are the single precision frames, converted exactly
+        first = dataM.getDset(dataM.getFrameKeys()[0])[0]
+        assert np.array_equal(first, first.astype(np.complex64))
+    finally:
+        dataM.closeFile()
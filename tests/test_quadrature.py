@@ -0,0 +1,46 @@
+import numpy as np
+
+from brain import ObservableEngine, simpsonWeights
+
+
+def test_simpson_weights_integrate_polynomials_exactly():
+    x = np.linspace(-2, 3, 11)
+    assert np.isclose(np.sum(simpsonWeights(x) * x**3), (3**4 - 2**4) / 4)
+
+
+def test_norm_uses_the_interior_rule(smallParameters, groundState):
+    p = smallParameters()
+    psi = groundState(p)
+    psi.setPsi(psi.psi_array * (1 + 0.5j))
+    expected = np.sqrt(np.sum(np.abs(psi.psi_array[1:-1, 1:-1])**2) * p.dx * p.dy)
+    assert np.isclose(psi.getNorm(), expected, rtol=1e-13, atol=0)
+    psi.norm()
+    assert np.isclose(psi.getNorm(), 1, rtol=1e-13, atol=0)
+
+
+def test_observables_use_the_rectangle_rule(smallParameters, groundState):
+    p = smallParameters(omega=0.5)
+    psi = groundState(p)
+    E, L, Nabla = ObservableEngine(p).calcObservables(psi.psi_array)
+
+    # the same integrals as plain sums with the measure dx*dy
+    dA = p.dx * p.dy
+    Dx, Dy = psi.calcDerivatives()
+    grid = p.getSpectralGrid()
+    L_psi = grid.xx * Dy - grid.yy * Dx
+    rho = np.abs(psi.psi_array)**2
+    L_expected = np.vdot(psi.psi_array, L_psi) * dA
+    E_expected = Nabla + np.sum((p.V + 0.5*p.beta2*rho) * rho) * dA - p.omega * L_expected.real
+    assert np.isclose(L, L_expected, rtol=1e-12, atol=1e-14)
+    assert np.isclose(E, E_expected, rtol=1e-12, atol=0)
+
+
+def test_quadrature_is_cached_per_grid(smallParameters):
+    p = smallParameters()
+    assert p.getQuadrature() is p.getQuadrature('rectangle')
+    assert np.allclose(p.getQuadrature().wx, p.dx) and np.allclose(p.getQuadrature().wy, p.dy)
+    q = p.getQuadrature('interior')
+    assert p.getQuadrature('interior') is q
+    assert np.isclose(q.integrate(np.ones(p.getResolution())), (p.resolutionX - 2) * (p.resolutionY - 2) * p.dx * p.dy)
+    p.resolutionX = 16
+    assert p.getQuadrature('interior') is not q
@@ -0,0 +1,53 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from brain import ParameterSweep, SUMMARY_FILENAME, SUMMARY_COLUMNS, setParameter
+
+
+def test_set_parameter_names(smallParameters):
+    p = smallParameters()
+    setParameter(p, 'omega', 0.4)
+    setParameter(p, 'potential_gamma_y', 1.5)
+    assert p.omega == 0.4 and p.potential_parameters['gamma_y'] == 1.5
+    with pytest.raises(ValueError):
+        setParameter(p, 'omga', 0.4)
+
+
+def test_serial_sweep_writes_files_and_summary(smallParameters, tmp_path):
+    directory = str(tmp_path / 'sweep')
+    sweep = ParameterSweep(smallParameters(), {'omega': [0.0, 0.3], 'beta2': [20, 50]}, directory, log=False)
+    rows = sweep.run()
+    assert [(row['omega'], row['beta2']) for row in rows] == [(0.0, 20), (0.0, 50), (0.3, 20), (0.3, 50)]
+    assert all(row['error'] == '' and row['epsilon'] <= 1e-6 for row in rows)
+    assert all(os.path.isfile(row['filename']) for row in rows)
+    # more interaction, more energy
+    assert rows[0]['E'] < rows[1]['E']
+
+    with open(os.path.join(directory, SUMMARY_FILENAME)) as f:
+        table = list(csv.DictReader(f))
+    assert list(table[0]) == ['omega', 'beta2'] + list(SUMMARY_COLUMNS)
+    assert np.allclose([float(row['E']) for row in table], [row['E'] for row in rows])
+
+    # finished jobs are read from their files instead of being calculated again
+    again = ParameterSweep(smallParameters(), {'omega': [0.0, 0.3], 'beta2': [20, 50]}, directory, log=False).run()
+    assert [row['E'] for row in again] == [row['E'] for row in rows]
+    assert [row['n'] for row in again] == [row['n'] for row in rows]
+
+
+def test_failed_job_is_reported_in_its_row(smallParameters, tmp_path):
+    sweep = ParameterSweep(smallParameters(), {'potential_choice': [-1]}, str(tmp_path / 'sweep'), log=False)
+    row, = sweep.run()
+    assert row['error'].startswith('ValueError')
+
+
+def test_pool_sweep_matches_the_serial_sweep(smallParameters, tmp_path):
+    axes = {'omega': [0.0, 0.3]}
+    serial = ParameterSweep(smallParameters(), axes, str(tmp_path / 'serial'), log=False).run()
+    pool = ParameterSweep(smallParameters(), axes, str(tmp_path / 'pool'), processes=2, batch_size=1, log=False).run()
+    assert all(row['error'] == '' for row in pool)
+    assert [row['omega'] for row in pool] == axes['omega']
+    assert [row['n'] for row in pool] == [row['n'] for row in serial]
+    assert np.allclose([row['E'] for row in pool], [row['E'] for row in serial])
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import brain.time_stepper
+from brain import DataManager, ImaginaryTimeStepper, TIMESERIES_COLUMNS
+
+
+def test_every_step_is_recorded(smallParameters, groundState, monkeypatch):
+    # a small buffer, so the steps are appended to the file several times
+    monkeypatch.setattr(brain.time_stepper, 'TIMESERIES_BUFFER_SIZE', 16)
+    p = smallParameters(maxIterations=100, epsilon_threshold=0.5, observables_interval=10)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.BFFP()
+    series = stepper.dataM.getTimeSeries()
+    frame_steps = stepper.dataM.getFrameAttributeColumn('n')
+    frame_epsilon = stepper.dataM.getFrameAttributeColumn('epsilon')
+    stepper.dataM.closeFile()
+
+    assert np.array_equal(series['n'], np.arange(1, stepper.n + 1))
+    assert np.allclose(series['t'], np.cumsum(series['dt']))
+    assert np.all(series['dt'] == p.dt) and np.all(np.isfinite(series['alpha']))
+    assert np.all(np.diff(series['wall']) >= 0)
+    # the frames are steps of the time series
+    assert np.array_equal(series['epsilon'][frame_steps - 1], frame_epsilon)
+    # the observables are only calculated every observables_interval steps
+    due = series['n'] % 10 == 0
+    assert np.all(np.isfinite(series['E'][due])) and np.all(np.isnan(series['E'][~due]))
+    assert np.all(np.isfinite(series['L'][due].real))
+
+
+def test_pcg_records_its_iterations(smallParameters, groundState):
+    p = smallParameters(observables_interval=1)
+    stepper = ImaginaryTimeStepper(groundState(p), p)
+    stepper.PCG()
+    series = stepper.dataM.getTimeSeries('n', 't', 'E')
+    stepper.dataM.closeFile()
+    assert np.array_equal(series['n'], np.arange(1, stepper.n + 1))
+    assert np.array_equal(series['t'], series['n'])
+    # PCG minimizes the energy
+    assert series['E'][-1] <= series['E'][0]
+
+
+def test_append_and_truncate(tmp_path):
+    dataM = DataManager(str(tmp_path / 'series.hdf5'))
+    dataM.newFile()
+    assert len(dataM.getTimeSeries('n')['n']) == 0
+    dataM.appendTimeSeries({'n': np.arange(1, 6), 'epsilon': np.linspace(1, 0.1, 5)})
+    dataM.appendTimeSeries({'n': np.arange(6, 9), 'E': np.ones(3)})
+    series = dataM.getTimeSeries()
+    assert set(series) == set(TIMESERIES_COLUMNS)
+    assert np.array_equal(series['n'], np.arange(1, 9))
+    assert np.all(np.isnan(series['E'][:5])) and np.all(series['E'][5:] == 1)
+    assert series['L'].dtype == np.complex128
+
+    with pytest.raises(ValueError):
+        dataM.appendTimeSeries({'energy': np.ones(2)})
+    with pytest.raises(ValueError):
+        dataM.appendTimeSeries({'n': np.ones(2), 'E': np.ones(3)})
+
+    # a resume from step 4 removes the later steps
+    dataM.removeFramesAfter(4)
+    assert np.array_equal(dataM.getTimeSeries('n')['n'], np.arange(1, 5))
+    dataM.closeFile()
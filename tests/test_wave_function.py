@@ -0,0 +1,115 @@
+import numpy as np
+
+from brain import WaveFunction2D
+
+
+class CountingBackend:
+    '''Wraps an FFT backend and counts its transforms.'''
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = 0
+
+    def fft2(self, array, out=None):
+        self.calls += 1
+        return self.backend.fft2(array, out=out)
+
+    def ifft2(self, array, out=None):
+        self.calls += 1
+        return self.backend.ifft2(array, out=out)
+
+
+def countedWaveFunction(p, groundState):
+    backend = CountingBackend(p.getFFTBackend())
+    p.getFFTBackend = lambda: backend
+    return groundState(p), backend
+
+
+def test_components_are_calculated_once_per_version(smallParameters, groundState):
+    psi, backend = countedWaveFunction(smallParameters(), groundState)
+    observables = psi.calcObservables()
+    calls = backend.calls
+    assert calls > 0
+    assert psi.calcObservables() == observables
+    psi_hat = psi.calcFFT()
+    assert psi.calcFFT() is psi_hat
+    psi.calcDerivatives()
+    psi.calcL()
+    psi.calcNabla()
+    calls = backend.calls
+    psi.calcL()
+    psi.calcNabla()
+    psi.getNorm()
+    assert backend.calls == calls
+
+    # every change of the wavefunction is a new version
+    version = psi.version
+    psi.psi_array /= 2
+    assert psi.version == version + 1
+    assert not psi.psi_hat_contains_values and not psi.isCurrent('observables')
+    assert np.isclose(psi.calcObservables()[2], observables[2] / 4)
+    assert backend.calls > calls
+
+
+def test_in_place_changes_need_touch(smallParameters, groundState):
+    psi = groundState(smallParameters())
+    norm = psi.getNorm()
+    psi.psi_array[...] *= 2
+    assert psi.getNorm() == norm
+    psi.touch()
+    assert np.isclose(psi.getNorm(), 2*norm)
+
+
+def test_flags_invalidate_the_dependent_components(smallParameters, groundState):
+    psi = groundState(smallParameters())
+    psi.calcObservables()
+    assert psi.derivatives_contains_values and psi.isCurrent('observables')
+    psi.psi_hat_contains_values = False
+    assert not psi.derivatives_contains_values and not psi.isCurrent('observables')
+    assert psi.psi_contains_values
+
+
+def test_psi_hat_is_a_new_wavefunction(smallParameters, groundState):
+    p = smallParameters()
+    psi = groundState(p)
+    E = psi.calcObservables()[0]
+    other = WaveFunction2D(p)
+    other.setPsiHat(psi.calcFFT().copy())
+    assert not other.psi_contains_values
+    assert np.allclose(other.calcIFFT(), psi.psi_array, rtol=0, atol=1e-15)
+    assert np.isclose(other.calcObservables()[0], E)
+
+
+COMPONENTS = ('_psi_array', 'psi_hat_array', 'L_psi_array', 'nabla_psi_array', 'derivatives_array', 'density_array')
+
+def allocated(psi):
+    return {name for name in COMPONENTS if getattr(psi, name) is not None}
+
+
+def test_components_are_allocated_on_demand(smallParameters):
+    p = smallParameters()
+    psi = WaveFunction2D(p)
+    assert allocated(psi) == set()
+    # an unset wavefunction is zero
+    assert not np.any(psi.psi_array)
+
+    psi.initPsi_0()
+    assert allocated(psi) == {'_psi_array'}
+    psi.calcFFT()
+    assert allocated(psi) == {'_psi_array', 'psi_hat_array'}
+    psi.calcNabla()
+    assert 'nabla_psi_array' in allocated(psi) and 'L_psi_array' not in allocated(psi)
+    psi.calcL()
+    assert 'L_psi_array' in allocated(psi)
+    psi.getDensity()
+    assert 'density_array' in allocated(psi)
+
+
+def test_component_buffers_are_reused(smallParameters, groundState):
+    psi = groundState(smallParameters())
+    psi.calcObservables()
+    psi.calcL()
+    buffers = {name: getattr(psi, name) for name in ('psi_hat_array', 'L_psi_array')}
+    psi.setPsi(psi.psi_array * 0.5)
+    psi.calcObservables()
+    psi.calcL()
+    assert all(getattr(psi, name) is buffer for name, buffer in buffers.items())